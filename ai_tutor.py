@@ -1,112 +1,110 @@
 import streamlit as st
-import pyaudio
-import wave
-import numpy as np
-from openai import OpenAI
-import os
-import tempfile
-import time
-
-# OpenAI API 키 설정
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+from lazy_imports import optional_import
+from providers import get_secret, iterate_sync
+from audio import EnergyVAD, StreamingTranscriber, decode_wav, encode_wav, transcribe_audio
+from audio_capture import CaptureService, FakeAudioSource, PyAudioSource
+from tutor_dialogue import DEFAULT_ASSISTANT_PROMPT, DEFAULT_USER_PROMPT, stream_ai_response
+from session_store import page_key
 
 # 오디오 설정
 CHUNK = 1024
-FORMAT = pyaudio.paInt16
 CHANNELS = 1
 RATE = 44100
-RECORD_SECONDS = 5  # 녹음 시간
+MAX_RECORD_SECONDS = 15  # 최대 녹음 시간
+SILENCE_SECONDS = 0.8  # 말이 끝난 뒤 이만큼 조용하면 녹음 종료
+PREROLL_SECONDS = 0.3  # 버튼을 누르기 직전부터 녹음에 포함할 시간
 
 st.title("AI 튜터 - 음성 대화 시스템")
 
-# 세션 상태 초기화
-if "conversation" not in st.session_state:
-    st.session_state.conversation = []
-
-# 녹음 함수
-def record_audio():
-    p = pyaudio.PyAudio()
-    stream = p.open(format=FORMAT,
-                    channels=CHANNELS,
-                    rate=RATE,
-                    input=True,
-                    frames_per_buffer=CHUNK)
-
-    st.write("녹음 중...")
-    frames = []
-
-    for i in range(0, int(RATE / CHUNK * RECORD_SECONDS)):
-        data = stream.read(CHUNK)
-        frames.append(data)
-
-    st.write("녹음 완료")
-
-    stream.stop_stream()
-    stream.close()
-    p.terminate()
-
-    return frames
-
-# AI 응답 생성 함수
-def generate_ai_response(conversation_history, system_prompt):
-    messages = [{"role": "system", "content": system_prompt}] + conversation_history
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages
-    )
-    return response.choices[0].message.content
+# 세션 상태 초기화 (멀티페이지 앱의 다른 페이지와 섞이지 않도록 키에 페이지 이름을 붙임)
+PAGE = "ai_tutor.py"
+conversation = st.session_state.setdefault(page_key(PAGE, "conversation"), [])
+
+# 캡처 서비스는 프로세스당 하나만 만들어 녹음 장치를 대화 턴 사이에도 계속 열어 둔다
+# AUDIO_SOURCE 에 WAV 파일 경로를 지정하면 마이크 대신 그 파일을 반복 재생하는 가짜 입력을 사용한다
+@st.cache_resource
+def get_capture_service():
+    source_path = get_secret("AUDIO_SOURCE")
+    if source_path:
+        with open(source_path, "rb") as f:
+            samples, rate = decode_wav(f.read())
+        source = FakeAudioSource(samples, rate, loop=True)
+    else:
+        source = PyAudioSource(RATE, CHANNELS)
+    return CaptureService(source, frame_size=CHUNK).start()
+
+# 녹음 함수 (transcriber 가 주어지면 녹음하는 동안 구간별 음성 인식을 함께 진행)
+def record_audio(capture, transcriber=None):
+    st.write("녹음 중... (말을 멈추면 자동으로 종료됩니다)")
+    vad = EnergyVAD(capture.rate, CHUNK, silence_seconds=SILENCE_SECONDS, max_seconds=MAX_RECORD_SECONDS)
+    start = capture.start_position(PREROLL_SECONDS)
+    end = start
+
+    for frame in capture.frames(start, CHUNK):
+        is_speech = vad.update(frame)
+        end += frame.size
+        if transcriber is not None:
+            transcriber.add_frame(frame, is_speech)
+        if vad.done:
+            break
+
+    st.write(f"녹음 완료 ({(end - start) / capture.rate:.1f}초)")
+    # 링 버퍼의 녹음 구간을 복사 없이 반환
+    return capture.view(start, end)
+
+# AI 응답을 대화창에 스트리밍으로 표시하고 완성된 텍스트를 반환하는 함수
+# 요청 간격은 제공자의 요청 제한기가 맞추므로 턴 사이에 고정으로 기다리지 않는다
+def stream_turn(transcript, role, label, conversation_history, system_prompt):
+    with transcript.chat_message(role):
+        st.caption(label)
+        return st.write_stream(iterate_sync(stream_ai_response(conversation_history, system_prompt)))
 
 # 시스템 프롬프트 입력
-assistant_prompt = st.text_area("AI 어시스턴트의 시스템 프롬프트를 입력하세요:", value="당신은 도움이 되는 AI 어시스턴트입니다.")
-user_prompt = st.text_area("AI 사용자의 시스템 프롬프트를 입력하세요:", value="당신은 AI 어시스턴트와 대화하는 초등학생입니다. 이전 대화를 바탕으로 적절한 질문이나 응답을 해주세요.")
+assistant_prompt = st.text_area("AI 어시스턴트의 시스템 프롬프트를 입력하세요:", value=DEFAULT_ASSISTANT_PROMPT)
+user_prompt = st.text_area("AI 사용자의 시스템 프롬프트를 입력하세요:", value=DEFAULT_USER_PROMPT)
 
 # 대화 턴 수 설정
 max_turns = st.number_input("대화 턴 수를 설정하세요:", min_value=1, max_value=10, value=5)
+streaming_transcription = st.checkbox("말하는 동안 구간별로 음성 인식 (스트리밍)", value=True)
 
 # 음성 인식 버튼
 if st.button("대화 시작"):
-    frames = record_audio()
-
-    # WAV 파일로 저장
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_wav:
-        wf = wave.open(temp_wav.name, 'wb')
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(pyaudio.PyAudio().get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b''.join(frames))
-        wf.close()
-
-        # OpenAI API를 사용하여 음성을 텍스트로 변환
-        with open(temp_wav.name, "rb") as audio_file:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1", 
-                file=audio_file
-            )
-
-    user_input = transcript.text
-    st.write(f"사용자 (음성 인식): {user_input}")
-    st.session_state.conversation.append({"role": "user", "content": user_input})
-
-    # 대화 진행
+    # pyaudio 는 마이크를 처음 열 때만 불러온다
+    if not get_secret("AUDIO_SOURCE") and optional_import("pyaudio") is None:
+        st.stop()
+    capture = get_capture_service()
+    if not capture.running:
+        capture.start()
+
+    if streaming_transcription:
+        # 무음 지점마다 잘린 구간은 녹음 중에 이미 변환되고 있으므로 마지막 구간만 기다리면 된다
+        transcriber = StreamingTranscriber(capture.rate, CHUNK, capture.channels)
+        record_audio(capture, transcriber)
+        user_input = transcriber.finish()
+    else:
+        samples = record_audio(capture)
+        # 메모리 안에서 WAV로 인코딩한 뒤 음성을 텍스트로 변환 (같은 음성은 캐시된 결과 사용)
+        user_input = transcribe_audio(encode_wav(samples, capture.rate, capture.channels))
+    # 턴이 진행될 때마다 메시지가 추가되는 대화창
+    transcript = st.container()
+    with transcript.chat_message("user"):
+        st.caption("사용자 (음성 인식)")
+        st.write(user_input)
+    conversation.append({"role": "user", "content": user_input})
+
+    # 대화 진행 (각 응답은 생성되는 대로 표시)
     for i in range(max_turns):
         # AI 1 (어시스턴트) 응답 생성
-        ai_response = generate_ai_response(st.session_state.conversation, assistant_prompt)
-        st.write(f"AI 어시스턴트: {ai_response}")
-        st.session_state.conversation.append({"role": "assistant", "content": ai_response})
+        ai_response = stream_turn(transcript, "assistant", "AI 어시스턴트", conversation, assistant_prompt)
+        conversation.append({"role": "assistant", "content": ai_response})
 
         # AI 2 (사용자 역할) 응답 생성
-        user_response = generate_ai_response(st.session_state.conversation, user_prompt)
-        st.write(f"AI 사용자: {user_response}")
-        st.session_state.conversation.append({"role": "user", "content": user_response})
-
-        time.sleep(2)
-
-    # 임시 파일 삭제
-    os.unlink(temp_wav.name)
+        user_response = stream_turn(transcript, "user", "AI 사용자", conversation, user_prompt)
+        conversation.append({"role": "user", "content": user_response})
 
 # 대화 기록 표시
 st.subheader("대화 기록")
-for message in st.session_state.conversation:
+for message in conversation:
     if message["role"] == "user":
         st.text_area("사용자:", value=message["content"], height=100, disabled=True)
     else:
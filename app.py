@@ -1,52 +1,30 @@
 import streamlit as st
 import json
+import time
+from contextlib import closing
 from datetime import datetime
-from openai import OpenAI
 import os
-from dotenv import load_dotenv
-import requests
+from lazy_imports import lazy_import
+from providers import get_secret, generate_model_result_async, iterate_completed
+from columnar_export import CallWriter, result_fields
+from dataset_eval import DatasetRun, DatasetError, inspect_dataset, iter_rows, CHUNK_ROWS, FLUSH_INTERVAL
+from prompt_library import prompt_hash, settings_key
+from hedging import render_controls as render_hedging_controls
+from run_control import StopControl, save_status, render_status
+from session_store import session_list, page_key
+from profiler import section
 import json
 import base64
 
 # .env 파일 로드 부분 제거
 # load_dotenv()
 
-# OpenAI 클라이언트 초기화
-api_key = st.secrets["OPENAI_API_KEY"]
-client = OpenAI(api_key=api_key) if api_key else None
+# API 키 로드 (키 상태 표시용, 실제 호출은 providers 모듈에서 처리)
+api_key = get_secret("OPENAI_API_KEY")
 
 # Clova API 키 로드
-clova_api_key = st.secrets["CLOVA_API_KEY"]
-clova_apigw_key = st.secrets["CLOVA_APIGW_KEY"]
-
-# Clova API 호출 함수
-def generate_clova_response(system_prompt, user_input, max_tokens, temperature, top_p):
-    api_url = "https://clovastudio.stream.ntruss.com/testapp/v1/chat-completions/HCX-DASH-001"
-    headers = {
-        "Content-Type": "application/json",
-        "X-NCP-CLOVASTUDIO-API-KEY": clova_api_key,
-        "X-NCP-APIGW-API-KEY": clova_apigw_key,
-        'X-NCP-CLOVASTUDIO-REQUEST-ID': '35c5350c-355d-4e46-a8d7-8b80a5c70c6f'
-    }
-    data = {
-        "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_input}
-                ],
-        "maxTokens": max_tokens,
-        "temperature": temperature,
-        "topP": top_p,
-        "n": 1,
-        "echo": False
-    }
-    
-    response = requests.post(api_url, headers=headers, data=json.dumps(data))
-    if response.status_code == 200:
-        result = response.json()['result']
-        # 'message' 키 안의 'content' 값만 반환
-        return result['message']['content']
-    else:
-        return f"Error: {response.status_code}, {response.text}"
+clova_api_key = get_secret("CLOVA_API_KEY")
+clova_apigw_key = get_secret("CLOVA_APIGW_KEY")
 
 # 페이지 설정을 와이드 모드로 변경하고 한글 폰트 지원
 st.set_page_config(layout="wide", page_title="AB Test Tool", page_icon="🤖")
@@ -59,76 +37,194 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# 세션 상태 초기화
-if 'test_results' not in st.session_state:
-    st.session_state.test_results = []
-if 'current_settings' not in st.session_state:
-    st.session_state.current_settings = {
-        'model_a': 'gpt-3.5-turbo',
-        'model_b': 'gpt-3.5-turbo',
-        'temperature_a': 0.7,
-        'temperature_b': 0.7,
-        'max_tokens_a': 256,
-        'max_tokens_b': 256,
-        'top_p_a': 1.0,
-        'top_p_b': 1.0,
-        'system_prompt': '당신은 도움이 되는 AI입니다.',
-    }
-
-# 모델 응답을 생성하는 함수
-def generate_model_response(model, system_prompt, user_input, temperature, max_tokens, top_p):
-    if model == "ClovaX":
-        return generate_clova_response(system_prompt, user_input, max_tokens, temperature, top_p)
-    elif client is None:
-        return "OpenAI API 키가 설정되지 않았습니다. .env 파일에 OPENAI_API_KEY를 추가해주세요."
-    else:
-        try:
-            completion = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_input}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=top_p
-            )
-            return completion.choices[0].message.content
-        except Exception as e:
-            return f"Error: {str(e)}"
+# 세션 상태 초기화 (멀티페이지 앱의 다른 페이지와 섞이지 않도록 키에 페이지 이름을 붙임)
+PAGE = "app.py"
+test_results = session_list(page_key(PAGE, 'test_results'))  # 메모리 한도를 넘으면 오래된 결과부터 디스크로 내보냄
+current_settings = st.session_state.setdefault(page_key(PAGE, 'current_settings'), {
+    'model_a': 'gpt-3.5-turbo',
+    'model_b': 'gpt-3.5-turbo',
+    'temperature_a': 0.7,
+    'temperature_b': 0.7,
+    'max_tokens_a': 256,
+    'max_tokens_b': 256,
+    'top_p_a': 1.0,
+    'top_p_b': 1.0,
+    'system_prompt': '당신은 도움이 되는 AI입니다.',
+})
 
-# 결과를 JSON 파일로 저장하는 함수
-def save_results_to_json():
-    if st.session_state.test_results:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"test_results_{timestamp}.json"
-        
-        # 새로운 JSON 구조 생성
-        json_data = {
-            "system_prompt": st.session_state.current_settings['system_prompt'],
-            "user_input": st.session_state.test_results[0]['user_input'],
+# 내보내기용 JSON 구조 생성 함수 (파일 저장과 다운로드에서 공통 사용)
+def build_results_json():
+    with section("내보내기 JSON 구성"):
+        return {
+            "system_prompt": current_settings['system_prompt'],
+            "user_input": test_results[0]['user_input'],
             "settings": {
                 "model_a": {
-                    "name": st.session_state.current_settings['model_a'],
-                    "temperature": st.session_state.current_settings['temperature_a'],
-                    "max_tokens": st.session_state.current_settings['max_tokens_a'],
-                    "top_p": st.session_state.current_settings['top_p_a'],
+                    "name": current_settings['model_a'],
+                    "temperature": current_settings['temperature_a'],
+                    "max_tokens": current_settings['max_tokens_a'],
+                    "top_p": current_settings['top_p_a'],
                 },
                 "model_b": {
-                    "name": st.session_state.current_settings['model_b'],
-                    "temperature": st.session_state.current_settings['temperature_b'],
-                    "max_tokens": st.session_state.current_settings['max_tokens_b'],
-                    "top_p": st.session_state.current_settings['top_p_b'],
+                    "name": current_settings['model_b'],
+                    "temperature": current_settings['temperature_b'],
+                    "max_tokens": current_settings['max_tokens_b'],
+                    "top_p": current_settings['top_p_b'],
                 }
             },
+            "partial": st.session_state.get(page_key(PAGE, 'run_status'), {}).get('partial', False),
             "results": [
                 {
                     "test_number": result['test_number'],
                     "model_a_response": result['model_a_response'],
-                    "model_b_response": result['model_b_response']
-                } for result in st.session_state.test_results
+                    "model_b_response": result['model_b_response'],
+                    "model_a_latency": result.get('model_a_latency'),
+                    "model_b_latency": result.get('model_b_latency'),
+                } for result in test_results
             ]
         }
+
+# 호출 하나를 실행하고 실제로 시작한 시각을 함께 돌려주는 함수 (동시 호출 수 제한으로 기다린 시간은 빼고 기록)
+async def timed_call(coro):
+    started_at = datetime.now()
+    return started_at, await coro
+
+# 호출 하나를 열 형식 호출 기록(Parquet)에 추가하는 함수
+def export_call(call_writer, test_result, model_key, result, started_at):
+    settings = current_settings
+    model_settings = {
+        "model": settings[model_key],
+        "temperature": settings[f'temperature_{model_key[-1]}'],
+        "max_tokens": settings[f'max_tokens_{model_key[-1]}'],
+        "top_p": settings[f'top_p_{model_key[-1]}'],
+    }
+    call_writer.append(
+        started_at=started_at,
+        item=test_result['test_number'],
+        variant=model_key,
+        system_prompt=test_result['system_prompt'],
+        prompt_hash=prompt_hash(test_result['system_prompt']),
+        input=test_result['user_input'],
+        temperature=model_settings['temperature'],
+        max_tokens=model_settings['max_tokens'],
+        top_p=model_settings['top_p'],
+        settings_key=settings_key(model_settings),
+        **result_fields(result),
+    )
+
+# 데이터셋 평가 요약과 최근 결과를 그리는 함수 (placeholders 가 있으면 그 자리를 갱신)
+def render_dataset_results(placeholders=None):
+    evaluation = st.session_state.get(page_key(PAGE, 'dataset_eval'))
+    if not evaluation:
+        return
+    if placeholders is None:
+        st.subheader("데이터셋 평가 결과")
+        render_status("개 행", key=page_key(PAGE, "dataset_status"))
+        placeholders = (st.empty(), st.empty(), st.empty())
+    summary_area, preview_area, path_area = placeholders
+    summary_area.dataframe(evaluation['summary'], hide_index=True, column_config={
+        "model": "모델",
+        "calls": "호출",
+        "errors": "오류",
+        "mean_latency": st.column_config.NumberColumn("평균 지연 (초)", format="%.2f"),
+        "accuracy": st.column_config.NumberColumn("기대 답안 포함 비율", format="percent"),
+    })
+    preview_area.dataframe(evaluation['preview'], hide_index=True)
+    path_area.caption(f"{evaluation['rows_done']}/{evaluation['total']}행 완료 · 전체 결과: `{evaluation['path']}` (최근 {len(evaluation['preview'])}행만 표시)")
+
+# 업로드한 입력 파일의 모든 행을 모델 A/B 로 실행하는 함수
+# 파일을 읽으면서 최대 동시 호출 수만큼의 호출을 계속 실행하고, 끝난 행은 바로 파일에 저장해 메모리에는 집계만 남긴다
+def run_dataset_eval(uploaded_file, panel, hedge=None):
+    settings = current_settings
+    model_keys = ('model_a', 'model_b')
+    try:
+        dataset_info = inspect_dataset(uploaded_file, uploaded_file.name)
+    except DatasetError as e:
+        st.error(str(e))
+        return
+    total = dataset_info['rows']
+    if dataset_info['skipped']:
+        lines = ", ".join(str(line) for line in dataset_info['skipped_lines'])
+        more = " 등" if dataset_info['skipped'] > len(dataset_info['skipped_lines']) else ""
+        st.warning(f"형식이 잘못되었거나 입력이 없는 {dataset_info['skipped']}개 행을 건너뜁니다 (줄 {lines}{more}).")
+    dataset_run = DatasetRun(model_keys=model_keys)
+    with panel.container():
+        st.subheader("데이터셋 평가 결과")
+        placeholders = (st.empty(), st.empty(), st.empty())
+    stop_control = StopControl("데이터셋 평가 중", key="stop_dataset")
+
+    def publish():
+        st.session_state[page_key(PAGE, 'dataset_eval')] = {
+            "path": dataset_run.path,
+            "summary": dataset_run.summary({key: settings[key] for key in model_keys}),
+            "preview": dataset_run.preview_rows(),
+            "rows_done": dataset_run.rows_done,
+            "total": total,
+        }
+
+    # 행마다 모델 A/B 응답을 모으고, 둘 다 끝난 행은 finished 에 모았다가 한꺼번에 저장 (중지되면 끝난 행만 남김)
+    pending = {}
+    finished = []
+    last_flush = time.perf_counter()
+
+    def flush():
+        nonlocal last_flush
+        dataset_run.add(finished)
+        finished.clear()
+        last_flush = time.perf_counter()
+        publish()
+        render_dataset_results(placeholders)
+
+    def make_call(call):
+        row, model_key = call
+        return timed_call(generate_model_result_async(
+            settings[model_key],
+            row['system_prompt'] or settings['system_prompt'],
+            row['user_input'],
+            settings[f'temperature_{model_key[-1]}'],
+            settings[f'max_tokens_{model_key[-1]}'],
+            settings[f'top_p_{model_key[-1]}'],
+            hedge=hedge,
+        ))
+
+    def show_progress():
+        calls_done = (dataset_run.rows_done + len(finished)) * len(model_keys) + sum(map(len, pending.values()))
+        stop_control.update(calls_done, total * len(model_keys))
+        if finished and time.perf_counter() - last_flush >= FLUSH_INTERVAL:
+            flush()
+
+    rows = iter_rows(uploaded_file, uploaded_file.name, dataset_info['encoding'])
+    calls = ((row, model_key) for row in rows for model_key in model_keys)
+    try:
+        with CallWriter("app.py", run_id=dataset_run.run_id) as call_writer, \
+                closing(iterate_completed(calls, make_call, on_wait=show_progress)) as completed:
+            for (row, model_key), (started_at, result) in completed:
+                system_prompt = row['system_prompt'] or settings['system_prompt']
+                export_call(call_writer, {"test_number": row['row'], "system_prompt": system_prompt,
+                                          "user_input": row['user_input']}, model_key, result, started_at)
+                responses = pending.setdefault(row['row'], {})
+                responses[model_key] = result
+                if len(responses) < len(model_keys):
+                    continue
+                del pending[row['row']]
+                finished.append({**row, "system_prompt": system_prompt, **responses})
+                if len(finished) >= CHUNK_ROWS:
+                    flush()
+                show_progress()
+        stop_control.finish()
+    finally:
+        rows.close()
+        dataset_run.add(finished)
+        publish()
+        save_status(dataset_run.rows_done, total, key=page_key(PAGE, "dataset_status"))
+
+# 결과를 JSON 파일로 저장하는 함수
+def save_results_to_json():
+    if test_results:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"test_results_{timestamp}.json"
+        
+        json_data = build_results_json()
         
         with open(filename, "w", encoding="utf-8") as f:
             json.dump(json_data, f, ensure_ascii=False, indent=2)
@@ -142,6 +238,30 @@ def get_download_link(data, filename, text):
     href = f'<a href="data:file/json;base64,{b64}" download="{filename}">{text}</a>'
     return href
 
+# 모델별 반복 응답 일관성 지표 계산 함수 (같은 응답 묶음은 다시 계산하지 않음)
+# numpy 를 쓰는 metrics 모듈은 결과가 있을 때만 불러와 첫 화면 표시를 늦추지 않는다
+@st.cache_data(show_spinner=False)
+def compute_consistency_metrics(responses):
+    return lazy_import("metrics").consistency_metrics(responses)
+
+# 모델별 반복 응답 일관성 지표 표시 함수
+def render_consistency_metrics():
+    st.subheader("반복 응답 일관성 지표")
+    metric_cols = st.columns(2)
+    for col, model_key in [(metric_cols[0], 'model_a'), (metric_cols[1], 'model_b')]:
+        responses = tuple(result[f'{model_key}_response'] for result in test_results)
+        metrics = compute_consistency_metrics(responses)
+        with col:
+            st.markdown(f"**{current_settings[model_key]}** ({metrics['num_responses']}개 응답)")
+            if metrics['mean_jaccard'] is None:
+                st.caption("유사도 지표는 테스트 횟수가 2회 이상일 때 계산됩니다.")
+            else:
+                st.metric("평균 Jaccard 유사도 (MinHash)", f"{metrics['mean_jaccard']:.3f}")
+                st.metric("평균 코사인 유사도 (문자 n-gram)", f"{metrics['mean_cosine']:.3f}")
+            st.metric("중복 응답 비율", f"{metrics['duplicate_rate']:.1%}", help=f"유사 중복 비율: {metrics['near_duplicate_rate']:.1%}")
+            length = metrics['length']
+            st.caption(f"응답 길이 (문자): 평균 {length['mean']:.0f} ± {length['std']:.0f}, 중앙값 {length['median']:.0f}, 범위 {length['min']}–{length['max']}")
+
 # 제목 및 설명
 st.title("Chatbot Arena")
 
@@ -156,55 +276,40 @@ with col1:
     st.write("3. 결과 다운로드 버튼을 눌러야 테스트 결과가 출력되며, '결과 다운로드' 버튼을 클릭하여 하단에 표시되는 링크로 JSON 파일을 저장할 수 있습니다.")
     st.write("4. 결과는 테스트 횟수만큼 출력되며, 테스트 횟수는 최대 30회까지 설정할 수 있습니다.")
     st.subheader("모델 응답 비교")
+    render_status("개 테스트", key=page_key(PAGE, "run_status"))
     
-    if st.session_state.test_results:
-        for test_result in st.session_state.test_results:
-            st.write(f"**사용자:** {test_result['user_input']}")
-            st.write(f"**테스트 #{test_result['test_number']}**")
-            subcol1, subcol2 = st.columns(2)
-            for col, model_key in [(subcol1, 'model_a'), (subcol2, 'model_b')]:
-                with col:
-                    st.markdown(f"""
-                    <div style="border:1px solid #ddd; padding:10px; border-radius:5px;">
-                        <h4 style="margin-top:0;">{st.session_state.current_settings[model_key]}</h4>
-                        <p>{test_result[f'{model_key}_response']}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-            st.write("---")
+    if test_results:
+        with section("결과 렌더링"):
+            for test_result in test_results:
+                st.write(f"**사용자:** {test_result['user_input']}")
+                st.write(f"**테스트 #{test_result['test_number']}**")
+                subcol1, subcol2 = st.columns(2)
+                for col, model_key in [(subcol1, 'model_a'), (subcol2, 'model_b')]:
+                    with col:
+                        st.markdown(f"""
+                        <div style="border:1px solid #ddd; padding:10px; border-radius:5px;">
+                            <h4 style="margin-top:0;">{current_settings[model_key]}</h4>
+                            <p>{test_result[f'{model_key}_response']}</p>
+                        </div>
+                        """, unsafe_allow_html=True)
+                st.write("---")
+        with section("일관성 지표"):
+            render_consistency_metrics()
     
     if st.button("결과 다운로드"):
-        if st.session_state.test_results:
-            json_data = {
-                "system_prompt": st.session_state.current_settings['system_prompt'],
-                "user_input": st.session_state.test_results[0]['user_input'],
-                "settings": {
-                    "model_a": {
-                        "name": st.session_state.current_settings['model_a'],
-                        "temperature": st.session_state.current_settings['temperature_a'],
-                        "max_tokens": st.session_state.current_settings['max_tokens_a'],
-                        "top_p": st.session_state.current_settings['top_p_a'],
-                    },
-                    "model_b": {
-                        "name": st.session_state.current_settings['model_b'],
-                        "temperature": st.session_state.current_settings['temperature_b'],
-                        "max_tokens": st.session_state.current_settings['max_tokens_b'],
-                        "top_p": st.session_state.current_settings['top_p_b'],
-                    }
-                },
-                "results": [
-                    {
-                        "test_number": result['test_number'],
-                        "model_a_response": result['model_a_response'],
-                        "model_b_response": result['model_b_response']
-                    } for result in st.session_state.test_results
-                ]
-            }
+        if test_results:
+            json_data = build_results_json()
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"test_results_{timestamp}.json"
             st.markdown(get_download_link(json_data, filename, "JSON 파일 다운로드"), unsafe_allow_html=True)
         else:
             st.warning("다운로드할 테스트 결과가 없습니다.")
 
+    # 데이터셋 평가 결과 (실행 중에는 묶음이 끝날 때마다 이 자리를 갱신)
+    dataset_panel = st.empty()
+    with dataset_panel.container():
+        render_dataset_results()
+
 # 설정 및 입력 부분 (오른쪽 칼럼)
 with col2:
     st.subheader("설정 및 입력")
@@ -221,48 +326,83 @@ with col2:
         st.warning("Clova API 키가 설정되지 않았습니다. .env 파일에 CLOVA_API_KEY와 CLOVA_APIGW_KEY를 추가해주세요.")
     # 테스트 횟수 설정
     num_tests = st.number_input("테스트 횟수", min_value=1, max_value=30, value=1, step=1)
-    tab1, tab2 = st.tabs(["채팅 인터페이스", "모델 설정"])
+    hedge = render_hedging_controls()
+    tab1, tab2, tab3 = st.tabs(["채팅 인터페이스", "모델 설정", "데이터셋 평가"])
     
     # 채팅 인터페이스 탭
     with tab1:
-        st.session_state.current_settings['system_prompt'] = st.text_area("시스템 프롬프트", value=st.session_state.current_settings['system_prompt'])
-        user_input = st.text_input("사용자 입력", key="user_input")
+        current_settings['system_prompt'] = st.text_area("시스템 프롬프트", value=current_settings['system_prompt'])
+        user_input = st.text_input("사용자 입력", key=page_key(PAGE, "user_input"))
 
         # 대화 처리
         if st.button("전송"):
             if user_input:
-                st.session_state.test_results = []
+                new_results = []
+                pending_calls = []
                 for test_num in range(num_tests):
                     test_result = {
                         "test_number": test_num + 1,
                         "user_input": user_input,
-                        "system_prompt": st.session_state.current_settings['system_prompt'],
+                        "system_prompt": current_settings['system_prompt'],
                     }
+                    new_results.append(test_result)
                     for model_key in ['model_a', 'model_b']:
-                        response = generate_model_response(
-                            st.session_state.current_settings[model_key],
-                            st.session_state.current_settings['system_prompt'],
-                            user_input,
-                            st.session_state.current_settings[f'temperature_{model_key[-1]}'],
-                            st.session_state.current_settings[f'max_tokens_{model_key[-1]}'],
-                            st.session_state.current_settings[f'top_p_{model_key[-1]}'],
-                        )
-                        test_result[f"{model_key}_response"] = response
-                    st.session_state.test_results.append(test_result)
+                        pending_calls.append((test_result, model_key))
+                # 모든 테스트의 모델 A/B 호출을 동시에 실행하고 끝나는 대로 호출 기록에 추가 (중지하면 남은 호출을 취소하고 끝난 테스트만 남김)
+                stop_control = StopControl("모델 응답 생성 중")
+                calls_done = 0
+                calls = iterate_completed(
+                    pending_calls,
+                    lambda call: timed_call(generate_model_result_async(
+                        current_settings[call[1]],
+                        current_settings['system_prompt'],
+                        user_input,
+                        current_settings[f'temperature_{call[1][-1]}'],
+                        current_settings[f'max_tokens_{call[1][-1]}'],
+                        current_settings[f'top_p_{call[1][-1]}'],
+                        hedge=hedge,
+                    )),
+                    on_wait=lambda: stop_control.update(calls_done, len(pending_calls)),
+                )
+                try:
+                    with section("모델 호출 (전체)"), CallWriter("app.py") as call_writer, closing(calls) as completed:
+                        for (test_result, model_key), (started_at, result) in completed:
+                            test_result[f"{model_key}_response"] = result["content"]
+                            test_result[f"{model_key}_latency"] = result["latency"]
+                            export_call(call_writer, test_result, model_key, result, started_at)
+                            calls_done += 1
+                            stop_control.update(calls_done, len(pending_calls))
+                    stop_control.finish()
+                finally:
+                    completed_results = [result for result in new_results if 'model_a_response' in result and 'model_b_response' in result]
+                    # 응답이 채워진 테스트로 세션 결과를 교체 (저장소에 추가된 결과는 더 이상 바꾸지 않음)
+                    with section("세션 결과 저장"):
+                        test_results.clear()
+                        test_results.extend(completed_results)
+                    save_status(len(completed_results), num_tests, key=page_key(PAGE, "run_status"))
             else:
                 st.write("사용자 입력을 입력해주세요.")
 
     # 모델 설정 탭
     with tab2:
         st.subheader("모델 A 설정")
-        st.session_state.current_settings['model_a'] = st.selectbox("모델 A 선택", ("gpt-3.5-turbo", "gpt-4o", "gpt-4o-mini", "ClovaX"), key="model_a")
-        st.session_state.current_settings['temperature_a'] = st.slider("Temperature (모델 A)", 0.0, 1.0, st.session_state.current_settings['temperature_a'], key="temperature_a")
-        st.session_state.current_settings['max_tokens_a'] = st.slider("Max Tokens (모델 A)", 50, 2048, st.session_state.current_settings['max_tokens_a'], key="max_tokens_a")
-        st.session_state.current_settings['top_p_a'] = st.slider("Top P (모델 A)", 0.0, 1.0, st.session_state.current_settings['top_p_a'], key="top_p_a")
+        current_settings['model_a'] = st.selectbox("모델 A 선택", ("gpt-3.5-turbo", "gpt-4o", "gpt-4o-mini", "ClovaX"), key=page_key(PAGE, "model_a"))
+        current_settings['temperature_a'] = st.slider("Temperature (모델 A)", 0.0, 1.0, current_settings['temperature_a'], key=page_key(PAGE, "temperature_a"))
+        current_settings['max_tokens_a'] = st.slider("Max Tokens (모델 A)", 50, 2048, current_settings['max_tokens_a'], key=page_key(PAGE, "max_tokens_a"))
+        current_settings['top_p_a'] = st.slider("Top P (모델 A)", 0.0, 1.0, current_settings['top_p_a'], key=page_key(PAGE, "top_p_a"))
 
         st.subheader("모델 B 설정")
-        st.session_state.current_settings['model_b'] = st.selectbox("모델 B 선택", ("gpt-3.5-turbo", "gpt-4o", "gpt-4o-mini", "ClovaX"), key="model_b")
-        st.session_state.current_settings['temperature_b'] = st.slider("Temperature (모델 B)", 0.0, 1.0, st.session_state.current_settings['temperature_b'], key="temperature_b")
-        st.session_state.current_settings['max_tokens_b'] = st.slider("Max Tokens (모델 B)", 50, 2048, st.session_state.current_settings['max_tokens_b'], key="max_tokens_b")
-        st.session_state.current_settings['top_p_b'] = st.slider("Top P (모델 B)", 0.0, 1.0, st.session_state.current_settings['top_p_b'], key="top_p_b")
+        current_settings['model_b'] = st.selectbox("모델 B 선택", ("gpt-3.5-turbo", "gpt-4o", "gpt-4o-mini", "ClovaX"), key=page_key(PAGE, "model_b"))
+        current_settings['temperature_b'] = st.slider("Temperature (모델 B)", 0.0, 1.0, current_settings['temperature_b'], key=page_key(PAGE, "temperature_b"))
+        current_settings['max_tokens_b'] = st.slider("Max Tokens (모델 B)", 50, 2048, current_settings['max_tokens_b'], key=page_key(PAGE, "max_tokens_b"))
+        current_settings['top_p_b'] = st.slider("Top P (모델 B)", 0.0, 1.0, current_settings['top_p_b'], key=page_key(PAGE, "top_p_b"))
 
+    # 데이터셋 평가 탭 (입력 파일의 모든 행을 현재 모델 A/B 설정으로 실행)
+    with tab3:
+        uploaded_file = st.file_uploader(
+            "입력 파일 (CSV 또는 JSONL)", type=["csv", "jsonl"],
+            help="user_input 열은 필수이고, 행마다 다른 시스템 프롬프트(system_prompt)와 기대 답안(expected)을 넣을 수 있습니다. "
+                 "시스템 프롬프트가 없는 행은 채팅 인터페이스 탭의 시스템 프롬프트를 사용합니다.",
+        )
+        if st.button("데이터셋 평가 실행", disabled=uploaded_file is None):
+            run_dataset_eval(uploaded_file, dataset_panel, hedge)
@@ -0,0 +1,38 @@
+import streamlit as st
+from profiler import process_rss_mb
+from session_store import memory_cap_bytes, memory_report, spill_dir
+
+# 관리자용 세션 메모리 현황 페이지 (프로세스에 살아 있는 모든 세션의 대화 기록/테스트 결과 사용량)
+
+st.title("세션 메모리 관리")
+st.caption(f"목록 하나당 메모리 한도: {memory_cap_bytes() / 1024:.0f} KB (SESSION_MEMORY_CAP_KB) · 디스크 저장 위치: `{spill_dir()}`")
+
+rows = memory_report()
+sessions = {row["session_id"] for row in rows}
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("프로세스 메모리 (RSS)", f"{process_rss_mb():.0f} MB")
+col2.metric("활성 세션 수", len(sessions))
+col3.metric("메모리에 있는 기록", f"{sum(row['memory_kb'] for row in rows):.0f} KB")
+col4.metric("디스크로 내보낸 기록", f"{sum(row['disk_kb'] for row in rows):.0f} KB")
+
+st.subheader("세션별 사용량")
+if rows:
+    st.dataframe(
+        rows,
+        width="stretch",
+        column_config={
+            "session_id": "세션",
+            "name": "목록",
+            "entries": "전체 항목",
+            "in_memory": "메모리 항목",
+            "spilled": "디스크 항목",
+            "memory_kb": st.column_config.NumberColumn("메모리 (KB)", format="%.1f"),
+            "disk_kb": st.column_config.NumberColumn("디스크 (KB)", format="%.1f"),
+        },
+    )
+else:
+    st.write("집계할 세션 기록이 없습니다.")
+
+if st.button("새로고침"):
+    st.rerun()
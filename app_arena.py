@@ -0,0 +1,185 @@
+import streamlit as st
+import json
+from datetime import datetime
+from itertools import combinations
+from providers import MODEL_OPTIONS, generate_model_response_async, run_concurrently
+from ranking import new_ratings, record_vote, leaderboard
+
+# 페이지 설정을 와이드 모드로 변경하고 한글 폰트 지원
+st.set_page_config(layout="wide", page_title="Chatbot Arena (N-모델)", page_icon="🏟️")
+st.markdown("""
+    <style>
+        @import url('https://fonts.googleapis.com/css2?family=Noto+Sans+KR&display=swap');
+        html, body, [class*="css"] {
+            font-family: 'Noto Sans KR', sans-serif;
+        }
+    </style>
+    """, unsafe_allow_html=True)
+
+# 세션 상태 초기화
+if 'arena_configs' not in st.session_state:
+    st.session_state.arena_configs = [
+        {"name": "gpt-4o-mini", "model": "gpt-4o-mini", "temperature": 0.7, "max_tokens": 256, "top_p": 1.0},
+        {"name": "gpt-4o", "model": "gpt-4o", "temperature": 0.7, "max_tokens": 256, "top_p": 1.0},
+        {"name": "ClovaX", "model": "ClovaX", "temperature": 0.7, "max_tokens": 256, "top_p": 1.0},
+    ]
+if 'arena_system_prompt' not in st.session_state:
+    st.session_state.arena_system_prompt = '당신은 도움이 되는 AI입니다.'
+if 'arena_rounds' not in st.session_state:
+    st.session_state.arena_rounds = []
+if 'arena_votes' not in st.session_state:
+    st.session_state.arena_votes = []
+if 'arena_ratings' not in st.session_state:
+    st.session_state.arena_ratings = new_ratings()
+
+# 모든 모델 설정에 같은 입력을 동시에 보내는 함수
+def run_arena_round(configs, system_prompt, user_input):
+    responses = run_concurrently(
+        generate_model_response_async(
+            config["model"],
+            system_prompt,
+            user_input,
+            config["temperature"],
+            config["max_tokens"],
+            config["top_p"],
+        )
+        for config in configs
+    )
+    return {
+        "round": len(st.session_state.arena_rounds) + 1,
+        "user_input": user_input,
+        "system_prompt": system_prompt,
+        "configs": configs,
+        "responses": {config["name"]: response for config, response in zip(configs, responses)},
+    }
+
+# 투표를 기록하고 레이팅을 갱신하는 함수
+def submit_vote(round_number, model_a, model_b, outcome):
+    record_vote(st.session_state.arena_ratings, model_a, model_b, outcome)
+    st.session_state.arena_votes.append({
+        "round": round_number,
+        "model_a": model_a,
+        "model_b": model_b,
+        "outcome": outcome,
+        "timestamp": datetime.now().isoformat(),
+    })
+
+# 제목 및 설명
+st.title("Chatbot Arena (N-모델)")
+
+# 메인 레이아웃
+col1, col2 = st.columns([3, 1])
+
+# 설정 및 입력 부분 (오른쪽 칼럼)
+with col2:
+    st.subheader("설정 및 입력")
+    tab1, tab2 = st.tabs(["채팅 인터페이스", "모델 설정"])
+
+    # 모델 설정 탭
+    with tab2:
+        st.write("행을 추가/삭제하여 비교할 모델 설정을 관리합니다. 이름은 리더보드의 키로 사용되므로 서로 달라야 합니다.")
+        edited_configs = st.data_editor(
+            st.session_state.arena_configs,
+            num_rows="dynamic",
+            key="arena_config_editor",
+            column_config={
+                "name": st.column_config.TextColumn("이름", required=True),
+                "model": st.column_config.SelectboxColumn("모델", options=MODEL_OPTIONS, required=True),
+                "temperature": st.column_config.NumberColumn("Temperature", min_value=0.0, max_value=1.0, step=0.1, default=0.7),
+                "max_tokens": st.column_config.NumberColumn("Max Tokens", min_value=50, max_value=2048, step=1, default=256),
+                "top_p": st.column_config.NumberColumn("Top P", min_value=0.0, max_value=1.0, step=0.1, default=1.0),
+            },
+        )
+        configs = [config for config in edited_configs if config.get("name") and config.get("model")]
+        names = [config["name"] for config in configs]
+        if len(set(names)) != len(names):
+            st.error("모델 설정 이름이 중복되었습니다.")
+
+    # 채팅 인터페이스 탭
+    with tab1:
+        st.session_state.arena_system_prompt = st.text_area("시스템 프롬프트", value=st.session_state.arena_system_prompt)
+        user_input = st.text_input("사용자 입력", key="arena_user_input")
+
+        if st.button("전송"):
+            if not user_input:
+                st.write("사용자 입력을 입력해주세요.")
+            elif len(configs) < 2:
+                st.write("모델 설정을 두 개 이상 추가해주세요.")
+            elif len(set(names)) != len(names):
+                st.write("모델 설정 이름을 서로 다르게 지정해주세요.")
+            else:
+                st.session_state.arena_configs = configs
+                with st.spinner(f"{len(configs)}개 모델에 동시에 요청하는 중..."):
+                    arena_round = run_arena_round(configs, st.session_state.arena_system_prompt, user_input)
+                st.session_state.arena_rounds.append(arena_round)
+
+# 결과 표시 부분 (왼쪽 칼럼)
+with col1:
+    st.subheader("리더보드")
+    st.caption(f"총 {st.session_state.arena_ratings['num_votes']}건의 투표 · 점수는 Bradley-Terry 근사(Glicko)이며 95% 신뢰구간을 함께 표시합니다.")
+    st.dataframe(
+        leaderboard(st.session_state.arena_ratings, [config["name"] for config in st.session_state.arena_configs]),
+        column_order=("rank", "model", "rating", "ci_lower", "ci_upper", "elo", "games", "wins", "losses", "ties"),
+        hide_index=True,
+        width="stretch",
+    )
+
+    if st.session_state.arena_rounds:
+        arena_round = st.session_state.arena_rounds[-1]
+        st.subheader(f"라운드 #{arena_round['round']} 응답 비교")
+        st.write(f"**사용자:** {arena_round['user_input']}")
+
+        response_items = list(arena_round["responses"].items())
+        for start in range(0, len(response_items), 3):
+            row_cols = st.columns(3)
+            for col, (name, response) in zip(row_cols, response_items[start:start + 3]):
+                with col:
+                    st.markdown(f"""
+                    <div style="border:1px solid #ddd; padding:10px; border-radius:5px;">
+                        <h4 style="margin-top:0;">{name}</h4>
+                        <p>{response}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+
+        # 쌍별 선호 투표 (이번 라운드에서 아직 투표하지 않은 쌍만 제시)
+        st.subheader("선호 투표")
+        voted_pairs = {
+            frozenset((vote["model_a"], vote["model_b"]))
+            for vote in st.session_state.arena_votes
+            if vote["round"] == arena_round["round"]
+        }
+        pending_pairs = [
+            pair for pair in combinations(arena_round["responses"].keys(), 2)
+            if frozenset(pair) not in voted_pairs
+        ]
+        if pending_pairs:
+            pair = st.selectbox(
+                f"비교할 쌍 (남은 쌍 {len(pending_pairs)}개)",
+                pending_pairs,
+                format_func=lambda pair: f"{pair[0]}  vs  {pair[1]}",
+                key=f"arena_pair_{arena_round['round']}",
+            )
+            vote_cols = st.columns(3)
+            for vote_col, (label, outcome) in zip(vote_cols, [(f"{pair[0]} 승", 1.0), ("무승부", 0.5), (f"{pair[1]} 승", 0.0)]):
+                if vote_col.button(label, key=f"arena_vote_{outcome}", width="stretch"):
+                    submit_vote(arena_round["round"], pair[0], pair[1], outcome)
+                    st.rerun()
+        else:
+            st.write("이번 라운드의 모든 쌍에 투표했습니다. 새 입력을 전송해주세요.")
+
+    # 투표 기록 및 리더보드 JSON 다운로드 버튼
+    if st.session_state.arena_votes:
+        arena_data = {
+            "system_prompt": st.session_state.arena_system_prompt,
+            "configs": st.session_state.arena_configs,
+            "rounds": st.session_state.arena_rounds,
+            "votes": st.session_state.arena_votes,
+            "leaderboard": leaderboard(st.session_state.arena_ratings),
+        }
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        st.download_button(
+            label="투표 기록 JSON 다운로드",
+            data=json.dumps(arena_data, ensure_ascii=False, indent=2),
+            file_name=f"arena_results_{timestamp}.json",
+            mime="application/json"
+        )
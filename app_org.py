@@ -1,51 +1,25 @@
 import streamlit as st
 import json
 from datetime import datetime
-from openai import OpenAI
 import os
 from dotenv import load_dotenv
-import requests
+from lazy_imports import lazy_import
+from providers import generate_model_result_async, CancellableRun
+from hedging import render_controls as render_hedging_controls
+from run_control import StopControl, save_status, render_status
+from session_store import session_list, page_key
 import json
 
 # .env 파일 로드
 load_dotenv()
 
-# OpenAI 클라이언트 초기화 (API 키가 없으면 None으로 설정)
+# OpenAI API 키 로드 (키 상태 표시용, 실제 호출은 providers 모듈에서 처리)
 api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key) if api_key else None
 
 # Clova API 키 로드
 clova_api_key = os.getenv("CLOVA_API_KEY")
 clova_apigw_key = os.getenv("CLOVA_APIGW_KEY")
 
-# Clova API 호출 함수
-def generate_clova_response(system_prompt, user_input, max_tokens, temperature, top_p):
-    api_url = "https://clovastudio.stream.ntruss.com/testapp/v1/chat-completions/HCX-DASH-001"
-    headers = {
-        "Content-Type": "application/json",
-        "X-NCP-CLOVASTUDIO-API-KEY": clova_api_key,
-        "X-NCP-APIGW-API-KEY": clova_apigw_key,
-        'X-NCP-CLOVASTUDIO-REQUEST-ID': '35c5350c-355d-4e46-a8d7-8b80a5c70c6f'
-    }
-    data = {
-        "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_input}
-                ],
-        "maxTokens": max_tokens,
-        "temperature": temperature,
-        "topP": top_p,
-        "n": 1,
-        "echo": False
-    }
-    
-    response = requests.post(api_url, headers=headers, data=json.dumps(data))
-    if response.status_code == 200:
-        result = response.json()['result']
-        return result['message']['content']
-    else:
-        return f"Error: {response.status_code}, {response.text}"
-
 # 페이지 설정을 와이드 모드로 변경하고 한글 폰트 지원
 st.set_page_config(layout="wide", page_title="AB Test Tool", page_icon="🤖")
 st.markdown("""
@@ -57,74 +31,54 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# 세션 상태 초기화
-if 'test_results' not in st.session_state:
-    st.session_state.test_results = []
-if 'current_settings' not in st.session_state:
-    st.session_state.current_settings = {
-        'model_a': 'gpt-3.5-turbo',
-        'model_b': 'gpt-3.5-turbo',
-        'temperature_a': 0.7,
-        'temperature_b': 0.7,
-        'max_tokens_a': 256,
-        'max_tokens_b': 256,
-        'top_p_a': 1.0,
-        'top_p_b': 1.0,
-        'system_prompt': '당신은 도움이 되는 AI입니다.',
-    }
-
-# 모델 응답을 생성하는 함수
-def generate_model_response(model, system_prompt, user_input, temperature, max_tokens, top_p):
-    if model == "ClovaX":
-        return generate_clova_response(system_prompt, user_input, max_tokens, temperature, top_p)
-    elif client is None:
-        return "OpenAI API 키가 설정되지 않았습니다. .env 파일에 OPENAI_API_KEY를 추가해주세요."
-    else:
-        try:
-            completion = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_input}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=top_p
-            )
-            return completion.choices[0].message.content
-        except Exception as e:
-            return f"Error: {str(e)}"
+# 세션 상태 초기화 (멀티페이지 앱의 다른 페이지와 섞이지 않도록 키에 페이지 이름을 붙임)
+PAGE = "app_org.py"
+test_results = session_list(page_key(PAGE, 'test_results'))  # 메모리 한도를 넘으면 오래된 결과부터 디스크로 내보냄
+current_settings = st.session_state.setdefault(page_key(PAGE, 'current_settings'), {
+    'model_a': 'gpt-3.5-turbo',
+    'model_b': 'gpt-3.5-turbo',
+    'temperature_a': 0.7,
+    'temperature_b': 0.7,
+    'max_tokens_a': 256,
+    'max_tokens_b': 256,
+    'top_p_a': 1.0,
+    'top_p_b': 1.0,
+    'system_prompt': '당신은 도움이 되는 AI입니다.',
+})
 
 # 결과를 JSON 파일로 저장하는 함수
 def save_results_to_json():
-    if st.session_state.test_results:
+    if test_results:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"test_results_{timestamp}.json"
         
         # 새로운 JSON 구조 생성
         json_data = {
-            "system_prompt": st.session_state.current_settings['system_prompt'],
-            "user_input": st.session_state.test_results[0]['user_input'],
+            "system_prompt": current_settings['system_prompt'],
+            "user_input": test_results[0]['user_input'],
             "settings": {
                 "model_a": {
-                    "name": st.session_state.current_settings['model_a'],
-                    "temperature": st.session_state.current_settings['temperature_a'],
-                    "max_tokens": st.session_state.current_settings['max_tokens_a'],
-                    "top_p": st.session_state.current_settings['top_p_a'],
+                    "name": current_settings['model_a'],
+                    "temperature": current_settings['temperature_a'],
+                    "max_tokens": current_settings['max_tokens_a'],
+                    "top_p": current_settings['top_p_a'],
                 },
                 "model_b": {
-                    "name": st.session_state.current_settings['model_b'],
-                    "temperature": st.session_state.current_settings['temperature_b'],
-                    "max_tokens": st.session_state.current_settings['max_tokens_b'],
-                    "top_p": st.session_state.current_settings['top_p_b'],
+                    "name": current_settings['model_b'],
+                    "temperature": current_settings['temperature_b'],
+                    "max_tokens": current_settings['max_tokens_b'],
+                    "top_p": current_settings['top_p_b'],
                 }
             },
+            "partial": st.session_state.get(page_key(PAGE, 'run_status'), {}).get('partial', False),
             "results": [
                 {
                     "test_number": result['test_number'],
                     "model_a_response": result['model_a_response'],
-                    "model_b_response": result['model_b_response']
-                } for result in st.session_state.test_results
+                    "model_b_response": result['model_b_response'],
+                    "model_a_latency": result.get('model_a_latency'),
+                    "model_b_latency": result.get('model_b_latency'),
+                } for result in test_results
             ]
         }
         
@@ -134,6 +88,30 @@ def save_results_to_json():
     else:
         st.warning("저장할 테스트 결과가 없습니다.")
 
+# 모델별 반복 응답 일관성 지표 계산 함수 (같은 응답 묶음은 다시 계산하지 않음)
+# numpy 를 쓰는 metrics 모듈은 결과가 있을 때만 불러와 첫 화면 표시를 늦추지 않는다
+@st.cache_data(show_spinner=False)
+def compute_consistency_metrics(responses):
+    return lazy_import("metrics").consistency_metrics(responses)
+
+# 모델별 반복 응답 일관성 지표 표시 함수
+def render_consistency_metrics():
+    st.subheader("반복 응답 일관성 지표")
+    metric_cols = st.columns(2)
+    for col, model_key in [(metric_cols[0], 'model_a'), (metric_cols[1], 'model_b')]:
+        responses = tuple(result[f'{model_key}_response'] for result in test_results)
+        metrics = compute_consistency_metrics(responses)
+        with col:
+            st.markdown(f"**{current_settings[model_key]}** ({metrics['num_responses']}개 응답)")
+            if metrics['mean_jaccard'] is None:
+                st.caption("유사도 지표는 테스트 횟수가 2회 이상일 때 계산됩니다.")
+            else:
+                st.metric("평균 Jaccard 유사도 (MinHash)", f"{metrics['mean_jaccard']:.3f}")
+                st.metric("평균 코사인 유사도 (문자 n-gram)", f"{metrics['mean_cosine']:.3f}")
+            st.metric("중복 응답 비율", f"{metrics['duplicate_rate']:.1%}", help=f"유사 중복 비율: {metrics['near_duplicate_rate']:.1%}")
+            length = metrics['length']
+            st.caption(f"응답 길이 (문자): 평균 {length['mean']:.0f} ± {length['std']:.0f}, 중앙값 {length['median']:.0f}, 범위 {length['min']}–{length['max']}")
+
 # 제목 및 설명
 st.title("Chatbot Arena")
 
@@ -148,14 +126,15 @@ with col1:
     st.write("3. 결과를 확인 및 저장하려면 결과 저장 옵션을 선택시 저장 및 결과가 출력됩니다.")
     st.write("4. 결과는 테스트 횟수만큼 출력되며, 테스트 횟수는 최대 30회까지 설정할 수 있습니다. 가장 마지막으로 수행된 테스트 결과 묶음이 저장됩니다.")
     st.subheader("모델 응답 비교")
+    render_status("개 테스트", key=page_key(PAGE, "run_status"))
     
 
     
     # 저장 옵션
     save_option = st.checkbox("결과 저장", value=False)
     
-    if st.session_state.test_results:
-        for test_result in st.session_state.test_results:
+    if test_results:
+        for test_result in test_results:
             st.write(f"**사용자:** {test_result['user_input']}")
             st.write(f"**테스트 #{test_result['test_number']}**")
             subcol1, subcol2 = st.columns(2)
@@ -163,11 +142,12 @@ with col1:
                 with col:
                     st.markdown(f"""
                     <div style="border:1px solid #ddd; padding:10px; border-radius:5px;">
-                        <h4 style="margin-top:0;">{st.session_state.current_settings[model_key]}</h4>
+                        <h4 style="margin-top:0;">{current_settings[model_key]}</h4>
                         <p>{test_result[f'{model_key}_response']}</p>
                     </div>
                     """, unsafe_allow_html=True)
             st.write("---")
+        render_consistency_metrics()
     
     if save_option:
         save_results_to_json()
@@ -188,47 +168,68 @@ with col2:
         st.warning("Clova API 키가 설정되지 않았습니다. .env 파일에 CLOVA_API_KEY와 CLOVA_APIGW_KEY를 추가해주세요.")
     # 테스트 횟수 설정
     num_tests = st.number_input("테스트 횟수", min_value=1, max_value=30, value=1, step=1)
+    hedge = render_hedging_controls()
     tab1, tab2 = st.tabs(["채팅 인터페이스", "모델 설정"])
     
     # 채팅 인터페이스 탭
     with tab1:
-        st.session_state.current_settings['system_prompt'] = st.text_area("시스템 프롬프트", value=st.session_state.current_settings['system_prompt'])
-        user_input = st.text_input("사용자 입력", key="user_input")
+        current_settings['system_prompt'] = st.text_area("시스템 프롬프트", value=current_settings['system_prompt'])
+        user_input = st.text_input("사용자 입력", key=page_key(PAGE, "user_input"))
 
         # 대화 처리
         if st.button("전송"):
             if user_input:
-                st.session_state.test_results = []
+                new_results = []
+                pending_calls = []
                 for test_num in range(num_tests):
                     test_result = {
                         "test_number": test_num + 1,
                         "user_input": user_input,
-                        "system_prompt": st.session_state.current_settings['system_prompt'],
+                        "system_prompt": current_settings['system_prompt'],
                     }
+                    new_results.append(test_result)
                     for model_key in ['model_a', 'model_b']:
-                        response = generate_model_response(
-                            st.session_state.current_settings[model_key],
-                            st.session_state.current_settings['system_prompt'],
-                            user_input,
-                            st.session_state.current_settings[f'temperature_{model_key[-1]}'],
-                            st.session_state.current_settings[f'max_tokens_{model_key[-1]}'],
-                            st.session_state.current_settings[f'top_p_{model_key[-1]}'],
-                        )
-                        test_result[f"{model_key}_response"] = response
-                    st.session_state.test_results.append(test_result)
+                        pending_calls.append((test_result, model_key))
+                # 모든 테스트의 모델 A/B 호출을 동시에 실행 (중지하면 남은 호출을 취소하고 끝난 테스트만 남김)
+                stop_control = StopControl("모델 응답 생성 중")
+                run = CancellableRun(
+                    generate_model_result_async(
+                        current_settings[model_key],
+                        current_settings['system_prompt'],
+                        user_input,
+                        current_settings[f'temperature_{model_key[-1]}'],
+                        current_settings[f'max_tokens_{model_key[-1]}'],
+                        current_settings[f'top_p_{model_key[-1]}'],
+                        hedge=hedge,
+                    )
+                    for _, model_key in pending_calls
+                )
+                try:
+                    run.wait(stop_control.update)
+                    stop_control.finish()
+                finally:
+                    for (test_result, model_key), result, finished in zip(pending_calls, run.results, run.finished):
+                        if finished:
+                            test_result[f"{model_key}_response"] = result["content"]
+                            test_result[f"{model_key}_latency"] = result["latency"]
+                    completed_results = [result for result in new_results if 'model_a_response' in result and 'model_b_response' in result]
+                    # 응답이 채워진 테스트로 세션 결과를 교체 (저장소에 추가된 결과는 더 이상 바꾸지 않음)
+                    test_results.clear()
+                    test_results.extend(completed_results)
+                    save_status(len(completed_results), num_tests, key=page_key(PAGE, "run_status"))
             else:
                 st.write("사용자 입력을 입력해주세요.")
 
     # 모델 설정 탭
     with tab2:
         st.subheader("모델 A 설정")
-        st.session_state.current_settings['model_a'] = st.selectbox("모델 A 선택", ("gpt-4o", "gpt-4o-mini", "ClovaX"), key="model_a")
-        st.session_state.current_settings['temperature_a'] = st.slider("Temperature (모델 A)", 0.0, 1.0, st.session_state.current_settings['temperature_a'], key="temperature_a")
-        st.session_state.current_settings['max_tokens_a'] = st.slider("Max Tokens (모델 A)", 50, 2048, st.session_state.current_settings['max_tokens_a'], key="max_tokens_a")
-        st.session_state.current_settings['top_p_a'] = st.slider("Top P (모델 A)", 0.0, 1.0, st.session_state.current_settings['top_p_a'], key="top_p_a")
+        current_settings['model_a'] = st.selectbox("모델 A 선택", ("gpt-4o", "gpt-4o-mini", "ClovaX"), key=page_key(PAGE, "model_a"))
+        current_settings['temperature_a'] = st.slider("Temperature (모델 A)", 0.0, 1.0, current_settings['temperature_a'], key=page_key(PAGE, "temperature_a"))
+        current_settings['max_tokens_a'] = st.slider("Max Tokens (모델 A)", 50, 2048, current_settings['max_tokens_a'], key=page_key(PAGE, "max_tokens_a"))
+        current_settings['top_p_a'] = st.slider("Top P (모델 A)", 0.0, 1.0, current_settings['top_p_a'], key=page_key(PAGE, "top_p_a"))
 
         st.subheader("모델 B 설정")
-        st.session_state.current_settings['model_b'] = st.selectbox("모델 B 선택", ("gpt-4o", "gpt-4o-mini", "ClovaX"), key="model_b")
-        st.session_state.current_settings['temperature_b'] = st.slider("Temperature (모델 B)", 0.0, 1.0, st.session_state.current_settings['temperature_b'], key="temperature_b")
-        st.session_state.current_settings['max_tokens_b'] = st.slider("Max Tokens (모델 B)", 50, 2048, st.session_state.current_settings['max_tokens_b'], key="max_tokens_b")
-        st.session_state.current_settings['top_p_b'] = st.slider("Top P (모델 B)", 0.0, 1.0, st.session_state.current_settings['top_p_b'], key="top_p_b")
\ No newline at end of file
+        current_settings['model_b'] = st.selectbox("모델 B 선택", ("gpt-4o", "gpt-4o-mini", "ClovaX"), key=page_key(PAGE, "model_b"))
+        current_settings['temperature_b'] = st.slider("Temperature (모델 B)", 0.0, 1.0, current_settings['temperature_b'], key=page_key(PAGE, "temperature_b"))
+        current_settings['max_tokens_b'] = st.slider("Max Tokens (모델 B)", 50, 2048, current_settings['max_tokens_b'], key=page_key(PAGE, "max_tokens_b"))
+        current_settings['top_p_b'] = st.slider("Top P (모델 B)", 0.0, 1.0, current_settings['top_p_b'], key=page_key(PAGE, "top_p_b"))
\ No newline at end of file
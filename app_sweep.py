@@ -0,0 +1,153 @@
+import streamlit as st
+import json
+import altair as alt
+import pandas as pd
+from datetime import datetime
+from providers import MODEL_OPTIONS
+from sweep import SWEEP_PARAMETERS, parse_values, expand_grid, run_sweep, enqueue_sweep, collect_sweep
+from work_queue import get_queue, format_progress
+
+# 페이지 설정을 와이드 모드로 변경하고 한글 폰트 지원
+st.set_page_config(layout="wide", page_title="파라미터 스윕", page_icon="🧪")
+st.markdown("""
+    <style>
+        @import url('https://fonts.googleapis.com/css2?family=Noto+Sans+KR&display=swap');
+        html, body, [class*="css"] {
+            font-family: 'Noto Sans KR', sans-serif;
+        }
+    </style>
+    """, unsafe_allow_html=True)
+
+METRIC_LABELS = {"latency": "지연 시간 (초)", "length": "응답 길이 (문자)", "score": "기준 답변 유사도"}
+PARAMETER_LABELS = {"model": "모델", "temperature": "Temperature", "top_p": "Top P", "max_tokens": "Max Tokens"}
+QUEUE_POLL_INTERVAL = "2s"
+
+# 세션 상태 초기화
+if 'sweep_results' not in st.session_state:
+    st.session_state.sweep_results = []
+if 'sweep_settings' not in st.session_state:
+    st.session_state.sweep_settings = {}
+if 'sweep_batch' not in st.session_state:
+    st.session_state.sweep_batch = None
+
+# 제목 및 설명
+st.title("파라미터 스윕")
+
+# 메인 레이아웃
+col1, col2 = st.columns([3, 1])
+
+# 설정 및 입력 부분 (오른쪽 칼럼)
+with col2:
+    st.subheader("스윕 설정")
+    st.caption("값은 쉼표로 구분한 목록(예: 0.2, 0.7) 또는 시작:끝:간격 범위(예: 0.0:1.0:0.25)로 입력합니다.")
+    models = st.multiselect("모델", MODEL_OPTIONS, default=["gpt-4o-mini"])
+    temperature_text = st.text_input("Temperature", value="0.0:1.0:0.25")
+    top_p_text = st.text_input("Top P", value="0.2:1.0:0.2")
+    max_tokens_text = st.text_input("Max Tokens", value="256")
+
+    try:
+        cells = expand_grid(
+            models,
+            parse_values(temperature_text),
+            parse_values(top_p_text),
+            parse_values(max_tokens_text, int),
+        )
+    except ValueError as e:
+        cells = []
+        st.error(f"값을 해석할 수 없습니다: {e}")
+    st.write(f"실행할 셀: **{len(cells)}개**")
+
+    system_prompt = st.text_area("시스템 프롬프트", value="당신은 도움이 되는 AI입니다.")
+    user_input = st.text_input("사용자 입력", key="sweep_user_input")
+    reference_answer = st.text_area("기준 답변 (선택)", help="입력하면 각 응답과의 문자 n-gram 코사인 유사도를 점수로 계산합니다.")
+
+    use_queue = st.checkbox("작업 큐로 실행", help="셀을 작업 큐에 넣고 워커 프로세스가 실행합니다. "
+                                                 "워커 실행: python work_queue.py worker --concurrency 16")
+
+    if st.button("스윕 실행"):
+        if not user_input:
+            st.write("사용자 입력을 입력해주세요.")
+        elif not cells:
+            st.write("실행할 셀이 없습니다.")
+        else:
+            st.session_state.sweep_settings = {
+                "system_prompt": system_prompt,
+                "user_input": user_input,
+                "reference_answer": reference_answer,
+            }
+            if use_queue:
+                st.session_state.sweep_results = []
+                st.session_state.sweep_batch = enqueue_sweep(get_queue(), cells, system_prompt, user_input)
+            else:
+                st.session_state.sweep_batch = None
+                with st.spinner(f"{len(cells)}개 셀을 동시에 실행하는 중..."):
+                    st.session_state.sweep_results = run_sweep(cells, system_prompt, user_input, reference_answer)
+
+    # 큐로 실행한 스윕의 진행 상황 (QUEUE_POLL_INTERVAL 마다 이 부분만 갱신하고, 모두 끝나면 결과를 모아 전체를 다시 그림)
+    @st.fragment(run_every=QUEUE_POLL_INTERVAL)
+    def queue_progress():
+        batch = st.session_state.sweep_batch
+        counts = get_queue().progress(batch)
+        st.progress(counts["finished"] / counts["total"] if counts["total"] else 0.0,
+                    text=f"작업 큐 {batch}: {format_progress(counts)}")
+        if counts["finished"] >= counts["total"]:
+            st.session_state.sweep_results = collect_sweep(
+                get_queue(), batch, st.session_state.sweep_settings.get("reference_answer", "")
+            )
+            st.session_state.sweep_batch = None
+            st.rerun(scope="app")
+        elif counts["leased"] == 0 and counts["done"] == 0:
+            st.caption("처리 중인 작업이 없습니다. 워커가 실행 중인지 확인해주세요.")
+
+    if st.session_state.sweep_batch:
+        queue_progress()
+
+# 결과 표시 부분 (왼쪽 칼럼)
+with col1:
+    st.subheader("셀별 결과 히트맵")
+    if st.session_state.sweep_results:
+        results = pd.DataFrame(st.session_state.sweep_results)
+        metric_options = [metric for metric in METRIC_LABELS if metric in results.columns]
+        axis_cols = st.columns(3)
+        x_param = axis_cols[0].selectbox("가로축", SWEEP_PARAMETERS, index=1, format_func=PARAMETER_LABELS.get)
+        y_param = axis_cols[1].selectbox("세로축", SWEEP_PARAMETERS, index=2, format_func=PARAMETER_LABELS.get)
+        metric = axis_cols[2].selectbox("지표", metric_options, format_func=METRIC_LABELS.get)
+
+        if x_param == y_param:
+            st.warning("가로축과 세로축을 서로 다르게 선택해주세요.")
+        else:
+            # 축에 포함되지 않은 파라미터는 평균으로 합쳐서 표시
+            grid = results.groupby([x_param, y_param], as_index=False)[metric].mean()
+            heatmap = alt.Chart(grid).mark_rect().encode(
+                x=alt.X(f"{x_param}:O", title=PARAMETER_LABELS[x_param]),
+                y=alt.Y(f"{y_param}:O", title=PARAMETER_LABELS[y_param]),
+                color=alt.Color(f"{metric}:Q", title=METRIC_LABELS[metric]),
+                tooltip=[x_param, y_param, alt.Tooltip(f"{metric}:Q", format=".3f")],
+            )
+            labels = heatmap.mark_text(baseline="middle").encode(
+                text=alt.Text(f"{metric}:Q", format=".2f"),
+                color=alt.value("black"),
+            )
+            st.altair_chart(heatmap + labels, width="stretch")
+
+        st.subheader("셀별 응답")
+        st.dataframe(
+            results,
+            column_order=(*SWEEP_PARAMETERS, *metric_options, "response"),
+            hide_index=True,
+            width="stretch",
+        )
+
+        sweep_data = {
+            **st.session_state.sweep_settings,
+            "results": st.session_state.sweep_results,
+        }
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        st.download_button(
+            label="스윕 결과 JSON 다운로드",
+            data=json.dumps(sweep_data, ensure_ascii=False, indent=2),
+            file_name=f"sweep_results_{timestamp}.json",
+            mime="application/json"
+        )
+    else:
+        st.write("아직 실행한 스윕이 없습니다.")
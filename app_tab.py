@@ -1,13 +1,67 @@
+import asyncio
 import streamlit as st
+from providers import generate_model_response as generate_provider_response
+from providers import generate_model_response_async, get_event_loop
+from session_store import page_key
 
-# 모델 응답을 생성하는 함수
+# 미리 생성 모드에서 입력이 이 시간 동안 바뀌지 않으면 입력값을 확정하고 응답 생성을 시작
+PREFETCH_DEBOUNCE = "600ms"
+
+# 세션 상태와 위젯 키에는 멀티페이지 앱의 다른 페이지와 섞이지 않도록 페이지 이름을 붙임
+PAGE = "app_tab.py"
+USER_INPUT_KEY = page_key(PAGE, "user_input")
+RESPONSES_KEY = page_key(PAGE, "responses")
+PREFETCH_KEY = page_key(PAGE, "prefetch")
+PREFETCH_HITS_KEY = page_key(PAGE, "prefetch_hits")
+PROCESSED_INPUT_KEY = page_key(PAGE, "processed_input")
+SYSTEM_PROMPT_KEY = page_key(PAGE, "system_prompt")
+
+# 모델 응답을 생성하는 함수 (같은 입력과 설정으로 다시 그릴 때는 저장된 응답을, 미리 생성 중인 요청이 있으면 그 결과를 사용)
 def generate_model_response(model, system_prompt, user_input, temperature, max_tokens):
-    # TODO: 실제 모델 API 호출 및 응답 처리 로직 구현
-    pass
+    request_key = (model, system_prompt, user_input, temperature, max_tokens)
+    responses = st.session_state.setdefault(RESPONSES_KEY, {})
+    if request_key not in responses:
+        prefetched = st.session_state.setdefault(PREFETCH_KEY, {}).pop(request_key, None)
+        if prefetched is not None and not prefetched.cancelled():
+            responses[request_key] = prefetched.result()
+            st.session_state[PREFETCH_HITS_KEY] = st.session_state.get(PREFETCH_HITS_KEY, 0) + 1
+        else:
+            responses[request_key] = generate_provider_response(model, system_prompt, user_input, temperature, max_tokens, 1.0)
+    return responses[request_key]
+
+# 현재 입력과 설정으로 모델 A/B 응답을 백그라운드에서 미리 생성하는 함수
+# 입력이나 설정이 바뀌어 더 이상 필요 없는 요청은 취소하고, 이미 끝난 응답은 저장된 응답으로 옮겨 다시 쓸 수 있게 한다
+def prefetch_responses(request_keys):
+    prefetch = st.session_state.setdefault(PREFETCH_KEY, {})
+    responses = st.session_state.setdefault(RESPONSES_KEY, {})
+    for request_key in list(prefetch):
+        if request_key in request_keys:
+            continue
+        future = prefetch.pop(request_key)
+        if future.done() and not future.cancelled():
+            responses[request_key] = future.result()
+        else:
+            future.cancel()
+    for request_key in request_keys:
+        if request_key in responses or request_key in prefetch:
+            continue
+        model, system_prompt, user_input, temperature, max_tokens = request_key
+        prefetch[request_key] = asyncio.run_coroutine_threadsafe(
+            generate_model_response_async(model, system_prompt, user_input, temperature, max_tokens, 1.0),
+            get_event_loop(),
+        )
+
+# 지금 입력과 설정으로 만들 모델 A/B 요청 키
+def current_request_keys():
+    return [
+        (st.session_state[page_key(PAGE, f'model_{side}')], st.session_state[SYSTEM_PROMPT_KEY], st.session_state[USER_INPUT_KEY],
+         st.session_state[page_key(PAGE, f'temperature_{side}')], st.session_state[page_key(PAGE, f'max_tokens_{side}')])
+        for side in ('a', 'b')
+    ]
 
 # 사용자 입력 처리 함수
 def process_user_input():
-    st.session_state.processed_input = st.session_state.user_input
+    st.session_state[PROCESSED_INPUT_KEY] = st.session_state[USER_INPUT_KEY]
 
 # 메인 페이지
 st.title("Chatbot Arena")
@@ -15,31 +69,31 @@ st.write("챗봇 아레나 방식으로 두 개의 LLM을 비교해보세요.")
 
 # 결과 표시 부분
 st.subheader("모델 응답 비교")
-if 'processed_input' in st.session_state and st.session_state.processed_input:
-    st.write(f"**사용자:** {st.session_state.processed_input}")
+if st.session_state.get(PROCESSED_INPUT_KEY):
+    st.write(f"**사용자:** {st.session_state[PROCESSED_INPUT_KEY]}")
     
     col1, col2 = st.columns(2)
     with col1:
-        response_a = generate_model_response(st.session_state.get('model_a', '모델 A'), 
-                                             st.session_state.get('system_prompt', ''), 
-                                             st.session_state.processed_input, 
-                                             st.session_state.get('temperature_a', 0.7), 
-                                             st.session_state.get('max_tokens_a', 256))
+        response_a = generate_model_response(st.session_state.get(page_key(PAGE, 'model_a'), '모델 A'), 
+                                             st.session_state.get(SYSTEM_PROMPT_KEY, ''), 
+                                             st.session_state[PROCESSED_INPUT_KEY], 
+                                             st.session_state.get(page_key(PAGE, 'temperature_a'), 0.7), 
+                                             st.session_state.get(page_key(PAGE, 'max_tokens_a'), 256))
         st.markdown(f"""
         <div style="border:1px solid #ddd; padding:10px; border-radius:5px;">
-            <h4 style="margin-top:0;">{st.session_state.get('model_a', '모델 A')}</h4>
+            <h4 style="margin-top:0;">{st.session_state.get(page_key(PAGE, 'model_a'), '모델 A')}</h4>
             <p>{response_a or '모델 A의 응답이 여기에 표시됩니다.'}</p>
         </div>
         """, unsafe_allow_html=True)
     with col2:
-        response_b = generate_model_response(st.session_state.get('model_b', '모델 B'), 
-                                             st.session_state.get('system_prompt', ''), 
-                                             st.session_state.processed_input, 
-                                             st.session_state.get('temperature_b', 0.7), 
-                                             st.session_state.get('max_tokens_b', 256))
+        response_b = generate_model_response(st.session_state.get(page_key(PAGE, 'model_b'), '모델 B'), 
+                                             st.session_state.get(SYSTEM_PROMPT_KEY, ''), 
+                                             st.session_state[PROCESSED_INPUT_KEY], 
+                                             st.session_state.get(page_key(PAGE, 'temperature_b'), 0.7), 
+                                             st.session_state.get(page_key(PAGE, 'max_tokens_b'), 256))
         st.markdown(f"""
         <div style="border:1px solid #ddd; padding:10px; border-radius:5px;">
-            <h4 style="margin-top:0;">{st.session_state.get('model_b', '모델 B')}</h4>
+            <h4 style="margin-top:0;">{st.session_state.get(page_key(PAGE, 'model_b'), '모델 B')}</h4>
             <p>{response_b or '모델 B의 응답이 여기에 표시됩니다.'}</p>
         </div>
         """, unsafe_allow_html=True)
@@ -54,24 +108,41 @@ tab1, tab2 = st.sidebar.tabs(["채팅 인터페이스", "모델 설정"])
 
 # 채팅 인터페이스 탭
 with tab1:
-    system_prompt = st.text_area("시스템 프롬프트", value="당신은 도움이 되는 AI입니다.", key="system_prompt")
-    user_input = st.text_input("사용자 입력", key="user_input", on_change=process_user_input)
+    speculative = st.checkbox(
+        "입력 중 미리 생성", key=page_key(PAGE, "speculative"),
+        help="입력을 멈추면 전송 전에 모델 A/B 응답 생성을 시작해 전송 후 기다리는 시간을 줄입니다. "
+             "입력이 바뀌면 진행 중인 요청은 취소되지만 이미 보낸 요청의 비용은 발생할 수 있습니다. "
+             "이 모드에서는 Enter 대신 전송 버튼으로 보냅니다.",
+    )
+    system_prompt = st.text_area("시스템 프롬프트", value="당신은 도움이 되는 AI입니다.", key=SYSTEM_PROMPT_KEY)
+    if speculative:
+        # 입력을 멈출 때마다 값이 확정되어 다시 실행되고, 아래에서 그 입력으로 응답을 미리 생성
+        user_input = st.text_input("사용자 입력", key=USER_INPUT_KEY, live=PREFETCH_DEBOUNCE)
+    else:
+        user_input = st.text_input("사용자 입력", key=USER_INPUT_KEY, on_change=process_user_input)
 
-    # 대화 처리
-    if st.button("전송"):
-        if st.session_state.user_input:
-            process_user_input()
-        else:
+    # 대화 처리 (버튼 콜백에서 입력을 확정해 이번 실행에서 바로 결과를 표시)
+    if st.button("전송", on_click=process_user_input):
+        if not st.session_state[USER_INPUT_KEY]:
             st.write("사용자 입력을 입력해주세요.")
+    if speculative and st.session_state.get(PREFETCH_HITS_KEY):
+        st.caption(f"미리 생성된 응답 사용: {st.session_state[PREFETCH_HITS_KEY]}회")
 
 # 모델 설정 탭
 with tab2:
     st.subheader("모델 A 설정")
-    model_a = st.selectbox("모델 A 선택", ("gpt-3.5-turbo", "gpt-4o-mini", "ClovaX"), key="model_a")
-    temperature_a = st.slider("Temperature (모델 A)", 0.0, 1.0, 0.7, key="temperature_a")
-    max_tokens_a = st.slider("Max Tokens (모델 A)", 50, 1024, 256, key="max_tokens_a")
+    model_a = st.selectbox("모델 A 선택", ("gpt-3.5-turbo", "gpt-4o-mini", "ClovaX"), key=page_key(PAGE, "model_a"))
+    temperature_a = st.slider("Temperature (모델 A)", 0.0, 1.0, 0.7, key=page_key(PAGE, "temperature_a"))
+    max_tokens_a = st.slider("Max Tokens (모델 A)", 50, 1024, 256, key=page_key(PAGE, "max_tokens_a"))
 
     st.subheader("모델 B 설정")
-    model_b = st.selectbox("모델 B 선택", ("gpt-3.5-turbo", "gpt-4o-mini", "ClovaX"), key="model_b")
-    temperature_b = st.slider("Temperature (모델 B)", 0.0, 1.0, 0.7, key="temperature_b")
-    max_tokens_b = st.slider("Max Tokens (모델 B)", 50, 1024, 256, key="max_tokens_b")
\ No newline at end of file
+    model_b = st.selectbox("모델 B 선택", ("gpt-3.5-turbo", "gpt-4o-mini", "ClovaX"), key=page_key(PAGE, "model_b"))
+    temperature_b = st.slider("Temperature (모델 B)", 0.0, 1.0, 0.7, key=page_key(PAGE, "temperature_b"))
+    max_tokens_b = st.slider("Max Tokens (모델 B)", 50, 1024, 256, key=page_key(PAGE, "max_tokens_b"))
+
+# 미리 생성: 모든 설정 위젯을 그린 뒤 현재 입력으로 응답 생성을 시작
+# 입력이 비어 있거나 이미 보낸 입력이거나 모드가 꺼져 있으면 진행 중인 미리 생성 요청만 정리
+if speculative and st.session_state[USER_INPUT_KEY] and st.session_state[USER_INPUT_KEY] != st.session_state.get(PROCESSED_INPUT_KEY):
+    prefetch_responses(current_request_keys())
+else:
+    prefetch_responses([])
@@ -0,0 +1,206 @@
+import io
+import wave
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from providers import get_provider, get_event_loop, run_sync
+
+# 녹음/음성 인식 공통 도구 (디스크를 거치지 않는 WAV 인코딩, 에너지 기반 음성 구간 검출, 음성 인식 캐시)
+
+SAMPLE_WIDTH = 2  # 16비트 정수 샘플
+TRANSCRIBE_MODEL = "whisper-1"
+MAX_CACHED_TRANSCRIPTS = 256
+MAX_STITCH_OVERLAP_WORDS = 8
+
+_transcript_lock = threading.Lock()
+_transcripts = OrderedDict()
+
+
+# int16 샘플 배열을 메모리 안에서 WAV 바이트로 인코딩하는 함수
+def encode_wav(samples, rate, channels=1):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(SAMPLE_WIDTH)
+        wf.setframerate(rate)
+        wf.writeframes(np.ascontiguousarray(samples, dtype=np.int16).tobytes())
+    return buffer.getvalue()
+
+
+# WAV 바이트를 int16 샘플 배열과 샘플링 레이트로 읽는 함수 (여러 채널은 평균으로 합침)
+def decode_wav(wav_bytes):
+    with wave.open(io.BytesIO(wav_bytes), "rb") as wf:
+        if wf.getsampwidth() != SAMPLE_WIDTH:
+            raise ValueError("16비트 PCM WAV 파일만 지원합니다.")
+        channels = wf.getnchannels()
+        rate = wf.getframerate()
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, rate
+
+
+# 프레임별 에너지(dBFS)를 한 번에 계산하는 함수 (남는 샘플은 마지막 프레임으로 처리)
+def frame_energies_db(samples, frame_size):
+    samples = np.asarray(samples, dtype=np.int16)
+    if samples.size == 0:
+        return np.empty(0)
+    padded = np.zeros(-(-samples.size // frame_size) * frame_size, dtype=np.float32)
+    padded[:samples.size] = samples
+    frames = padded.reshape(-1, frame_size) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(rms + 1e-10)
+
+
+# 에너지 기반 음성 구간 검출기
+# 말이 시작되기 전 프레임으로 잡음 수준을 추정하고, 말이 시작된 뒤 silence_seconds 동안 조용하면 발화가 끝난 것으로 본다.
+class EnergyVAD:
+    def __init__(self, rate, frame_size, silence_seconds=0.8, max_seconds=15.0, no_speech_seconds=5.0,
+                 min_speech_seconds=0.2, margin_db=12.0, min_speech_db=-50.0):
+        self.frames_per_second = rate / frame_size
+        self.silence_frames = int(silence_seconds * self.frames_per_second)
+        self.max_frames = int(max_seconds * self.frames_per_second)
+        self.no_speech_frames = int(no_speech_seconds * self.frames_per_second)
+        self.min_speech_frames = max(1, int(min_speech_seconds * self.frames_per_second))
+        self.margin_db = margin_db
+        self.min_speech_db = min_speech_db
+        self.noise_floor_db = None
+        self.frames_seen = 0
+        self.speech_frames = 0
+        self.silent_run = 0
+        self.done = False
+
+    @property
+    def speech_started(self):
+        return self.speech_frames >= self.min_speech_frames
+
+    @property
+    def threshold_db(self):
+        if self.noise_floor_db is None:
+            return self.min_speech_db
+        return max(self.noise_floor_db + self.margin_db, self.min_speech_db)
+
+    # 프레임 하나(int16 배열)를 반영하고 음성 여부를 반환하는 함수
+    def update(self, frame):
+        energy = float(frame_energies_db(frame, max(1, len(frame)))[0]) if len(frame) else -200.0
+        is_speech = energy > self.threshold_db
+        self.frames_seen += 1
+        if is_speech:
+            self.speech_frames += 1
+            self.silent_run = 0
+        else:
+            self.silent_run += 1
+            if not self.speech_started:
+                # 말하기 전 구간은 잡음 수준 추정에 사용 (지수 이동 평균)
+                self.noise_floor_db = energy if self.noise_floor_db is None else 0.9 * self.noise_floor_db + 0.1 * energy
+                self.speech_frames = 0
+        if self.speech_started and self.silent_run >= self.silence_frames:
+            self.done = True
+        elif not self.speech_started and self.frames_seen >= self.no_speech_frames:
+            self.done = True
+        elif self.frames_seen >= self.max_frames:
+            self.done = True
+        return is_speech
+
+
+# 음성 데이터의 해시값 (음성 인식 캐시 키)
+def audio_hash(audio_bytes):
+    return hashlib.sha256(audio_bytes).hexdigest()
+
+
+def _cached_transcript(key):
+    with _transcript_lock:
+        if key in _transcripts:
+            _transcripts.move_to_end(key)
+            return _transcripts[key]
+    return None
+
+
+def _store_transcript(key, text):
+    with _transcript_lock:
+        _transcripts[key] = text
+        _transcripts.move_to_end(key)
+        while len(_transcripts) > MAX_CACHED_TRANSCRIPTS:
+            _transcripts.popitem(last=False)
+
+
+# 음성을 텍스트로 변환하는 함수 (같은 음성은 다시 요청하지 않고 캐시된 결과 사용)
+async def transcribe_audio_async(audio_bytes, filename="audio.wav"):
+    key = audio_hash(audio_bytes)
+    text = _cached_transcript(key)
+    if text is None:
+        text = await get_provider(TRANSCRIBE_MODEL).transcribe(audio_bytes, filename)
+        _store_transcript(key, text)
+    return text
+
+
+def transcribe_audio(audio_bytes, filename="audio.wav"):
+    return run_sync(transcribe_audio_async(audio_bytes, filename))
+
+
+# 앞 구간 끝과 다음 구간 시작에서 겹치는 단어를 한 번만 남기고 이어 붙이는 함수
+def stitch_transcripts(parts, max_overlap_words=MAX_STITCH_OVERLAP_WORDS):
+    words = []
+    for part in parts:
+        next_words = part.split()
+        overlap = 0
+        for size in range(min(max_overlap_words, len(words), len(next_words)), 0, -1):
+            if [w.strip(".,?!") for w in words[-size:]] == [w.strip(".,?!") for w in next_words[:size]]:
+                overlap = size
+                break
+        words.extend(next_words[overlap:])
+    return " ".join(words)
+
+
+# 녹음 중에 무음 지점마다 구간을 잘라 백그라운드에서 음성 인식을 요청하는 변환기
+# 각 구간은 앞 구간 끝을 overlap_seconds 만큼 겹쳐서 포함하므로 경계에서 단어가 잘리지 않는다.
+class StreamingTranscriber:
+    def __init__(self, rate, frame_size, channels=1, min_chunk_seconds=2.0, max_chunk_seconds=10.0,
+                 cut_silence_seconds=0.3, overlap_seconds=0.3):
+        frames_per_second = rate / frame_size
+        self.rate = rate
+        self.channels = channels
+        self.min_chunk_frames = max(1, int(min_chunk_seconds * frames_per_second))
+        self.max_chunk_frames = max(1, int(max_chunk_seconds * frames_per_second))
+        self.cut_silence_frames = max(1, int(cut_silence_seconds * frames_per_second))
+        self.overlap_frames = int(overlap_seconds * frames_per_second)
+        self.frames = []
+        self.chunk_start = 0
+        self.chunk_speech_frames = 0
+        self.silent_run = 0
+        self.futures = []
+
+    # 녹음된 프레임 하나와 음성 여부를 추가하는 함수
+    def add_frame(self, frame, is_speech):
+        self.frames.append(frame)
+        if is_speech:
+            self.chunk_speech_frames += 1
+            self.silent_run = 0
+        else:
+            self.silent_run += 1
+        length = len(self.frames) - self.chunk_start
+        if (length >= self.min_chunk_frames and self.silent_run >= self.cut_silence_frames) or length >= self.max_chunk_frames:
+            self._cut(len(self.frames))
+
+    def _cut(self, end):
+        # 음성이 없는 구간은 인식 요청 없이 건너뜀 (무음에서 엉뚱한 문장이 생성되는 것을 방지)
+        if self.chunk_speech_frames:
+            start = max(0, self.chunk_start - self.overlap_frames)
+            chunk = np.concatenate(self.frames[start:end])
+            coro = transcribe_audio_async(encode_wav(chunk, self.rate, self.channels), f"chunk_{len(self.futures)}.wav")
+            self.futures.append(asyncio.run_coroutine_threadsafe(coro, get_event_loop()))
+        self.chunk_start = end
+        self.chunk_speech_frames = 0
+
+    # 전체 녹음 샘플
+    @property
+    def samples(self):
+        return np.concatenate(self.frames) if self.frames else np.empty(0, dtype=np.int16)
+
+    # 남은 구간을 요청하고 모든 구간의 결과를 이어 붙여 반환하는 함수
+    def finish(self):
+        if len(self.frames) > self.chunk_start:
+            self._cut(len(self.frames))
+        return stitch_transcripts(future.result() for future in self.futures)
@@ -0,0 +1,176 @@
+import time
+import threading
+import numpy as np
+
+# 녹음 장치를 계속 열어 둔 채 백그라운드 스레드에서 오디오를 링 버퍼에 기록하는 캡처 서비스
+# - 링 버퍼는 같은 내용을 두 번(앞/뒤 절반) 기록하므로 길이가 용량 이하인 구간은 항상 연속된 numpy 뷰로 꺼낼 수 있다.
+# - 위치는 캡처 시작 이후 누적 샘플 수(절대 위치)로 표현하며, 용량보다 오래된 구간은 덮어써진다.
+
+DEFAULT_BUFFER_SECONDS = 60
+DEFAULT_FRAME_SIZE = 1024
+
+
+class RingBuffer:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros(capacity * 2, dtype=np.int16)
+        self.written = 0
+
+    # 샘플을 기록하는 함수 (용량보다 긴 입력은 마지막 부분만 남김)
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=np.int16)
+        if samples.size > self.capacity:
+            self.written += samples.size - self.capacity
+            samples = samples[-self.capacity:]
+        size = samples.size
+        pos = self.written % self.capacity
+        self.data[pos:pos + size] = samples
+        # 앞 절반에 쓴 부분은 뒤 절반에, 뒤 절반으로 넘친 부분은 앞 절반에 한 번 더 기록
+        front = min(size, self.capacity - pos)
+        self.data[pos + self.capacity:pos + self.capacity + front] = samples[:front]
+        if front < size:
+            self.data[:size - front] = samples[front:]
+        self.written += size
+
+    # 절대 위치 [start, end) 구간을 복사 없이 돌려주는 함수
+    def view(self, start, end):
+        if end > self.written:
+            raise ValueError("아직 기록되지 않은 구간입니다.")
+        if start < self.written - self.capacity:
+            raise ValueError("링 버퍼에서 이미 덮어쓴 구간입니다.")
+        pos = start % self.capacity
+        view = self.data[pos:pos + (end - start)]
+        view.flags.writeable = False
+        return view
+
+
+# 마이크 입력 (pyaudio 는 장치를 열 때만 불러온다)
+class PyAudioSource:
+    def __init__(self, rate=44100, channels=1):
+        self.rate = rate
+        self.channels = channels
+        self.audio = None
+        self.stream = None
+
+    def open(self, frame_size):
+        import pyaudio
+        self.audio = pyaudio.PyAudio()
+        self.stream = self.audio.open(format=pyaudio.paInt16,
+                                      channels=self.channels,
+                                      rate=self.rate,
+                                      input=True,
+                                      frames_per_buffer=frame_size)
+
+    def read(self, frame_size):
+        return np.frombuffer(self.stream.read(frame_size, exception_on_overflow=False), dtype=np.int16)
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+        if self.audio is not None:
+            self.audio.terminate()
+
+
+# 마이크 없이 테스트하기 위한 가짜 입력 (준비된 샘플을 실제 속도로 흘려보내고, 끝나면 무음을 보냄)
+class FakeAudioSource:
+    def __init__(self, samples, rate, channels=1, realtime=True, loop=False):
+        self.samples = np.asarray(samples, dtype=np.int16)
+        self.rate = rate
+        self.channels = channels
+        self.realtime = realtime
+        self.loop = loop
+        self.offset = 0
+
+    def open(self, frame_size):
+        self.offset = 0
+
+    def read(self, frame_size):
+        if self.realtime:
+            time.sleep(frame_size / self.rate)
+        if self.offset >= self.samples.size:
+            if not self.loop or self.samples.size == 0:
+                return np.zeros(frame_size, dtype=np.int16)
+            self.offset = 0
+        frame = self.samples[self.offset:self.offset + frame_size]
+        self.offset += frame_size
+        if frame.size < frame_size:
+            frame = np.concatenate([frame, np.zeros(frame_size - frame.size, dtype=np.int16)])
+        return frame
+
+    def close(self):
+        pass
+
+
+class CaptureService:
+    def __init__(self, source, frame_size=DEFAULT_FRAME_SIZE, buffer_seconds=DEFAULT_BUFFER_SECONDS):
+        self.source = source
+        self.rate = source.rate
+        self.channels = source.channels
+        self.frame_size = frame_size
+        self.buffer = RingBuffer(int(self.rate * buffer_seconds) * self.channels)
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+        self.error = None
+
+    # 장치를 열고 캡처 스레드를 시작하는 함수 (이미 실행 중이면 그대로 둠)
+    def start(self):
+        with self.condition:
+            if self.running:
+                return self
+            self.error = None
+            self.source.open(self.frame_size)
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+            self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            while self.running:
+                frame = self.source.read(self.frame_size)
+                with self.condition:
+                    self.buffer.write(frame)
+                    self.condition.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.running = False
+            self.source.close()
+            with self.condition:
+                self.condition.notify_all()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+
+    # 지금까지 기록된 누적 샘플 수
+    @property
+    def position(self):
+        return self.buffer.written
+
+    # 현재 위치에서 pre-roll 만큼 앞선 위치 (발화 첫 음절이 잘리지 않도록 녹음 시작 지점을 당김)
+    def start_position(self, preroll_seconds=0.3):
+        earliest = max(0, self.buffer.written - self.buffer.capacity)
+        return max(earliest, self.buffer.written - int(preroll_seconds * self.rate) * self.channels)
+
+    def view(self, start, end):
+        return self.buffer.view(start, end)
+
+    # start 위치부터 프레임 단위 뷰를 기록되는 대로 돌려주는 제너레이터
+    def frames(self, start, frame_size=None):
+        frame_size = (frame_size or self.frame_size) * self.channels
+        position = start
+        while True:
+            with self.condition:
+                while self.buffer.written < position + frame_size:
+                    if not self.running:
+                        if self.error is not None:
+                            raise self.error
+                        return
+                    self.condition.wait(timeout=1.0)
+                frame = self.buffer.view(position, position + frame_size)
+            yield frame
+            position += frame_size
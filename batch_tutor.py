@@ -0,0 +1,161 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+from contextlib import nullcontext
+from datetime import datetime
+from audio import transcribe_audio_async
+from providers import run_sync
+from results_store import append_result, read_results, results_path
+from work_queue import get_queue, new_batch_id, format_progress
+from tutor_dialogue import DIALOGUE_MODEL, DEFAULT_ASSISTANT_PROMPT, DEFAULT_USER_PROMPT, run_dialogue
+
+# 녹음 파일 폴더를 한 번에 음성 인식하고, 파일마다 AI 튜터 대화 시뮬레이션을 실행하는 배치 작업
+# 사용 예: python batch_tutor.py recordings/ --turns 5 --transcribe-concurrency 8 --dialogue-concurrency 4
+# 결과는 결과 저장소의 tutor_batch.jsonl 에 파일 하나당 한 줄로 기록된다.
+# --queue 를 주면 파일마다 작업을 작업 큐에 넣고 워커(python work_queue.py worker)가 처리하는 동안 진행 상황만 보여준다.
+# 중간에 멈춰도 --batch <배치 id> 로 다시 실행하면 끝난 파일은 다시 처리하지 않는다.
+
+AUDIO_EXTENSIONS = (".wav", ".flac")
+RESULT_KIND = "tutor_batch"
+
+
+# 폴더 안의 녹음 파일 목록 (하위 폴더 포함, 이름순)
+def find_recordings(directory):
+    recordings = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                recordings.append(os.path.join(root, name))
+    return sorted(recordings)
+
+
+# 녹음 파일 내용을 읽는 함수 (asyncio.to_thread 로 실행)
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# 결과 레코드의 기본 항목 (파일과 실행 설정)
+def new_record(path, args, run_id):
+    return {
+        "run_id": run_id,
+        "file": path,
+        "model": args.model,
+        "assistant_prompt": args.assistant_prompt,
+        "user_prompt": args.user_prompt,
+        "max_turns": args.turns,
+    }
+
+
+# 녹음 파일 하나를 음성 인식하고 대화를 진행해 record 를 채우는 함수 (실패하면 예외를 그대로 냄)
+async def transcribe_and_simulate(record, path, args, transcribe_semaphore, dialogue_semaphore):
+    async with transcribe_semaphore:
+        # 파일은 차례가 왔을 때 스레드에서 읽음 (대기 중인 파일이 메모리에 쌓이거나 읽기가 이벤트 루프를 막지 않도록)
+        audio_bytes = await asyncio.to_thread(read_file, path)
+        started = time.perf_counter()
+        record["transcript"] = await transcribe_audio_async(audio_bytes, os.path.basename(path))
+        record["transcribe_latency"] = time.perf_counter() - started
+    async with dialogue_semaphore:
+        started = time.perf_counter()
+        record["conversation"] = await run_dialogue(
+            record["transcript"], args.assistant_prompt, args.user_prompt, args.turns, args.model
+        )
+        record["dialogue_latency"] = time.perf_counter() - started
+    return record
+
+
+# 녹음 파일 하나를 이 프로세스에서 처리하고 결과를 저장하는 함수 (실패하면 오류를 기록한 결과를 저장)
+async def process_recording(path, args, transcribe_semaphore, dialogue_semaphore, run_id):
+    record = new_record(path, args, run_id)
+    try:
+        await transcribe_and_simulate(record, path, args, transcribe_semaphore, dialogue_semaphore)
+    except Exception as e:
+        record["error"] = str(e)
+    append_result(RESULT_KIND, record)
+    return record
+
+
+# 작업 큐 워커가 실행하는 녹음 파일 하나의 작업 (동시 실행 수는 워커가 조절, 결과는 큐에 저장)
+# 실패하면 예외를 그대로 내서 워커가 백오프 후 재시도하게 한다.
+async def process_recording_job(file, run_id, **settings):
+    args = argparse.Namespace(**settings)
+    return await transcribe_and_simulate(new_record(file, args, run_id), file, args, nullcontext(), nullcontext())
+
+
+async def run_batch(recordings, args):
+    run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    transcribe_semaphore = asyncio.Semaphore(args.transcribe_concurrency)
+    dialogue_semaphore = asyncio.Semaphore(args.dialogue_concurrency)
+    tasks = [
+        asyncio.create_task(process_recording(path, args, transcribe_semaphore, dialogue_semaphore, run_id))
+        for path in recordings
+    ]
+    records = []
+    for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+        record = await task
+        status = f"오류: {record['error']}" if "error" in record else f"{len(record['conversation'])}개 메시지"
+        print(f"[{done}/{len(tasks)}] {record['file']} - {status}", flush=True)
+        records.append(record)
+    return records
+
+
+# 녹음 파일들을 작업 큐에 넣고 모두 끝날 때까지 기다린 뒤 결과를 저장하는 함수
+# 워커가 파일을 실제로 읽으므로 모든 워커가 같은 경로로 녹음 파일에 접근할 수 있어야 한다.
+def run_queued_batch(recordings, args):
+    queue = get_queue()
+    batch = args.batch or new_batch_id(RESULT_KIND)
+    settings = {
+        "model": args.model,
+        "assistant_prompt": args.assistant_prompt,
+        "user_prompt": args.user_prompt,
+        "turns": args.turns,
+    }
+    queue.enqueue(batch, "tutor_recording", [
+        {"file": os.path.abspath(path), "run_id": batch, **settings} for path in recordings
+    ])
+    print(f"배치 {batch}: {len(recordings)}개 파일을 작업 큐 {queue.path} 에 넣었습니다.", flush=True)
+    queue.wait(batch, lambda counts: print(f"[{counts['finished']}/{counts['total']}] {format_progress(counts)}", flush=True),
+               poll_interval=5.0)
+    # --batch 로 이어서 실행한 경우 이전 실행이 이미 저장한 결과는 다시 쓰지 않음 (같은 파일, 같은 성공/오류)
+    saved = {(record["file"], record.get("error")) for record in read_results(RESULT_KIND) if record.get("run_id") == batch}
+    records = []
+    for job in queue.results(batch):
+        record = job["result"] or {"run_id": batch, "file": job["payload"]["file"], "error": job["error"]}
+        if (record["file"], record.get("error")) not in saved:
+            append_result(RESULT_KIND, record)
+        records.append(record)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="녹음 파일 폴더로 AI 튜터 대화를 일괄 실행합니다.")
+    parser.add_argument("directory", help="WAV/FLAC 녹음 파일이 있는 폴더")
+    parser.add_argument("--turns", type=int, default=5, help="파일마다 진행할 대화 턴 수")
+    parser.add_argument("--model", default=DIALOGUE_MODEL)
+    parser.add_argument("--assistant-prompt", default=DEFAULT_ASSISTANT_PROMPT)
+    parser.add_argument("--user-prompt", default=DEFAULT_USER_PROMPT)
+    parser.add_argument("--transcribe-concurrency", type=int, default=8, help="동시에 진행할 음성 인식 수")
+    parser.add_argument("--dialogue-concurrency", type=int, default=4, help="동시에 진행할 대화 수")
+    parser.add_argument("--queue", action="store_true", help="작업 큐에 넣고 워커가 처리하게 함")
+    parser.add_argument("--batch", help="이어서 진행할 작업 큐 배치 id (--queue 와 함께 사용)")
+    args = parser.parse_args(argv)
+
+    recordings = find_recordings(args.directory)
+    if not recordings:
+        print(f"{args.directory} 에서 녹음 파일을 찾지 못했습니다.", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    if args.queue:
+        records = run_queued_batch(recordings, args)
+    else:
+        records = run_sync(run_batch(recordings, args))
+    failed = sum("error" in record for record in records)
+    print(f"{len(records)}개 파일 처리 완료 (실패 {failed}개, {time.perf_counter() - started:.1f}초) -> {results_path(RESULT_KIND)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+import math
+import streamlit as st
+
+# 멀티턴 앱 공통 대화 기록 표시
+# 최근 메시지만 바로 그리고, 그보다 오래된 메시지는 접힌 영역에서 요청할 때만 한 페이지씩 그린다.
+# 대화가 수백 개 메시지로 길어져도 한 번 그릴 때의 비용은 RECENT_MESSAGES + PAGE_SIZE 개로 일정하다.
+
+RECENT_MESSAGES = 20
+PAGE_SIZE = 20
+
+
+# 메시지 하나를 채팅 말풍선으로 표시하는 함수
+def render_message(message):
+    role = "user" if message["role"] == "user" else "assistant"
+    with st.chat_message(role):
+        if "prompt_version" in message:
+            st.caption(f"프롬프트 버전 {message['prompt_version']}")
+        st.text(message["content"])
+
+
+# 대화 기록을 표시하는 함수 (key 는 같은 페이지에 기록이 여러 개일 때 위젯 키를 구분하는 데 사용)
+def render_history(messages, key="chat", recent=RECENT_MESSAGES, page_size=PAGE_SIZE):
+    older = max(0, len(messages) - recent)
+    if older:
+        with st.expander(f"이전 대화 {older}개"):
+            if st.toggle("이전 대화 불러오기", key=f"{key}_show_older"):
+                pages = math.ceil(older / page_size)
+                page = st.number_input(f"페이지 (1-{pages})", min_value=1, max_value=pages, value=pages,
+                                       key=f"{key}_older_page")
+                for message in messages[(page - 1) * page_size:min(page * page_size, older)]:
+                    render_message(message)
+    for message in messages[older:]:
+        render_message(message)
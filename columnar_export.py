@@ -0,0 +1,142 @@
+import os
+import time
+import uuid
+from datetime import datetime
+from providers import get_secret
+from results_store import results_dir
+from lazy_imports import lazy_import
+
+# 모델 호출 기록을 분석용 열 형식(Parquet)으로 내보내는 저장소 (pyarrow 가 설치되어 있을 때만 동작하는 선택 기능)
+# - 호출 하나가 한 행이고, 반복되는 값(실행 id, 모델, 프롬프트, 설정)은 사전(dictionary) 인코딩해 파일이 작고 읽기 빠르다.
+# - 실행마다 results/calls/date=YYYY-MM-DD/<앱>_<실행 id>.parquet 파일 하나를 만들고, CHUNK_ROWS 행 또는 FLUSH_INTERVAL 초마다
+#   모인 행을 행 그룹으로 나눠 쓴다. (호출 수가 적은 A/B 실행도 실행 중에 기록이 디스크로 나가고 메모리에 쌓이지 않음)
+# - 분석할 때는 read_calls(columns=[...]) 또는 calls_dataset() 으로 필요한 열과 날짜 파티션만 읽는다.
+#     예: read_calls(["model", "latency"], filter=ds.field("date") >= "2026-10-01").to_pandas()
+# secrets 또는 환경 변수 COLUMNAR_EXPORT=0 으로 끌 수 있다.
+
+CALLS_DIR = "calls"
+CHUNK_ROWS = 1000
+FLUSH_INTERVAL = 5.0
+DICTIONARY_COLUMNS = ("run_id", "app", "variant", "model", "provider", "system_prompt", "prompt_hash", "input", "settings_key")
+
+
+def calls_dir():
+    return os.path.join(results_dir(), CALLS_DIR)
+
+
+def is_enabled():
+    if (get_secret("COLUMNAR_EXPORT") or "1").lower() in ("0", "false", "no"):
+        return False
+    try:
+        lazy_import("pyarrow.parquet")
+    except ImportError:
+        return False
+    return True
+
+
+# 호출 기록의 열 구성 (문자열 열 중 반복되는 값은 사전 인코딩)
+def call_schema():
+    pa = lazy_import("pyarrow")
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("run_id", dictionary),
+        ("app", dictionary),
+        ("started_at", pa.timestamp("ms")),
+        ("item", pa.int32()),                   # 테스트 번호, 데이터셋 행 번호 또는 대화 턴
+        ("variant", dictionary),                # model_a / model_b, 프롬프트 버전 등 비교 대상
+        ("model", dictionary),
+        ("provider", dictionary),
+        ("system_prompt", dictionary),
+        ("prompt_hash", dictionary),
+        ("input", dictionary),                  # 마지막 사용자 입력
+        ("temperature", pa.float32()),
+        ("max_tokens", pa.int32()),
+        ("top_p", pa.float32()),
+        ("settings_key", dictionary),
+        ("response", pa.string()),
+        ("error", pa.bool_()),
+        ("latency", pa.float64()),
+        ("prompt_tokens", pa.int32()),
+        ("completion_tokens", pa.int32()),
+        ("cached_tokens", pa.int32()),
+    ])
+
+
+# 실행 하나의 호출 기록을 행 그룹 단위로 나눠 쓰는 작성기
+# 내보내기가 꺼져 있거나 pyarrow 가 없으면 아무것도 하지 않는다.
+class CallWriter:
+    def __init__(self, app, run_id=None, chunk_rows=CHUNK_ROWS, flush_interval=FLUSH_INTERVAL):
+        self.enabled = is_enabled()
+        self.app = app
+        self.run_id = run_id or f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.last_flush = time.perf_counter()
+        self.rows = []
+        self.writer = None
+        self.rows_written = 0
+        app_name = os.path.splitext(os.path.basename(app))[0]
+        self.path = os.path.join(calls_dir(), f"date={datetime.now().strftime('%Y-%m-%d')}", f"{app_name}_{self.run_id}.parquet")
+
+    # 호출 하나를 추가하는 함수 (없는 열은 빈 값, started_at 이 없으면 현재 시각)
+    def append(self, **row):
+        if not self.enabled:
+            return
+        row.setdefault("started_at", datetime.now())
+        self.rows.append({"run_id": self.run_id, "app": self.app, **row})
+        if len(self.rows) >= self.chunk_rows or time.perf_counter() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.perf_counter()
+        if not self.enabled or not self.rows:
+            return
+        pa = lazy_import("pyarrow")
+        pq = lazy_import("pyarrow.parquet")
+        schema = call_schema()
+        table = pa.Table.from_pylist(self.rows, schema=schema)
+        if self.writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.writer = pq.ParquetWriter(self.path, schema, compression="zstd", use_dictionary=list(DICTIONARY_COLUMNS))
+        self.writer.write_table(table)
+        self.rows_written += len(self.rows)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# 제공자 호출 결과(ProviderResult)를 행 값으로 바꾸는 함수
+def result_fields(result):
+    usage = result.get("usage") or {}
+    details = usage.get("prompt_tokens_details") or {}
+    return {
+        "model": result.get("model"),
+        "provider": result.get("provider"),
+        "response": result.get("content"),
+        "error": bool(result.get("error")),
+        "latency": result.get("latency"),
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "cached_tokens": details.get("cached_tokens"),
+    }
+
+
+# 저장된 호출 기록 전체를 지연 로딩 데이터셋으로 여는 함수 (날짜 파티션은 date 열로 보임)
+def calls_dataset(directory=None):
+    ds = lazy_import("pyarrow.dataset")
+    return ds.dataset(directory or calls_dir(), format="parquet", partitioning="hive")
+
+
+# 필요한 열과 조건에 맞는 행만 읽는 함수 (pyarrow Table 반환, .to_pandas() 로 변환)
+def read_calls(columns=None, filter=None, directory=None):
+    return calls_dataset(directory).to_table(columns=columns, filter=filter)
@@ -0,0 +1,97 @@
+import json
+import hashlib
+import threading
+from typing import TypedDict
+from results_store import append_result, read_results, results_path
+
+# 시뮬레이션 대화를 앞부분(prefix) 해시로 잇는 영구 대화 트리
+# - 노드 하나는 "이 대화 앞부분에서, 이 조건(역할, 시스템 프롬프트, 모델 설정)으로 만든 다음 메시지"이다.
+# - 같은 앞부분을 공유하는 대화(같은 시작 대화, 같은 시뮬레이션 사용자 응답)는 노드를 한 번만 만들고 여러 프롬프트 버전이 나눠 쓴다.
+# - 턴 수를 늘려 다시 실행하면 저장된 마지막 노드까지는 그대로 따라가고 그 뒤의 턴만 새로 만든다.
+# 노드는 results/conversation_nodes.jsonl 에 추가 기록되며 처음 사용할 때 색인을 메모리에 올린다.
+
+NODES_KIND = "conversation_nodes"
+ROOT_PREFIX = hashlib.sha256(b"").hexdigest()
+
+
+class ConversationNode(TypedDict):
+    prefix: str
+    branch: str
+    hash: str
+    message: dict
+    is_end: bool
+    saved_at: str
+
+
+# 대화 앞부분에 메시지 하나를 이어 붙인 해시 (role/content 만 사용)
+def extend_prefix(prefix, message):
+    encoded = json.dumps({"role": message["role"], "content": message["content"]},
+                         ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256((prefix + encoded).encode("utf-8")).hexdigest()
+
+
+def prefix_hash(messages):
+    prefix = ROOT_PREFIX
+    for message in messages:
+        prefix = extend_prefix(prefix, message)
+    return prefix
+
+
+# 다음 메시지를 만드는 조건의 키 (같은 앞부분에서 이 키가 같으면 같은 가지)
+def branch_key(role, system_prompt_hash, settings):
+    encoded = json.dumps({"role": role, "system_prompt": system_prompt_hash, **settings},
+                         ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ConversationTree:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.children = {}
+        self.loaded_from = None
+
+    # 저장 위치가 바뀌었거나 처음 사용할 때 파일에서 색인을 다시 만드는 함수 (같은 가지는 나중 노드가 우선)
+    def _ensure_loaded(self):
+        location = results_path(NODES_KIND)
+        if self.loaded_from == location:
+            return
+        self.children = {}
+        for record in read_results(NODES_KIND):
+            self.children[(record["prefix"], record["branch"])] = record
+        self.loaded_from = location
+
+    # 앞부분에서 가지 조건으로 만든 노드 (없으면 None)
+    def child(self, prefix, branch):
+        with self.lock:
+            self._ensure_loaded()
+            return self.children.get((prefix, branch))
+
+    # message 에 모델의 원본 응답(response)과 지연 시간(latency)이 있으면 함께 저장 (재생용 내보내기에 사용)
+    def add(self, prefix, branch, message, is_end=False):
+        record = {
+            "prefix": prefix,
+            "branch": branch,
+            "hash": extend_prefix(prefix, message),
+            "message": {"role": message["role"], "content": message["content"]},
+            "is_end": is_end,
+        }
+        for name in ("response", "latency"):
+            if name in message:
+                record[name] = message[name]
+        record = append_result(NODES_KIND, record)
+        with self.lock:
+            self._ensure_loaded()
+            self.children[(prefix, branch)] = record
+        return record
+
+    def __len__(self):
+        with self.lock:
+            self._ensure_loaded()
+            return len(self.children)
+
+
+_tree = ConversationTree()
+
+
+def get_tree():
+    return _tree
@@ -0,0 +1,193 @@
+import io
+import os
+import csv
+import codecs
+import json
+from collections import deque
+from datetime import datetime
+from typing import TypedDict, Optional
+from results_store import results_dir
+
+# 업로드한 입력 파일(CSV/JSONL)로 모델 A/B 를 평가하는 데이터셋 평가
+# - 파일은 한 행씩 읽어 행마다 모델 A/B 호출을 만들고, 최대 동시 호출 수만큼만 실행하다가 하나가 끝나면 다음 호출을 시작한다.
+# - 모델 A/B 응답이 모두 끝난 행은 모아 두었다가 FLUSH_INTERVAL 초 또는 CHUNK_ROWS 행마다 results/dataset_eval/<실행 id>.jsonl 에
+#   끝난 순서대로 추가하고, 메모리에는 집계와 최근 결과 몇 개만 남겨 파일 크기와 관계없이 메모리 사용량이 일정하다.
+# 열 이름: user_input(또는 input, question) 필수, system_prompt(또는 prompt), expected(또는 expected_answer, answer) 선택
+# 인코딩은 UTF-8 을 먼저 시도하고 안 되면 CP949(EUC-KR, 엑셀 한글 CSV 기본값)로 읽는다.
+# 형식이 잘못된 JSONL 줄과 입력이 없는 행은 건너뛰고 개수만 알려준다.
+
+DATASET_DIR = "dataset_eval"
+CHUNK_ROWS = 50
+FLUSH_INTERVAL = 1.0
+PREVIEW_ROWS = 20
+INPUT_COLUMNS = ("user_input", "input", "question")
+SYSTEM_PROMPT_COLUMNS = ("system_prompt", "prompt")
+EXPECTED_COLUMNS = ("expected", "expected_answer", "answer")
+ENCODINGS = ("utf-8-sig", "cp949")
+READ_BLOCK = 1 << 16
+MAX_REPORTED_LINES = 10
+
+
+# 입력 파일을 평가할 수 없을 때의 오류 (메시지를 그대로 화면에 표시)
+class DatasetError(ValueError):
+    pass
+
+
+class DatasetRow(TypedDict):
+    row: int
+    user_input: str
+    system_prompt: Optional[str]
+    expected: Optional[str]
+
+
+def _first_value(record, columns):
+    for column in columns:
+        value = record.get(column)
+        if value is not None and str(value).strip():
+            return str(value)
+    return None
+
+
+# 파일 전체를 디코딩해 보고 읽을 수 있는 인코딩을 고르는 함수
+def detect_encoding(file):
+    for encoding in ENCODINGS:
+        file.seek(0)
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            while True:
+                block = file.read(READ_BLOCK)
+                if not block:
+                    break
+                decoder.decode(block)
+            decoder.decode(b"", final=True)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise DatasetError("파일 인코딩을 읽을 수 없습니다. UTF-8 또는 CP949(EUC-KR)로 저장해주세요.")
+
+
+def _is_jsonl(filename):
+    return filename.lower().endswith((".jsonl", ".ndjson"))
+
+
+# 파일의 원본 레코드를 (줄 번호, 레코드) 로 읽는 함수 (JSON 으로 읽을 수 없거나 객체가 아닌 줄은 레코드 None)
+def _iter_records(text, filename):
+    if _is_jsonl(filename):
+        for number, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            yield number, record if isinstance(record, dict) else None
+        return
+    reader = csv.DictReader(text)
+    if reader.fieldnames is None:
+        return
+    if _first_value({name: name for name in reader.fieldnames if name}, INPUT_COLUMNS) is None:
+        raise DatasetError(f"입력 열이 없습니다. 열 이름 중 하나가 {', '.join(INPUT_COLUMNS)} 이어야 합니다 "
+                           f"(파일의 열: {', '.join(name for name in reader.fieldnames if name) or '없음'}).")
+    try:
+        for record in reader:
+            yield reader.line_num, record
+    except csv.Error as e:
+        raise DatasetError(f"{reader.line_num}번째 줄의 CSV 형식이 잘못되었습니다: {e}")
+
+
+# 파일 형식에 맞게 한 행씩 읽는 함수 (형식이 잘못되었거나 입력이 없는 행은 건너뛰고 skipped 에 줄 번호를 추가)
+def iter_rows(file, filename, encoding=ENCODINGS[0], skipped=None):
+    file.seek(0)
+    text = io.TextIOWrapper(file, encoding=encoding, newline="")
+    try:
+        for number, record in _iter_records(text, filename):
+            user_input = _first_value(record, INPUT_COLUMNS) if record is not None else None
+            if user_input is None:
+                if skipped is not None:
+                    skipped.append(number)
+                continue
+            yield DatasetRow(
+                row=number,
+                user_input=user_input,
+                system_prompt=_first_value(record, SYSTEM_PROMPT_COLUMNS),
+                expected=_first_value(record, EXPECTED_COLUMNS),
+            )
+    except UnicodeDecodeError:
+        raise DatasetError(f"파일을 {encoding} 인코딩으로 읽을 수 없습니다.")
+    finally:
+        # 업로드 파일을 닫지 않고 텍스트 래퍼만 떼어냄 (다시 읽을 수 있도록)
+        text.detach()
+
+
+# 평가 전에 파일을 한 번 읽어 인코딩, 열, 행 수를 확인하는 함수 (평가할 행이 없으면 DatasetError)
+def inspect_dataset(file, filename):
+    encoding = detect_encoding(file)
+    skipped = []
+    rows = sum(1 for _ in iter_rows(file, filename, encoding, skipped))
+    if not rows:
+        raise DatasetError(f"평가할 행이 없습니다. 모든 행이 형식이 잘못되었거나 {', '.join(INPUT_COLUMNS)} 값이 없습니다.")
+    return {"encoding": encoding, "rows": rows, "skipped": len(skipped), "skipped_lines": skipped[:MAX_REPORTED_LINES]}
+
+
+def _normalize(text):
+    return " ".join(str(text).split()).casefold()
+
+
+# 응답에 기대 답안이 들어 있는지 (공백/대소문자 차이 무시)
+def answer_matches(response, expected):
+    return _normalize(expected) in _normalize(response)
+
+
+# 데이터셋 평가 실행 하나의 결과 파일과 집계
+class DatasetRun:
+    def __init__(self, run_id=None, model_keys=("model_a", "model_b")):
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.model_keys = model_keys
+        self.path = os.path.join(results_dir(), DATASET_DIR, f"{self.run_id}.jsonl")
+        self.rows_done = 0
+        self.stats = {key: {"calls": 0, "errors": 0, "latency": 0.0, "graded": 0, "matched": 0} for key in model_keys}
+        self.preview = deque(maxlen=PREVIEW_ROWS)
+
+    # 끝난 행들의 결과를 파일에 추가하고 집계에 반영하는 함수
+    def add(self, records):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in records:
+                for key in self.model_keys:
+                    result = record[key]
+                    stats = self.stats[key]
+                    stats["calls"] += 1
+                    stats["errors"] += bool(result.get("error"))
+                    stats["latency"] += result.get("latency") or 0.0
+                    if record["expected"] is not None:
+                        record[f"{key}_matches"] = answer_matches(result["content"], record["expected"])
+                        stats["graded"] += 1
+                        stats["matched"] += record[f"{key}_matches"]
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self.preview.append(record)
+                self.rows_done += 1
+
+    # 모델별 요약 (호출 수, 오류 수, 평균 지연 시간, 기대 답안 포함 비율)
+    def summary(self, model_names):
+        rows = []
+        for key in self.model_keys:
+            stats = self.stats[key]
+            rows.append({
+                "model": f"{key[-1].upper()}: {model_names[key]}",
+                "calls": stats["calls"],
+                "errors": stats["errors"],
+                "mean_latency": stats["latency"] / stats["calls"] if stats["calls"] else None,
+                "accuracy": stats["matched"] / stats["graded"] if stats["graded"] else None,
+            })
+        return rows
+
+    def preview_rows(self):
+        return [
+            {
+                "row": record["row"],
+                "user_input": record["user_input"],
+                "expected": record["expected"],
+                **{f"{key}_response": record[key]["content"] for key in self.model_keys},
+            }
+            for record in self.preview
+        ]
@@ -0,0 +1,167 @@
+import os
+import asyncio
+import threading
+import time
+from collections import deque
+from lazy_imports import lazy_import
+
+# 꼬리 지연(tail latency)을 줄이기 위한 헤지 요청 정책
+# - 모델마다 최근 응답 시간을 기록하고, 호출이 그 모델의 p9x 지연 시간을 넘기면 같은 요청을 한 번 더 보낸다.
+# - 먼저 끝난 응답을 사용하고 나머지 요청은 취소한다.
+# - 헤지 예산(전체 호출 대비 헤지 비율)을 넘으면 더 이상 헤지하지 않아 추가 비용을 제한한다.
+# 헤지 여부는 호출마다 정한다 (앱의 "헤지 요청 사용" 옵션은 세션별). 환경 변수 HEDGING=1 은 옵션을 정하지 않은 호출의 기본값이다.
+# 지연 시간 측정값과 헤지 예산은 프로세스 전체에서 공유한다.
+
+LATENCY_WINDOW = 200
+DEFAULT_QUANTILE = 0.95
+DEFAULT_BUDGET = 0.1
+DEFAULT_MIN_SAMPLES = 20
+
+
+class HedgingPolicy:
+    def __init__(self, quantile=DEFAULT_QUANTILE, budget=DEFAULT_BUDGET, min_samples=DEFAULT_MIN_SAMPLES):
+        self.quantile = quantile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.stats = {}
+
+    def _stats_for(self, model):
+        return self.stats.setdefault(model, {"calls": 0, "hedged": 0, "hedge_wins": 0})
+
+    def observe(self, model, latency):
+        with self.lock:
+            if model not in self.latencies:
+                self.latencies[model] = deque(maxlen=LATENCY_WINDOW)
+            self.latencies[model].append(latency)
+
+    # 헤지를 시작할 지연 시간 (측정값이 충분하지 않으면 None)
+    def threshold(self, model):
+        with self.lock:
+            values = self.latencies.get(model)
+            if values is None or len(values) < self.min_samples:
+                return None
+            values = list(values)
+        np = lazy_import("numpy")
+        return float(np.quantile(np.array(values), self.quantile))
+
+    # 헤지 예산 안인지 확인하고, 안이면 헤지 한 번을 예약하는 함수
+    def _reserve_hedge(self, model):
+        with self.lock:
+            total_calls = sum(stats["calls"] for stats in self.stats.values())
+            total_hedged = sum(stats["hedged"] for stats in self.stats.values())
+            if total_hedged + 1 > self.budget * total_calls:
+                return False
+            self._stats_for(model)["hedged"] += 1
+            return True
+
+    # make_call() 로 만든 요청을 실행하고, 임계값을 넘기면 헤지 요청을 보내 먼저 끝난 결과를 반환하는 함수
+    async def run(self, model, make_call):
+        with self.lock:
+            self._stats_for(model)["calls"] += 1
+        started = time.perf_counter()
+        threshold = self.threshold(model)
+        primary = asyncio.ensure_future(make_call())
+        if threshold is not None:
+            try:
+                done, _ = await asyncio.wait({primary}, timeout=threshold)
+            except asyncio.CancelledError:
+                # asyncio.wait 는 기다리던 작업을 취소하지 않으므로 호출이 취소되면 직접 취소
+                primary.cancel()
+                raise
+            if not done and self._reserve_hedge(model):
+                return await self._race(model, primary, asyncio.ensure_future(make_call()), started)
+        result = await primary
+        self.observe(model, time.perf_counter() - started)
+        return result
+
+    async def _race(self, model, primary, hedge, started):
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    latency = time.perf_counter() - started
+                    self.observe(model, latency)
+                    if task is hedge:
+                        with self.lock:
+                            self._stats_for(model)["hedge_wins"] += 1
+                    return task.result()
+            raise error
+        finally:
+            # 진 요청은 취소 (이미 스레드에서 실행 중인 동기 요청은 결과만 버려진다)
+            for task in pending:
+                task.cancel()
+
+    # 모델별 헤지 통계
+    def report(self):
+        rows = []
+        with self.lock:
+            models = list(self.stats)
+        for model in models:
+            with self.lock:
+                stats = dict(self.stats[model])
+            threshold = self.threshold(model)
+            rows.append({
+                "model": model,
+                "calls": stats["calls"],
+                "hedged": stats["hedged"],
+                "hedge_rate": stats["hedged"] / stats["calls"] if stats["calls"] else 0.0,
+                "hedge_wins": stats["hedge_wins"],
+                "win_rate": stats["hedge_wins"] / stats["hedged"] if stats["hedged"] else None,
+                "threshold_ms": None if threshold is None else threshold * 1000,
+            })
+        return rows
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+# 호출에서 헤지 여부를 정하지 않았을 때의 기본값
+def enabled_by_default():
+    return os.getenv("HEDGING", "").lower() in ("1", "true", "yes")
+
+
+def get_policy():
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = HedgingPolicy(
+                quantile=float(os.getenv("HEDGE_QUANTILE", DEFAULT_QUANTILE)),
+                budget=float(os.getenv("HEDGE_BUDGET", DEFAULT_BUDGET)),
+                min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", DEFAULT_MIN_SAMPLES)),
+            )
+        return _policy
+
+
+# A/B 테스트 화면의 헤지 요청 설정과 모델별 헤지 통계 (반환: 이 세션의 헤지 사용 여부, 호출에 hedge= 로 전달)
+def render_controls():
+    import streamlit as st
+
+    policy = get_policy()
+    enabled = st.checkbox("헤지 요청 사용", value=enabled_by_default(), key="hedging_enabled",
+                          help=f"응답이 최근 p{policy.quantile * 100:.0f} 지연 시간을 넘기면 같은 요청을 한 번 더 보내 먼저 온 응답을 사용합니다. "
+                               f"추가 요청은 전체 호출의 {policy.budget:.0%} 이내로 제한됩니다.")
+    if not enabled:
+        return False
+    rows = policy.report()
+    with st.expander("헤지 통계"):
+        if not rows:
+            st.caption(f"모델별로 {policy.min_samples}번 이상 호출해야 헤지 기준 시간이 정해집니다.")
+            return True
+        st.dataframe(rows, hide_index=True, column_config={
+            "model": "모델",
+            "calls": "호출",
+            "hedged": "헤지",
+            "hedge_rate": st.column_config.NumberColumn("헤지 비율", format="percent"),
+            "hedge_wins": "헤지 승",
+            "win_rate": st.column_config.NumberColumn("헤지 승률", format="percent"),
+            "threshold_ms": st.column_config.NumberColumn("기준 (ms)", format="%.0f"),
+        })
+    return True
@@ -0,0 +1,125 @@
+import json
+import functools
+from lazy_imports import lazy_import
+
+# 멀티턴 앱에서 구조화된 AI 응답(JSON)을 다음 요청의 대화 기록으로 다시 보낼 때의 형식
+# - AI 메시지는 structured 필드에 응답 구조를 그대로 두고, content 에는 화면 표시와 다운로드용 들여쓰기 JSON 을 둔다.
+# - 요청을 만들 때만 선택한 형식으로 content 를 바꿔 보낸다. 들여쓰기, 반복되는 키, hint 목록은 이후 모든 턴에서
+#   다시 입력 토큰으로 청구되므로 형식을 줄이면 대화가 길어질수록 절약이 커진다.
+# - 같은 형식이면 매번 같은 바이트로 직렬화되므로 프롬프트 캐시 적중에는 영향이 없다 (형식을 바꾼 직후 한 번만 캐시가 빗나감).
+# 토큰 수는 tiktoken 이 설치되어 있으면 그것으로 세고, 없으면 UTF-8 바이트 수로 추정한다.
+
+HISTORY_ENCODINGS = {
+    "minified": "압축 JSON",
+    "fields": "선택한 필드만 (압축 JSON)",
+    "message": "메시지만",
+    "pretty": "들여쓰기 JSON (기존 방식)",
+}
+DEFAULT_ENCODING = "minified"
+DEFAULT_FIELDS = ("total_round", "answer_count", "check_answer", "is_end", "message")
+TOKENIZER_ENCODING = "o200k_base"
+BYTES_PER_TOKEN = 3.0
+
+
+def pretty_json(structured):
+    return json.dumps(structured, ensure_ascii=False, indent=2)
+
+
+# 구조화된 응답을 AI 메시지로 만드는 함수 (extra 는 사용량, 프롬프트 버전 등 함께 저장할 필드)
+def structured_message(structured, **extra):
+    return {"role": "assistant", "content": pretty_json(structured), "structured": structured, **extra}
+
+
+# 응답 구조를 요청에 보낼 문자열로 바꾸는 함수
+def encode_response(structured, encoding=DEFAULT_ENCODING, fields=DEFAULT_FIELDS):
+    if encoding == "pretty":
+        return pretty_json(structured)
+    if encoding == "message":
+        return str(structured.get("message", ""))
+    if encoding == "fields":
+        structured = {name: value for name, value in structured.items() if name in fields}
+    return json.dumps(structured, ensure_ascii=False, separators=(",", ":"))
+
+
+# 대화 기록을 요청용 형식으로 바꾸는 함수 (structured 가 없는 메시지는 그대로)
+def encode_history(messages, encoding=DEFAULT_ENCODING, fields=DEFAULT_FIELDS):
+    return [
+        {"role": message["role"], "content": encode_response(message["structured"], encoding, fields)}
+        if "structured" in message else message
+        for message in messages
+    ]
+
+
+@functools.lru_cache(maxsize=1)
+def _tokenizer():
+    try:
+        return lazy_import("tiktoken").get_encoding(TOKENIZER_ENCODING)
+    except Exception:
+        return None
+
+
+def tokens_are_estimated():
+    return _tokenizer() is None
+
+
+# 문자열의 토큰 수 (같은 메시지를 턴마다 다시 세지 않도록 캐시)
+@functools.lru_cache(maxsize=4096)
+def count_tokens(text):
+    tokenizer = _tokenizer()
+    if tokenizer is None:
+        return round(len(text.encode("utf-8")) / BYTES_PER_TOKEN)
+    return len(tokenizer.encode(text))
+
+
+# AI 메시지에 함께 저장하는 요청 형식 (재생 색인이 같은 요청을 다시 만들 때 사용)
+def history_settings(encoding=DEFAULT_ENCODING, fields=DEFAULT_FIELDS):
+    settings = {"history_encoding": encoding}
+    if encoding == "fields":
+        settings["history_fields"] = list(fields)
+    return settings
+
+
+# 이번 요청에 보내는 대화 기록의 토큰 수와 기존 방식(들여쓰기 JSON) 대비 절약한 토큰 수 (AI 메시지에 함께 저장)
+def history_savings(messages, encoding=DEFAULT_ENCODING, fields=DEFAULT_FIELDS):
+    sent = full = 0
+    for message in messages:
+        if "structured" not in message:
+            continue
+        sent += count_tokens(encode_response(message["structured"], encoding, fields))
+        full += count_tokens(pretty_json(message["structured"]))
+    return {**history_settings(encoding, fields), "history_tokens": sent, "history_tokens_saved": full - sent}
+
+
+# 사이드바의 전송 형식 선택 (반환: 형식, 선택한 필드), 위젯 키에는 페이지 이름을 붙임
+def render_controls(page, field_names):
+    import streamlit as st
+    from session_store import page_key
+
+    encoding = st.sidebar.selectbox(
+        "AI 응답 기록 전송 형식:", list(HISTORY_ENCODINGS), format_func=HISTORY_ENCODINGS.get, key=page_key(page, "history_encoding"),
+        help="이전 AI 응답을 다음 요청의 대화 기록으로 보낼 때의 형식입니다. 화면에는 항상 전체 응답이 표시됩니다.",
+    )
+    fields = DEFAULT_FIELDS
+    if encoding == "fields":
+        fields = tuple(st.sidebar.multiselect(
+            "보낼 필드:", list(field_names), default=[name for name in DEFAULT_FIELDS if name in field_names],
+            key=page_key(page, "history_fields"),
+        ))
+    return encoding, fields
+
+
+# 사이드바의 누적 절약 토큰 (AI 메시지에 저장된 요청별 기록을 합산, container 를 주면 그 안에 그림)
+def render_savings_report(messages, title="기록 전송 형식 토큰 절약", container=None):
+    import streamlit as st
+
+    records = [message for message in messages if "history_tokens" in message]
+    with (container or st.sidebar).expander(title):
+        if not records:
+            st.caption("아직 기록된 요청이 없습니다.")
+            return
+        sent = sum(record["history_tokens"] for record in records)
+        saved = sum(record["history_tokens_saved"] for record in records)
+        st.metric("절약한 입력 토큰", f"{saved:,}", help="요청마다 보낸 이전 AI 응답을 들여쓰기 JSON 으로 보냈을 때와 비교한 합계입니다.")
+        st.caption(f"요청 {len(records)}개, 이전 AI 응답 {sent:,} 토큰 전송 "
+                   f"(기존 방식 대비 {saved / (sent + saved) if sent + saved else 0.0:.0%} 감소)"
+                   + (" · 토큰 수는 추정치" if tokens_are_estimated() else ""))
@@ -0,0 +1,27 @@
+import sys
+import time
+import importlib
+
+# 무거운 선택 의존성을 실제로 필요한 페이지에서만 불러오고, 불러오는 데 걸린 시간을 기록하는 도우미
+
+IMPORT_TIMES = {}
+
+
+# 모듈을 처음 사용할 때 import 하고 소요 시간을 기록하는 함수 (이미 불러온 모듈은 그대로 반환)
+def lazy_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES[name] = time.perf_counter() - started
+    return module
+
+
+# 선택 의존성을 불러오고, 설치되어 있지 않으면 설치 안내 메시지와 함께 None 을 반환하는 함수
+def optional_import(name, install_hint=None):
+    try:
+        return lazy_import(name)
+    except ImportError:
+        import streamlit as st
+        st.error(f"이 페이지에는 `{name}` 패키지가 필요합니다. `pip install {install_hint or name}` 로 설치해주세요.")
+        return None
@@ -0,0 +1,355 @@
+import os
+import sys
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import urllib.request
+from datetime import datetime
+import numpy as np
+
+# 여러 세션이 동시에 앱을 사용할 때 서버 하나가 얼마나 버티는지 재는 부하 테스트
+# 앱마다 `streamlit run` 서버 프로세스 하나를 띄우고, 브라우저 대신 웹소켓 클라이언트 K개(스레드)로 동시에 접속해
+# 실제 사용자처럼 입력하고 전송한다. 모든 모델 호출은 지연 시간을 흉내 내는 모의 제공자로 보낸다.
+# - 메모리/CPU 는 서버 프로세스만 잰다 (리눅스 /proc 사용). 세션 하나로 시나리오를 한 번 실행한 뒤의 RSS 를 기준값(baseline)으로,
+#   부하 중 최대 RSS 와 기준값의 차이를 K 로 나눈 값을 세션당 증가량으로 따로 보고한다.
+# - 클라이언트는 서버가 보낸 화면 요소를 Streamlit 테스트 도구(AppTest)의 요소 트리로 해석해 위젯을 찾고 값을 바꾼다.
+# 사용 예: python load_test.py --sessions 1 2 4 8 --interactions 5 --apps app.py multiturn.py
+# 결과는 표로 출력하고 결과 저장소의 load_test.jsonl 에 (앱, K) 마다 한 줄씩 기록한다.
+
+DEFAULT_APPS = ("app.py", "multiturn.py", "multiturn_copy.py", "multiturn_multitime_ab_test.py")
+RESULT_KIND = "load_test"
+SAMPLE_INTERVAL = 0.1
+SERVER_START_TIMEOUT = 60.0
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# 서버 프로세스의 현재 RSS(MB)와 누적 CPU 시간(초) (리눅스가 아니면 0)
+def process_usage(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+        with open(f"/proc/{pid}/stat") as f:
+            # 두 번째 필드(실행 파일 이름)에 공백이 있을 수 있으므로 닫는 괄호 뒤부터 센다 (utime, stime 은 14, 15번째 필드)
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        return rss, cpu
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0, 0.0
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# 앱 하나를 실행하는 `streamlit run` 서버 프로세스 (환경 변수는 현재 프로세스에서 물려받음)
+class StreamlitServer:
+    def __init__(self, app, log_path):
+        self.app = app
+        self.port = _free_port()
+        self.log_path = log_path
+        self.process = None
+
+    @property
+    def url(self):
+        return f"ws://127.0.0.1:{self.port}/_stcore/stream"
+
+    def usage(self):
+        return process_usage(self.process.pid)
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        self.log = open(self.log_path, "a", encoding="utf-8")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", os.path.join(APP_DIR, self.app),
+             "--server.headless", "true", "--server.port", str(self.port), "--server.address", "127.0.0.1",
+             "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+            cwd=APP_DIR, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.perf_counter() + SERVER_START_TIMEOUT
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return self
+            except OSError:
+                pass
+            if self.process.poll() is not None or time.perf_counter() > deadline:
+                self.__exit__()
+                raise RuntimeError(f"{self.app} 서버를 시작하지 못했습니다 (로그: {self.log_path})")
+            time.sleep(0.2)
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.log.close()
+
+
+# 위젯 값이 이번 실행 뒤에 바뀌었는지 (위젯 종류마다 "아직 안 바꿈" 표시가 InitialValue, None, False(버튼) 로 다르다)
+def _changed(widget):
+    from streamlit.testing.v1.element_tree import InitialValue, _unset_value_marker
+    attr, unset = _unset_value_marker(widget)
+    value = getattr(widget, attr)
+    return not isinstance(value, InitialValue) and value is not None and value is not unset
+
+
+# 브라우저 대신 서버에 접속하는 세션 하나 (웹소켓으로 재실행 요청을 보내고, 받은 화면 요소로 tree 를 만든다)
+# 위젯 값을 바꾼 뒤 run() 을 호출하면 바뀐 위젯 값과 함께 스크립트 재실행을 요청하고 실행이 끝날 때까지 기다린다.
+class SessionClient:
+    def __init__(self, url, timeout):
+        from websockets.sync.client import connect
+        self.timeout = timeout
+        self.connection = connect(url, subprotocols=["streamlit"], max_size=None, open_timeout=timeout)
+        self.tree = None
+        self.run()
+
+    def run(self):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from streamlit.testing.v1.element_tree import Widget, parse_tree_from_messages
+
+        request = BackMsg()
+        request.rerun_script.query_string = ""
+        # 브라우저처럼 이번에 바꾼 위젯 값만 보낸다 (나머지 위젯은 서버가 세션에 기억해 둔 값을 그대로 쓴다)
+        if self.tree is not None:
+            for node in self.tree:
+                if isinstance(node, Widget) and _changed(node):
+                    request.rerun_script.widget_states.widgets.append(node._widget_state)
+        self.connection.send(request.SerializeToString())
+        deltas = {}
+        while True:
+            message = ForwardMsg()
+            message.ParseFromString(self.connection.recv(timeout=self.timeout))
+            kind = message.WhichOneof("type")
+            # 앱이 st.rerun() 을 부르면 실행이 새로 시작되므로 (new_session) 화면 요소를 처음부터 다시 모은다
+            # 같은 위치에 다시 온 요소는 앞의 것을 대신한다 (st.empty() 자리에 나중에 컨테이너를 채우는 경우 등)
+            if kind == "new_session":
+                deltas = {}
+            elif kind == "delta":
+                path = tuple(message.metadata.delta_path)
+                deltas.pop(path, None)
+                deltas[path] = message
+            elif kind == "script_finished":
+                if message.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RuntimeError("스크립트 컴파일 오류")
+                if message.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    break
+        self.tree = parse_tree_from_messages(list(deltas.values()))
+        return self.tree
+
+    def close(self):
+        self.connection.close()
+
+
+def _click(client, label):
+    next(button for button in client.tree.button if button.label == label).click()
+    client.run()
+
+
+# 앱의 사용자 입력창 (위젯 키에 페이지 이름이 붙어 있음)
+def _user_input(client, app):
+    from session_store import page_key
+    return client.tree.text_input(key=page_key(app, "user_input"))
+
+
+# 앱별 시나리오: (준비 함수, 상호작용 함수)
+# 상호작용은 앱 파일, 세션 이름과 순번을 받아 실제 사용자처럼 입력하고 전송한다
+# 세션 이름에 실행 id 와 K 가 들어가므로 입력이 실행/단계/세션마다 달라 프롬프트 저장소의 결과 재사용이 일어나지 않는다
+def _prepare_ab_test(client, args):
+    client.tree.number_input[0].set_value(args.tests)
+    client.run()
+
+
+def _interact_ab_test(client, app, session, step):
+    _user_input(client, app).input(f"{session} 질문 {step}")
+    client.run()
+    _click(client, "전송")
+
+
+def _prepare_prompt_compare(client, args):
+    client.tree.sidebar.checkbox[0].check()
+    client.run()
+
+
+def _interact_chat(client, app, session, step):
+    _user_input(client, app).input(f"{session} 메시지 {step}")
+    client.run()
+    _click(client, "전송")
+
+
+SCENARIOS = {
+    "app.py": (_prepare_ab_test, _interact_ab_test),
+    "app_col.py": (_prepare_ab_test, _interact_ab_test),
+    "app_org.py": (_prepare_ab_test, _interact_ab_test),
+    "multiturn.py": (None, _interact_chat),
+    "multiturn_copy.py": (None, _interact_chat),
+    "multiturn_multitime_ab_test.py": (_prepare_prompt_compare, _interact_chat),
+}
+
+
+# 실행하는 동안 서버 프로세스의 메모리(RSS)와 CPU 사용률을 주기적으로 기록하는 측정기
+class ResourceSampler:
+    def __init__(self, server, interval=SAMPLE_INTERVAL):
+        self.server = server
+        self.interval = interval
+        self.rss = []
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="load-test-sampler", daemon=True)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.rss.append(self.server.usage()[0])
+
+    def __enter__(self):
+        self.wall_started = time.perf_counter()
+        self.cpu_started = self.server.usage()[1]
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        self.wall = time.perf_counter() - self.wall_started
+        self.cpu = self.server.usage()[1] - self.cpu_started
+
+    # 서버 프로세스 CPU 시간 / 경과 시간 (코어 하나를 다 쓰면 100%)
+    @property
+    def cpu_percent(self):
+        return 100 * self.cpu / self.wall if self.wall else 0.0
+
+
+# 세션 하나: 앱을 열고 준비한 뒤 모든 세션이 준비되면 상호작용을 차례로 실행하며 각 상호작용의 소요 시간을 기록
+def run_session(server, app, label, session, args, barrier, latencies, errors):
+    prepare, interact = SCENARIOS[app]
+    name = f"{label} 세션 {session}"
+    try:
+        client = SessionClient(server.url, args.timeout)
+        if prepare is not None:
+            prepare(client, args)
+        if client.tree.exception:
+            raise RuntimeError(client.tree.exception[0].value)
+    except Exception as e:
+        errors.append(f"세션 {session} 준비 실패: {e}")
+        barrier.abort()
+        return
+    try:
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        client.close()
+        return
+    for step in range(args.interactions):
+        started = time.perf_counter()
+        try:
+            interact(client, app, name, step)
+            if client.tree.exception:
+                errors.append(f"세션 {session}: {client.tree.exception[0].value}")
+        except Exception as e:
+            errors.append(f"세션 {session}: {e!r}")
+        latencies.append(time.perf_counter() - started)
+    client.close()
+
+
+# 측정 전에 세션 하나로 시나리오를 한 번 실행해 서버의 모듈 로딩(모델 제공자 등 처음 쓸 때 불러오는 모듈 포함)과 캐시 준비를 끝낸다
+def warm_up(server, app, label, args):
+    prepare, interact = SCENARIOS[app]
+    client = SessionClient(server.url, args.timeout)
+    if prepare is not None:
+        prepare(client, args)
+    interact(client, app, f"{label} 준비", 0)
+    client.close()
+
+
+# 앱 하나를 서버 하나에 세션 K개로 동시에 접속해 실행하고 요약을 반환하는 함수
+# 준비 실행을 마친 서버의 RSS 를 기준값으로 삼고, 측정 구간은 모든 세션이 앱을 열고 준비를 마친 뒤부터다.
+def run_level(app, sessions, args):
+    # 입력에 실행 id 와 K 를 넣어 다른 K 단계에서 저장된 결과가 재사용되지 않게 한다
+    label = f"{args.run_id} K={sessions}"
+    latencies = []
+    errors = []
+    log_path = os.path.join(args.results_dir, "servers", f"{os.path.splitext(app)[0]}_{args.run_id}_k{sessions}.log")
+    with StreamlitServer(app, log_path) as server:
+        warm_up(server, app, label, args)
+        baseline_rss = server.usage()[0]
+        barrier = threading.Barrier(sessions + 1)
+        threads = [
+            threading.Thread(target=run_session, args=(server, app, label, session, args, barrier, latencies, errors))
+            for session in range(sessions)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        with ResourceSampler(server) as sampler:
+            for thread in threads:
+                thread.join()
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    rss_peak = max(sampler.rss, default=baseline_rss)
+    return {
+        "app": app,
+        "sessions": sessions,
+        "interactions": len(latencies),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+        "throughput_per_s": len(latencies) / sampler.wall if sampler.wall else 0.0,
+        "rss_baseline_mb": baseline_rss,
+        "rss_peak_mb": rss_peak,
+        "rss_per_session_mb": max(rss_peak - baseline_rss, 0.0) / sessions,
+        "cpu_percent": sampler.cpu_percent,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+    }
+
+
+def print_row(row):
+    print(f"{row['app']:<34} K={row['sessions']:<4} p50 {row['p50_ms']:8.0f} ms  p99 {row['p99_ms']:8.0f} ms  "
+          f"{row['throughput_per_s']:6.1f}/s  RSS 기준 {row['rss_baseline_mb']:7.1f} MB  "
+          f"세션당 +{row['rss_per_session_mb']:6.1f} MB  CPU {row['cpu_percent']:5.0f}%  오류 {row['errors']}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="여러 세션으로 Streamlit 앱에 부하를 주고 지연 시간/메모리/CPU 를 측정합니다.")
+    parser.add_argument("--apps", nargs="+", default=list(DEFAULT_APPS), choices=sorted(SCENARIOS))
+    parser.add_argument("--sessions", nargs="+", type=int, default=[1, 2, 4, 8], help="동시 세션 수 K (여러 개면 차례로 늘려가며 측정)")
+    parser.add_argument("--interactions", type=int, default=5, help="세션마다 보낼 메시지 수")
+    parser.add_argument("--tests", type=int, default=3, help="A/B 테스트 앱의 테스트 횟수")
+    parser.add_argument("--base-latency", type=float, default=0.8, help="모의 제공자의 기본 응답 지연(초)")
+    parser.add_argument("--token-latency", type=float, default=0.02, help="모의 제공자의 토큰당 지연(초)")
+    parser.add_argument("--timeout", type=float, default=120, help="상호작용 하나의 최대 대기 시간(초)")
+    parser.add_argument("--results-dir", default=os.path.join("results", "load_test"),
+                        help="부하 테스트 결과와 테스트 중 생기는 기록(프롬프트 저장소, 세션 기록, 서버 로그)을 둘 폴더")
+    args = parser.parse_args(argv)
+    args.run_id = datetime.now().strftime("%H%M%S")
+    args.results_dir = os.path.abspath(args.results_dir)
+
+    # 서버 프로세스가 물려받을 설정 (모의 제공자, 결과 저장 위치)
+    os.environ["LLM_PROVIDER"] = "mock"
+    os.environ["MOCK_BASE_LATENCY"] = str(args.base_latency)
+    os.environ["MOCK_TOKEN_LATENCY"] = str(args.token_latency)
+    os.environ["RESULTS_DIR"] = args.results_dir
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    from results_store import append_result, results_path
+
+    failed = 0
+    for app in args.apps:
+        for sessions in args.sessions:
+            row = run_level(app, sessions, args)
+            print_row(row)
+            append_result(RESULT_KIND, {**row, "base_latency": args.base_latency, "token_latency": args.token_latency})
+            failed += row["errors"]
+    print(f"결과 저장 위치: {results_path(RESULT_KIND)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
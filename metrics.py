@@ -0,0 +1,147 @@
+import re
+import numpy as np
+
+# 반복 샘플 간 다양성/일관성 지표 (오프라인, 네트워크 불필요)
+
+# MinHash 설정 (홀수 a 에 대한 a*x + b mod 2^32 는 uint32 위의 순열이므로 오버플로는 의도된 동작)
+NUM_PERMUTATIONS = 128
+SHINGLE_SIZE = 3
+COSINE_DIM = 1 << 12
+NEAR_DUPLICATE_THRESHOLD = 0.9
+PERMUTATION_CHUNK = 16
+
+_rng = np.random.default_rng(20240901)
+_PERM_A = _rng.integers(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint32) | np.uint32(1)
+_PERM_B = _rng.integers(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint32)
+_GRAM_BASE = np.uint64(0x100000001B3)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_MAX_HASH = np.iinfo(np.uint32).max
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+# 공백을 정리하고 소문자로 바꾸는 정규화 함수
+def normalize_text(text):
+    return _WHITESPACE.sub(" ", str(text or "")).strip().lower()
+
+
+# 문자 n-gram 해시 배열을 만드는 함수 (한국어처럼 띄어쓰기가 불규칙한 텍스트에도 동작)
+def char_ngram_hashes(text, n=SHINGLE_SIZE):
+    text = normalize_text(text)
+    if not text:
+        return np.empty(0, dtype=np.uint32)
+    codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    n = min(n, codepoints.size)
+    width = codepoints.size - n + 1
+    hashes = np.zeros(width, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for offset in range(n):
+            hashes = hashes * _GRAM_BASE + codepoints[offset:offset + width]
+        return ((hashes * _MIX) >> np.uint64(32)).astype(np.uint32)
+
+
+# 응답 목록의 MinHash 시그니처 행렬 (응답 수 x 순열 수)
+def minhash_signatures(texts, n=SHINGLE_SIZE):
+    signatures = np.full((len(texts), NUM_PERMUTATIONS), _MAX_HASH, dtype=np.uint32)
+    shingles = [np.unique(char_ngram_hashes(text, n)) for text in texts]
+    rows = np.array([row for row, s in enumerate(shingles) if s.size], dtype=np.int64)
+    if rows.size == 0:
+        return signatures
+    # 모든 응답의 shingle을 이어 붙이고 응답 경계마다 minimum.reduceat 으로 한 번에 축약
+    flat = np.concatenate([shingles[row] for row in rows])
+    starts = np.cumsum([0] + [shingles[row].size for row in rows[:-1]])
+    with np.errstate(over="ignore"):
+        for start in range(0, NUM_PERMUTATIONS, PERMUTATION_CHUNK):
+            a = _PERM_A[start:start + PERMUTATION_CHUNK, None]
+            b = _PERM_B[start:start + PERMUTATION_CHUNK, None]
+            permuted = a * flat[None, :] + b
+            signatures[rows, start:start + PERMUTATION_CHUNK] = np.minimum.reduceat(permuted, starts, axis=1).T
+    return signatures
+
+
+# MinHash로 추정한 쌍별 Jaccard 유사도 행렬
+def pairwise_jaccard(texts, n=SHINGLE_SIZE):
+    signatures = minhash_signatures(texts, n)
+    if len(texts) == 0:
+        return np.zeros((0, 0))
+    similarity = np.empty((len(texts), len(texts)))
+    # 응답 수가 많아도 메모리가 폭증하지 않도록 행 블록 단위로 비교
+    block = max(1, 4_000_000 // (len(texts) * NUM_PERMUTATIONS))
+    for start in range(0, len(texts), block):
+        stop = start + block
+        similarity[start:stop] = (signatures[start:stop, None, :] == signatures[None, :, :]).mean(axis=2)
+    empty = np.array([not normalize_text(t) for t in texts])
+    similarity[empty, :] = 0.0
+    similarity[:, empty] = 0.0
+    return similarity
+
+
+# 문자 n-gram 해싱 벡터의 쌍별 코사인 유사도 행렬
+def pairwise_cosine(texts, n=SHINGLE_SIZE, dim=COSINE_DIM):
+    hashes = [char_ngram_hashes(text, n) for text in texts]
+    if not hashes:
+        return np.zeros((0, 0))
+    lengths = np.array([h.size for h in hashes])
+    doc_index = np.repeat(np.arange(len(hashes)), lengths)
+    buckets = (np.concatenate(hashes) % dim).astype(np.int64) if lengths.sum() else np.empty(0, dtype=np.int64)
+    counts = np.bincount(doc_index * dim + buckets, minlength=len(hashes) * dim).reshape(len(hashes), dim).astype(np.float64)
+    norms = np.linalg.norm(counts, axis=1, keepdims=True)
+    vectors = np.divide(counts, norms, out=np.zeros_like(counts), where=norms > 0)
+    return vectors @ vectors.T
+
+
+# 대각선을 제외한 상삼각 값의 평균
+def _mean_off_diagonal(matrix):
+    if matrix.shape[0] < 2:
+        return None
+    upper = matrix[np.triu_indices(matrix.shape[0], k=1)]
+    return float(upper.mean())
+
+
+# 응답 길이 통계
+def length_stats(texts):
+    lengths = np.array([len(str(t or "")) for t in texts], dtype=np.float64)
+    if lengths.size == 0:
+        return {"mean": 0.0, "std": 0.0, "min": 0, "median": 0.0, "max": 0, "cv": 0.0}
+    mean = float(lengths.mean())
+    std = float(lengths.std())
+    return {
+        "mean": mean,
+        "std": std,
+        "min": int(lengths.min()),
+        "median": float(np.median(lengths)),
+        "max": int(lengths.max()),
+        "cv": std / mean if mean else 0.0,
+    }
+
+
+# 정규화 후 완전히 같은 응답의 비율
+def duplicate_rate(texts):
+    if not texts:
+        return 0.0
+    normalized = [normalize_text(t) for t in texts]
+    return 1.0 - len(set(normalized)) / len(normalized)
+
+
+# 유사도가 임계값 이상인 다른 응답이 하나라도 있는 응답의 비율
+def near_duplicate_rate(similarity, threshold=NEAR_DUPLICATE_THRESHOLD):
+    if similarity.shape[0] < 2:
+        return 0.0
+    others = similarity.copy()
+    np.fill_diagonal(others, 0.0)
+    return float((others >= threshold).any(axis=1).mean())
+
+
+# 한 모델의 반복 응답에 대한 일관성 지표 요약
+def consistency_metrics(texts):
+    texts = list(texts)
+    jaccard = pairwise_jaccard(texts)
+    cosine = pairwise_cosine(texts)
+    return {
+        "num_responses": len(texts),
+        "mean_jaccard": _mean_off_diagonal(jaccard),
+        "mean_cosine": _mean_off_diagonal(cosine),
+        "duplicate_rate": duplicate_rate(texts),
+        "near_duplicate_rate": near_duplicate_rate(jaccard),
+        "length": length_stats(texts),
+    }
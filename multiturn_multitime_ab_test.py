@@ -1,48 +1,35 @@
 import streamlit as st
-from openai import OpenAI
+from providers import generate_chat_completion_sync, build_messages
+from prompt_cache import usage_fields, render_run_caption, render_cache_report
+from session_store import session_list, page_key
+from chat_history import render_history
+from history_encoding import structured_message, encode_history, history_savings, history_settings, render_savings_report
+from history_encoding import render_controls as render_history_encoding_controls
+from prompt_library import get_library, settings_key
+from prompt_picker import render_prompt_picker
 import os
 import json
 from datetime import datetime
 from typing import TypedDict, List
 
-# OpenAI API 키 설정
-api_key = st.secrets["OPENAI_API_KEY"]
-client = OpenAI(api_key=api_key) if api_key else None
-
-# 세션 상태 초기화
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-if "system_prompts" not in st.session_state:
-    st.session_state.system_prompts = ["당신은 도움이 되는 AI 어시스턴트입니다."]
-if "selected_prompts" not in st.session_state:
-    st.session_state.selected_prompts = []
+# 세션 상태 초기화 (대화 기록은 메모리 한도를 넘으면 오래된 메시지부터 디스크로 내보냄)
+# 멀티페이지 앱의 다른 페이지와 섞이지 않도록 키에 페이지 이름을 붙임
+PAGE = "multiturn_multitime_ab_test.py"
+chat_messages = session_list(page_key(PAGE, "messages"))
 
 st.title("멀티턴 AI 채팅 테스트")
 
 # 사이드바에 설정 추가
 st.sidebar.title("설정")
-new_system_prompt = st.sidebar.text_area("새 시스템 프롬프트 추가:", height=100)
-if st.sidebar.button("프롬프트 추가") and new_system_prompt:
-    st.session_state.system_prompts.append(new_system_prompt)
-
-# 현재 프롬프트 리스트와 선택 옵션
-st.sidebar.write("### 현재 시스템 프롬프트")
-for idx, prompt in enumerate(st.session_state.system_prompts):
-    if st.sidebar.checkbox(f"버전 {idx + 1}", key=f"prompt_{idx}"):
-        if idx not in st.session_state.selected_prompts:
-            st.session_state.selected_prompts.append(idx)
-    else:
-        if idx in st.session_state.selected_prompts:
-            st.session_state.selected_prompts.remove(idx)
-
-# 선택된 프롬프트 표시
-st.sidebar.write("**선택된 프롬프트:**")
-if st.session_state.selected_prompts:
-    for idx in st.session_state.selected_prompts:
-        with st.sidebar.expander(f"버전 {idx + 1}"):
-            st.write(st.session_state.system_prompts[idx])
-else:
-    st.sidebar.write("선택된 프롬프트가 없습니다.")
+library = get_library()
+selected_prompts = render_prompt_picker(
+    PAGE,
+    "당신은 도움이 되는 AI 어시스턴트입니다.",
+    "새 시스템 프롬프트 추가:",
+    "프롬프트 추가",
+    "### 저장된 시스템 프롬프트",
+    "**선택된 프롬프트:**",
+)
 
 # 모델 선택
 model = st.sidebar.selectbox(
@@ -56,17 +43,6 @@ max_tokens = st.sidebar.number_input("최대 토큰 수:", min_value=1, max_valu
 top_p = st.sidebar.slider("Top P:", min_value=0.0, max_value=1.0, value=1.0, step=0.1)
 num_iterations = st.sidebar.number_input("반복 횟수:", min_value=1, max_value=10, value=1, step=1)
 
-# 대화 기록 표시
-for idx, message in enumerate(st.session_state.messages):
-    if message["role"] == "user":
-        st.text_area("사용자:", value=message["content"], height=100, disabled=True, key=f"user_{idx}")
-    else:
-        with st.expander(f"AI 응답 (프롬프트 버전 {message.get('prompt_version', '알 수 없음')})"):
-            st.text_area("AI:", value=message["content"], height=100, disabled=True, key=f"ai_{idx}")
-
-# 채팅 입력 부분을 대화 기록 초기화 버튼 바로 위로 이동
-user_input = st.text_input("메시지를 입력하세요:", key="user_input")
-
 # 응답 구조체 정의
 class ChatResponse(TypedDict):
     total_round: int
@@ -77,69 +53,116 @@ class ChatResponse(TypedDict):
     is_end: bool
     message: str
 
-# 메시지 전송 버튼
-if st.button("전송"):
-    if user_input:
-        # 사용자 메시지를 대화 기록에 추가
-        st.session_state.messages.append({"role": "user", "content": user_input})
-
-        # AI 응답 생성 반복
-        for _ in range(num_iterations):
-            responses = []
-            for idx in st.session_state.selected_prompts:
-                try:
-                    response = client.chat.completions.create(
-                        model=model,
-                        messages=[
-                            {"role": "system", "content": st.session_state.system_prompts[idx]},
-                            *st.session_state.messages
-                        ],
-                        temperature=temperature,
-                        max_tokens=max_tokens,
-                        top_p=top_p,
-                        response_format={"type": "json_object"}
-                    )
-
-                    ai_response = response.choices[0].message.content
-                    structured_response = json.loads(ai_response)
-
-                    validated_response = ChatResponse(
-                        total_round=structured_response.get('total_round', 1),
-                        answer_count=structured_response.get('answer_count', 0),
-                        current_answer=structured_response.get('current_answer', ''),
-                        hint=structured_response.get('hint', []),
-                        check_answer=structured_response.get('check_answer', False),
-                        is_end=structured_response.get('is_end', False),
-                        message=structured_response.get('message', '')
-                    )
-
-                    responses.append({
-                        "role": "assistant",
-                        "content": json.dumps(validated_response, ensure_ascii=False, indent=2),
-                        "prompt_version": idx + 1
-                    })
-                except json.JSONDecodeError:
-                    st.error("AI 응답을 JSON으로 파싱할 수 없습니다.")
-                except Exception as e:
-                    st.error(f"오류가 발생했습니다: {str(e)}")
-
-            # 대화 기록에 추가
-            st.session_state.messages.extend(responses)
-
-        # 페이지 새로고침
-        st.rerun()
+history_encoding, history_fields = render_history_encoding_controls(PAGE, ChatResponse.__annotations__)
+
+# 사이드바의 캐시 적중률/토큰 절약 표 자리 (fragment 가 전송할 때마다 다시 그림)
+sidebar_reports = st.sidebar.empty()
+
+# 대화 기록과 입력창 (fragment 로 분리해 메시지를 보낼 때 이 부분만 다시 그림)
+@st.fragment
+def chat_panel():
+    history = st.container()
+
+    # 채팅 입력 부분을 대화 기록 초기화 버튼 바로 위로 이동
+    user_input = st.text_input("메시지를 입력하세요:", key=page_key(PAGE, "user_input"))
+
+    # 메시지 전송 버튼
+    if st.button("전송"):
+        if user_input:
+            # 사용자 메시지를 대화 기록에 추가
+            chat_messages.append({"role": "user", "content": user_input})
+            sent_from = len(chat_messages)
+
+            # AI 응답 생성 반복 (같은 프롬프트/설정/대화 맥락으로 저장된 결과가 있으면 재사용)
+            reused = 0
+            for _ in range(num_iterations):
+                responses = []
+                context_key = settings_key(encode_history(chat_messages, history_encoding, history_fields))
+                savings = history_savings(chat_messages, history_encoding, history_fields)
+                for prompt_hash in selected_prompts:
+                    settings = {
+                        "model": model,
+                        "temperature": temperature,
+                        "max_tokens": max_tokens,
+                        "top_p": top_p,
+                        "context": context_key,
+                    }
+                    content = library.find_result(prompt_hash, settings)
+                    # 재사용한 결과에는 토큰 기록 없이 전송 형식만 남김 (새 응답은 savings 에 이미 들어 있음)
+                    usage = history_settings(history_encoding, history_fields)
+                    if content is not None:
+                        reused += 1
+                        validated_response = json.loads(content)
+                    else:
+                        try:
+                            response = generate_chat_completion_sync(
+                                model=model,
+                                messages=build_messages(library.get(prompt_hash)["text"],
+                                                        encode_history(chat_messages, history_encoding,
+                                                                       history_fields)),
+                                temperature=temperature,
+                                max_tokens=max_tokens,
+                                top_p=top_p,
+                                response_format={"type": "json_object"}
+                            )
+
+                            ai_response = response["content"]
+                            structured_response = json.loads(ai_response)
+
+                            validated_response = ChatResponse(
+                                total_round=structured_response.get('total_round', 1),
+                                answer_count=structured_response.get('answer_count', 0),
+                                current_answer=structured_response.get('current_answer', ''),
+                                hint=structured_response.get('hint', []),
+                                check_answer=structured_response.get('check_answer', False),
+                                is_end=structured_response.get('is_end', False),
+                                message=structured_response.get('message', '')
+                            )
+                            content = json.dumps(validated_response, ensure_ascii=False, indent=2)
+                            library.store_result(prompt_hash, settings, content)
+                            usage = {"latency": response["latency"], **usage_fields(response["usage"]), **savings}
+                        except json.JSONDecodeError:
+                            st.error("AI 응답을 JSON으로 파싱할 수 없습니다.")
+                            continue
+                        except Exception as e:
+                            st.error(f"오류가 발생했습니다: {str(e)}")
+                            continue
+
+                    responses.append(structured_message(
+                        validated_response,
+                        prompt_version=library.label(prompt_hash),
+                        prompt_hash=prompt_hash,
+                        **usage
+                    ))
+
+                # 대화 기록에 추가
+                chat_messages.extend(responses)
+            if reused:
+                st.caption(f"저장된 결과 {reused}개를 재사용했습니다.")
+            render_run_caption(chat_messages[sent_from:])
+
+    # 대화 기록 표시 (새 메시지까지 반영된 상태로 그림)
+    with history:
+        render_history(chat_messages)
+
+    reports = sidebar_reports.container()
+    render_cache_report(chat_messages, container=reports)
+    render_savings_report(chat_messages, container=reports)
+
+chat_panel()
 
 # 대화 기록 초기화 버튼
 if st.button("대화 기록 초기화"):
-    st.session_state.messages = []
+    chat_messages.clear()
     st.rerun()
 
 # 대화 내용 JSON 다운로드 버튼
 if st.button("대화 내용 다운로드"):
     chat_data = {
-        "system_prompts": st.session_state.system_prompts,
-        "selected_prompts": [st.session_state.system_prompts[idx] for idx in st.session_state.selected_prompts],
-        "messages": st.session_state.messages,
+        "system_prompts": [record["text"] for record in library.all()],
+        "selected_prompts": [library.get(prompt_hash)["text"] for prompt_hash in selected_prompts],
+        "selected_prompt_hashes": selected_prompts,
+        "messages": list(chat_messages),
         "model": model,
         "temperature": temperature,
         "max_tokens": max_tokens,
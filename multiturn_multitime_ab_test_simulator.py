@@ -1,58 +1,51 @@
 import streamlit as st
-from openai import OpenAI
+from providers import generate_chat_completion, run_sync_cancellable, build_messages
+from prompt_cache import usage_fields, render_run_caption, render_cache_report
+from run_control import StopControl, save_status, render_status
+from session_store import session_list, page_key
+from chat_history import render_history
+from prompt_library import get_library, prompt_hash, settings_key
+from columnar_export import CallWriter, result_fields
+from conversation_tree import get_tree, prefix_hash, branch_key
+from prompt_picker import render_prompt_picker
 import os
 import json
 from datetime import datetime
 from typing import TypedDict, List
 
-# OpenAI API 키 설정
-api_key = st.secrets["OPENAI_API_KEY"]
-client = OpenAI(api_key=api_key) if api_key else None
-
-# 세션 상태 초기화
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-if "system_prompts" not in st.session_state:
-    st.session_state.system_prompts = ["당신은 도움이 되는 AI 어시스턴트입니다."]
-if "simulation_prompt" not in st.session_state:
-    st.session_state.simulation_prompt = "시뮬레이션 사용자 역할입니다."
-if "selected_prompts" not in st.session_state:
-    st.session_state.selected_prompts = []
-if "turn_limit" not in st.session_state:
-    st.session_state.turn_limit = 1
+SIMULATED_USER_LABEL = "시뮬레이션 사용자"
+
+# 세션 상태 초기화 (대화 기록은 메모리 한도를 넘으면 오래된 메시지부터 디스크로 내보냄)
+# 멀티페이지 앱의 다른 페이지와 섞이지 않도록 키에 페이지 이름을 붙임
+PAGE = "multiturn_multitime_ab_test_simulator.py"
+chat_messages = session_list(page_key(PAGE, "messages"))
+SIMULATION_PROMPT_KEY = page_key(PAGE, "simulation_prompt")
+TURN_LIMIT_KEY = page_key(PAGE, "turn_limit")
+RESULTS_KEY = page_key(PAGE, "simulation_results")
+USAGE_KEY = page_key(PAGE, "simulation_usage")
+STATUS_KEY = page_key(PAGE, "simulation_status")
+st.session_state.setdefault(SIMULATION_PROMPT_KEY, "시뮬레이션 사용자 역할입니다.")
+st.session_state.setdefault(TURN_LIMIT_KEY, 1)
 
 st.title("멀티턴 AI 시뮬레이션 테스트")
 
 # 사이드바에 설정 추가
 st.sidebar.title("설정")
-new_system_prompt = st.sidebar.text_area("새 테스트 프롬프트 추가:", height=100)
-if st.sidebar.button("테스트 프롬프트 추가") and new_system_prompt:
-    st.session_state.system_prompts.append(new_system_prompt)
+library = get_library()
+selected_prompts = render_prompt_picker(
+    PAGE,
+    "당신은 도움이 되는 AI 어시스턴트입니다.",
+    "새 테스트 프롬프트 추가:",
+    "테스트 프롬프트 추가",
+    "### 저장된 테스트 프롬프트",
+    "**선택된 테스트 프롬프트:**",
+)
 
 st.sidebar.write("### 시뮬레이션 프롬프트")
-st.session_state.simulation_prompt = st.sidebar.text_area(
-    "시뮬레이션 사용자 역할 프롬프트:", value=st.session_state.simulation_prompt, height=100
+st.session_state[SIMULATION_PROMPT_KEY] = st.sidebar.text_area(
+    "시뮬레이션 사용자 역할 프롬프트:", value=st.session_state[SIMULATION_PROMPT_KEY], height=100
 )
 
-# 현재 테스트 프롬프트 리스트와 선택 옵션
-st.sidebar.write("### 현재 테스트 프롬프트")
-for idx, prompt in enumerate(st.session_state.system_prompts):
-    if st.sidebar.checkbox(f"버전 {idx + 1}", key=f"prompt_{idx}"):
-        if idx not in st.session_state.selected_prompts:
-            st.session_state.selected_prompts.append(idx)
-    else:
-        if idx in st.session_state.selected_prompts:
-            st.session_state.selected_prompts.remove(idx)
-
-# 선택된 테스트 프롬프트 표시
-st.sidebar.write("**선택된 테스트 프롬프트:**")
-if st.session_state.selected_prompts:
-    for idx in st.session_state.selected_prompts:
-        with st.sidebar.expander(f"버전 {idx + 1}"):
-            st.write(st.session_state.system_prompts[idx])
-else:
-    st.sidebar.write("선택된 프롬프트가 없습니다.")
-
 # 모델 선택
 model = st.sidebar.selectbox(
     "AI 모델을 선택하세요:",
@@ -63,21 +56,21 @@ model = st.sidebar.selectbox(
 temperature = st.sidebar.slider("Temperature:", min_value=0.0, max_value=1.0, value=0.7, step=0.1)
 max_tokens = st.sidebar.number_input("최대 토큰 수:", min_value=1, max_value=4096, value=256, step=1)
 top_p = st.sidebar.slider("Top P:", min_value=0.0, max_value=1.0, value=1.0, step=0.1)
-st.session_state.turn_limit = st.sidebar.number_input("대화 턴 수:", min_value=1, max_value=10, value=1, step=1)
+st.session_state[TURN_LIMIT_KEY] = st.sidebar.number_input("대화 턴 수:", min_value=1, max_value=10, value=1, step=1)
+reuse_turns = st.sidebar.checkbox("저장된 대화 턴 재사용", value=True,
+                                  help="같은 대화 앞부분에서 같은 조건으로 만든 턴이 있으면 다시 호출하지 않고 사용합니다. "
+                                       "끄면 모든 턴을 새로 만들어 저장합니다.")
+tree = get_tree()
 
 # 대화 기록 표시
 st.write("### 사용자 대화 기록")
-for idx, message in enumerate(st.session_state.messages):
-    if message["role"] == "user":
-        st.text_area("사용자:", value=message["content"], height=100, disabled=True, key=f"user_{idx}")
-    else:
-        st.text_area("AI:", value=message["content"], height=100, disabled=True, key=f"ai_{idx}")
+render_history(chat_messages)
 
 # 채팅 입력 부분
-user_input = st.text_input("사용자 메시지를 입력하세요:", key="user_input")  # 사용자 입력 정의
+user_input = st.text_input("사용자 메시지를 입력하세요:", key=page_key(PAGE, "user_input"))  # 사용자 입력 정의
 if st.button("메시지 추가"):
     if user_input:
-        st.session_state.messages.append({"role": "user", "content": user_input})
+        chat_messages.append({"role": "user", "content": user_input})
 
 # 응답 구조체 정의
 class ChatResponse(TypedDict):
@@ -89,99 +82,191 @@ class ChatResponse(TypedDict):
     is_end: bool
     message: str
 
-# 시뮬레이션 실행
-if st.button("시뮬레이션 실행"):
-    simulation_results = []
+# 호출 하나의 토큰 사용량과 열 형식 호출 기록을 남기는 함수
+# 토큰 사용량은 AI 응답은 프롬프트 버전별로, 시뮬레이션 사용자 응답은 따로 집계한다
+def record_call(run_log, response, variant, system_prompt, messages):
+    run_log["usage"].append({"prompt_version": variant, **usage_fields(response["usage"])})
+    user_messages = [message["content"] for message in messages if message["role"] == "user"]
+    run_log["writer"].append(
+        item=(len(messages) - run_log["initial_length"]) // 2 + 1,
+        variant=variant,
+        system_prompt=system_prompt,
+        prompt_hash=prompt_hash(system_prompt),
+        input=user_messages[-1] if user_messages else None,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        top_p=top_p,
+        settings_key=run_log["settings_key"],
+        **result_fields(response),
+    )
+
+# 테스트 프롬프트로 AI 응답 한 턴을 만드는 함수 (반환: 메시지, 대화 종료 여부)
+def generate_ai_turn(prompt, prompt_version, messages, on_wait, run_log):
+    response_a = run_sync_cancellable(generate_chat_completion(
+        model=model,
+        messages=build_messages(prompt, messages),
+        temperature=temperature,
+        max_tokens=max_tokens,
+        top_p=top_p,
+        response_format={"type": "json_object"}
+    ), on_wait)
+
+    record_call(run_log, response_a, prompt_version, prompt, messages)
+    ai_response_a = response_a["content"]
+    structured_response_a = json.loads(ai_response_a)
+
+    validated_response_a = ChatResponse(
+        total_round=structured_response_a.get('total_round', 1),
+        answer_count=structured_response_a.get('answer_count', 0),
+        current_answer=structured_response_a.get('current_answer', ''),
+        hint=structured_response_a.get('hint', []),
+        check_answer=structured_response_a.get('check_answer', False),
+        is_end=structured_response_a.get('is_end', False),
+        message=structured_response_a.get('message', '')
+    )
+    message = {"role": "assistant", "content": validated_response_a["message"],
+               "response": ai_response_a, "latency": response_a["latency"]}
+    return message, validated_response_a["is_end"]
+
+# 시뮬레이션 프롬프트로 사용자 응답 한 턴을 만드는 함수
+def generate_user_turn(simulation_prompt, messages, on_wait, run_log):
+    response_b = run_sync_cancellable(generate_chat_completion(
+        model=model,
+        messages=build_messages(simulation_prompt, messages),
+        temperature=temperature,
+        max_tokens=max_tokens,
+        top_p=top_p
+    ), on_wait)
+    record_call(run_log, response_b, SIMULATED_USER_LABEL, simulation_prompt, messages)
+    return {"role": "user", "content": response_b["content"], "response": response_b["content"],
+            "latency": response_b["latency"]}, False
 
-    if not st.session_state.selected_prompts:
+# 대화 트리에서 다음 노드를 찾고, 없으면 generate() 로 메시지를 만들어 추가하는 함수 (반환: 노드, 재사용 여부)
+def advance(prefix, branch, generate):
+    node = tree.child(prefix, branch) if reuse_turns else None
+    if node is not None:
+        return node, True
+    message, is_end = generate()
+    return tree.add(prefix, branch, message, is_end), False
+
+# 노드의 메시지에 원본 응답과 지연 시간을 붙인 대화 메시지 (내보낸 기록을 재생할 수 있도록, 요청에는 role/content 만 보냄)
+def node_message(node):
+    return {**node["message"], **{name: node[name] for name in ("response", "latency") if name in node}}
+
+# 시뮬레이션 실행 (결과는 세션에 저장해 중지된 뒤 다시 실행되어도 그때까지의 대화를 보여줌)
+# 턴마다 대화 트리에서 같은 앞부분, 같은 조건으로 만든 메시지를 먼저 찾으므로
+# 여러 프롬프트가 공유하는 앞부분이나 이전 실행에서 만든 턴은 다시 호출하지 않는다.
+if st.button("시뮬레이션 실행"):
+    if not selected_prompts:
         st.error("테스트 프롬프트를 하나 이상 선택해야 합니다.")
     else:
-        messages = []
-        messages.extend(st.session_state.messages)
+        st.session_state[RESULTS_KEY] = simulation_results = []
+        st.session_state[USAGE_KEY] = usage_records = []
+        initial_messages = list(chat_messages)
+        simulation_prompt = st.session_state[SIMULATION_PROMPT_KEY]
+        model_settings = {"model": model, "temperature": temperature, "max_tokens": max_tokens, "top_p": top_p}
+        user_branch = branch_key("user", prompt_hash(simulation_prompt), model_settings)
+        stop_control = StopControl("시뮬레이션 실행 중")
+        run_log = {
+            "usage": usage_records,
+            "writer": CallWriter("multiturn_multitime_ab_test_simulator.py"),
+            "initial_length": len(initial_messages),
+            "settings_key": settings_key(model_settings),
+        }
 
-        for prompt_idx in st.session_state.selected_prompts:
-            prompt = st.session_state.system_prompts[prompt_idx]
-            simulation_prompt = st.session_state.simulation_prompt
+        try:
+            for position, selected_hash in enumerate(selected_prompts):
+                prompt = library.get(selected_hash)["text"]
+                ai_branch = branch_key("assistant", selected_hash, {**model_settings, "response_format": "json_object"})
+
+                # 프롬프트마다 시작 대화에서 새로 진행 (다른 프롬프트의 대화가 섞이지 않도록)
+                messages = list(initial_messages)
+                prefix = prefix_hash(messages)
+                result = {"prompt_hash": selected_hash, "response": messages, "reused_turns": 0, "generated_turns": 0,
+                          "stopped": True}
 
-            for turn in range(st.session_state.turn_limit):
                 try:
-                    # 테스트 프롬프트 사용
-                    response_a = client.chat.completions.create(
-                        model=model,
-                        messages=[{"role": "system", "content": prompt}] + messages,
-                        temperature=temperature,
-                        max_tokens=max_tokens,
-                        top_p=top_p,
-                        response_format={"type": "json_object"}
-                    )
-
-                    ai_response_a = response_a.choices[0].message.content
-                    structured_response_a = json.loads(ai_response_a)
-
-                    validated_response_a = ChatResponse(
-                        total_round=structured_response_a.get('total_round', 1),
-                        answer_count=structured_response_a.get('answer_count', 0),
-                        current_answer=structured_response_a.get('current_answer', ''),
-                        hint=structured_response_a.get('hint', []),
-                        check_answer=structured_response_a.get('check_answer', False),
-                        is_end=structured_response_a.get('is_end', False),
-                        message=structured_response_a.get('message', '')
-                    )
-
-                    messages.append({"role": "assistant", "content": validated_response_a["message"]})
-
-                    # 시뮬레이션 프롬프트 사용
-                    response_b = client.chat.completions.create(
-                        model=model,
-                        messages=[{"role": "system", "content": simulation_prompt}] + messages,
-                        temperature=temperature,
-                        max_tokens=max_tokens,
-                        top_p=top_p
-                    )
-
-                    ai_response_b = response_b.choices[0].message.content
-                    messages.append({"role": "user", "content": ai_response_b})
-
-                    if validated_response_a["is_end"]:
-                        break
-
-                except json.JSONDecodeError:
-                    st.error("AI 응답을 JSON으로 파싱할 수 없습니다.")
-                    break
-                except Exception as e:
-                    st.error(f"오류가 발생했습니다: {str(e)}")
-                    break
-
-            simulation_results.append({
-                "prompt_version": prompt_idx + 1,
-                "response": messages
-            })
-
-    # 시뮬레이션 결과 표시
+                    for turn in range(st.session_state[TURN_LIMIT_KEY]):
+                        def show_progress():
+                            stop_control.update(position, len(selected_prompts),
+                                                f"· 프롬프트 {library.label(selected_hash)} {turn + 1}턴")
+
+                        try:
+                            ai_node, reused_ai = advance(prefix, ai_branch,
+                                                         lambda: generate_ai_turn(prompt, library.label(selected_hash), messages,
+                                                                                  show_progress, run_log))
+                            messages.append(node_message(ai_node))
+                            prefix = ai_node["hash"]
+
+                            user_node, reused_user = advance(prefix, user_branch,
+                                                             lambda: generate_user_turn(simulation_prompt, messages,
+                                                                                      show_progress, run_log))
+                            messages.append(node_message(user_node))
+                            prefix = user_node["hash"]
+
+                            result["reused_turns" if reused_ai and reused_user else "generated_turns"] += 1
+                            if ai_node["is_end"]:
+                                break
+
+                        except json.JSONDecodeError:
+                            st.error("AI 응답을 JSON으로 파싱할 수 없습니다.")
+                            break
+                        except Exception as e:
+                            st.error(f"오류가 발생했습니다: {str(e)}")
+                            break
+                    result["stopped"] = False
+                finally:
+                    # 중지되어도 그때까지 만든 턴은 트리에 남아 있으므로 다음 실행에서 이어서 진행
+                    simulation_results.append(result)
+                    # 프롬프트마다 호출 기록을 행 그룹으로 써 둠 (긴 실행에서도 기록이 메모리에 쌓이지 않고 행 그룹이 프롬프트 단위로 나뉨)
+                    run_log["writer"].flush()
+            stop_control.finish()
+        finally:
+            run_log["writer"].close()
+            finished = sum(1 for result in simulation_results if not result["stopped"])
+            save_status(finished, len(selected_prompts), key=STATUS_KEY)
+
+# 시뮬레이션 결과 표시
+if st.session_state.get(RESULTS_KEY):
     st.write("### 시뮬레이션 결과")
-    for result in simulation_results:
-        with st.expander(f"테스트 프롬프트 버전 {result['prompt_version']} 결과"):
+    render_status("개 프롬프트", key=STATUS_KEY)
+    render_run_caption(st.session_state.get(USAGE_KEY, []))
+    render_cache_report(st.session_state.get(USAGE_KEY, []), title="프롬프트 캐시 적중률 (마지막 실행)")
+    for result in st.session_state[RESULTS_KEY]:
+        label = f"테스트 프롬프트 {library.label(result['prompt_hash'])} 결과"
+        if result["stopped"]:
+            label += " (중지됨)"
+        if result["reused_turns"]:
+            label += f" · 저장된 턴 {result['reused_turns']}개 재사용, 새로 만든 턴 {result['generated_turns']}개"
+        with st.expander(label):
             for idx, message in enumerate(result['response']):
                 role = "사용자" if message["role"] == "user" else "AI"
-                st.text_area(f"{role} {idx+1}:", value=message["content"], height=100, disabled=True, key=f"{role}_{idx}")
+                st.text_area(f"{role} {idx+1}:", value=message["content"], height=100, disabled=True,
+                             key=page_key(PAGE, f"{result['prompt_hash']}_{role}_{idx}"))
 
 # 대화 기록 초기화 버튼
 if st.button("대화 기록 초기화"):
-    st.session_state.messages = []  # 대화 기록 초기화
+    chat_messages.clear()  # 대화 기록 초기화
     st.write("대화 기록이 초기화되었습니다.")
 
 # 대화 내용 JSON 다운로드 버튼
 if st.button("대화 내용 다운로드"):
     chat_data = {
-        "system_prompts": st.session_state.system_prompts,
-        "simulation_prompt": st.session_state.simulation_prompt,
-        "selected_prompts": [st.session_state.system_prompts[idx] for idx in st.session_state.selected_prompts],
-        "messages": st.session_state.messages,
+        "system_prompts": [record["text"] for record in library.all()],
+        "simulation_prompt": st.session_state[SIMULATION_PROMPT_KEY],
+        "selected_prompts": [library.get(selected_hash)["text"] for selected_hash in selected_prompts],
+        "selected_prompt_hashes": selected_prompts,
+        "messages": list(chat_messages),
         "model": model,
         "temperature": temperature,
         "max_tokens": max_tokens,
         "top_p": top_p,
-        "turn_limit": st.session_state.turn_limit
+        "turn_limit": st.session_state[TURN_LIMIT_KEY],
+        # 마지막 실행에서 프롬프트별로 진행한 대화 (시뮬레이션한 턴에는 원본 응답과 지연 시간이 함께 있음)
+        "simulations": [
+            {"prompt_hash": result["prompt_hash"], "messages": result["response"]}
+            for result in st.session_state.get(RESULTS_KEY, [])
+        ]
     }
     json_string = json.dumps(chat_data, ensure_ascii=False, indent=2)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
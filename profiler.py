@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from lazy_imports import lazy_import
+
+try:
+    import resource
+except ImportError:
+    # Windows 에는 resource 모듈이 없음
+    resource = None
+
+# 재실행(rerun)마다 이름 붙인 구간과 제공자 호출 시간을 재는 선택형 프로파일러
+# - 환경 변수 PROFILER=1 로 켠다 (프로세스 전체 설정이라 세션별로 켜고 끄지 않는다). 꺼져 있으면 section() 은 시간을 재지 않는다.
+# - 구간마다 최근 ROLLING_WINDOW 개의 측정값만 남겨 분포(히스토그램)와 백분위를 보여준다.
+# - 제공자 호출은 백그라운드 이벤트 루프 스레드에서 기록되므로 프로세스 전체에서 하나의 기록을 공유한다.
+
+ROLLING_WINDOW = 500
+HISTOGRAM_BINS = 20
+
+_lock = threading.Lock()
+_samples = {}
+_enabled = os.getenv("PROFILER", "").lower() in ("1", "true", "yes")
+
+
+# 현재 프로세스의 메모리 사용량(MB) (리눅스는 현재 RSS, 그 외에는 최대 RSS)
+def process_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0.0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def is_enabled():
+    return _enabled
+
+
+# 측정값(초) 하나를 기록하는 함수
+def record(name, seconds):
+    if not _enabled:
+        return
+    with _lock:
+        if name not in _samples:
+            _samples[name] = deque(maxlen=ROLLING_WINDOW)
+        _samples[name].append(seconds)
+
+
+# with section("이름"): 블록의 실행 시간을 기록
+@contextmanager
+def section(name):
+    if not _enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def _snapshot():
+    np = lazy_import("numpy")
+    with _lock:
+        samples = {name: list(values) for name, values in _samples.items()}
+    return {name: np.array(values) for name, values in samples.items()}
+
+
+# 구간별 요약 (밀리초, 전체 소요 시간이 큰 순서)
+def summary():
+    np = lazy_import("numpy")
+    rows = []
+    for name, values in _snapshot().items():
+        if values.size == 0:
+            continue
+        ms = values * 1000
+        rows.append({
+            "section": name,
+            "count": int(ms.size),
+            "mean_ms": float(ms.mean()),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+            "max_ms": float(ms.max()),
+            "total_ms": float(ms.sum()),
+        })
+    return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+
+# 구간 하나의 히스토그램 (구간 시작 ms, 개수)
+def histogram(name, bins=HISTOGRAM_BINS):
+    values = _snapshot().get(name)
+    if values is None or values.size == 0:
+        return []
+    np = lazy_import("numpy")
+    counts, edges = np.histogram(values * 1000, bins=bins)
+    return [{"ms": float(edge), "count": int(count)} for edge, count in zip(edges[:-1], counts)]
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+
+
+# 측정값과 요약을 JSON 파일로 저장하고 경로를 반환하는 함수
+def dump(directory):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    data = {
+        "saved_at": datetime.now().isoformat(),
+        "window": ROLLING_WINDOW,
+        "summary": summary(),
+        "samples_ms": {name: (values * 1000).round(3).tolist() for name, values in _snapshot().items()},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return path
+
+
+# 디버그 사이드바 (프로파일러가 켜져 있을 때만 구간별 요약 표, 선택한 구간의 히스토그램, 파일 저장)
+def render_sidebar():
+    import streamlit as st
+    from results_store import results_dir
+
+    if not _enabled:
+        return
+    with st.sidebar.expander("프로파일러", expanded=True):
+        rows = summary()
+        if not rows:
+            st.caption("아직 측정된 구간이 없습니다.")
+            return
+        st.dataframe(rows, hide_index=True, column_config={
+            name: st.column_config.NumberColumn(format="%.1f") for name in ("mean_ms", "p50_ms", "p95_ms", "max_ms", "total_ms")
+        })
+        name = st.selectbox("히스토그램 구간", [row["section"] for row in rows], key="profiler_section")
+        st.bar_chart(histogram(name), x="ms", y="count", height=160)
+        col1, col2 = st.columns(2)
+        if col1.button("파일로 저장", key="profiler_dump"):
+            st.success(f"{dump(results_dir())} 에 저장했습니다.")
+        if col2.button("초기화", key="profiler_reset"):
+            reset()
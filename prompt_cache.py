@@ -0,0 +1,61 @@
+import streamlit as st
+from providers import cached_tokens
+
+# 제공자 프롬프트 캐시 적중률 집계와 표시
+# - OpenAI 는 요청 앞부분이 최근 요청과 바이트 단위로 같으면(1024 토큰 이상, 128 토큰 단위) 그 부분을 캐시에서 읽고
+#   usage.prompt_tokens_details.cached_tokens 로 알려준다. 캐시 적중분은 입력 처리(prefill)가 빠르고 요금이 싸다.
+# - 앱은 AI 메시지(또는 호출 기록)마다 입력 토큰 수와 캐시 토큰 수를 남기고, 이 모듈로 전송별, 프롬프트 버전별 적중률을 본다.
+
+TOTAL_LABEL = "전체"
+
+
+# 응답 사용량에서 메시지에 함께 저장할 토큰 필드
+def usage_fields(usage):
+    return {"prompt_tokens": (usage or {}).get("prompt_tokens") or 0, "cached_tokens": cached_tokens(usage)}
+
+
+# 토큰 기록이 있는 항목들의 요청 수, 입력/캐시 토큰 합계와 적중률
+def summarize(records):
+    summary = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+    for record in records:
+        if "prompt_tokens" not in record:
+            continue
+        summary["requests"] += record.get("requests", 1)
+        summary["prompt_tokens"] += record["prompt_tokens"]
+        summary["cached_tokens"] += record["cached_tokens"]
+    summary["hit_ratio"] = summary["cached_tokens"] / summary["prompt_tokens"] if summary["prompt_tokens"] else 0.0
+    return summary
+
+
+# 그룹(예: 프롬프트 버전)별 적중률 표 (group_by 가 None 이면 전체 한 줄)
+def cache_report(records, group_by="prompt_version"):
+    groups = {}
+    for record in records:
+        if "prompt_tokens" in record:
+            name = record.get(group_by, TOTAL_LABEL) if group_by else TOTAL_LABEL
+            groups.setdefault(name, []).append(record)
+    return [{"group": name, **summarize(group)} for name, group in groups.items()]
+
+
+# 전송(실행) 한 번의 적중률 캡션
+def render_run_caption(records):
+    summary = summarize(records)
+    if summary["requests"]:
+        st.caption(f"프롬프트 캐시: 입력 {summary['prompt_tokens']:,} 토큰 중 {summary['cached_tokens']:,} 토큰 적중 "
+                   f"({summary['hit_ratio']:.0%}, 요청 {summary['requests']}개)")
+
+
+# 사이드바의 그룹별 적중률 표 (container 를 주면 그 안에 그림, 예: fragment 가 갱신하는 사이드바 자리)
+def render_cache_report(records, group_by="prompt_version", title="프롬프트 캐시 적중률", container=None):
+    rows = cache_report(records, group_by)
+    with (container or st.sidebar).expander(title):
+        if not rows:
+            st.caption("아직 토큰 사용량이 기록된 응답이 없습니다.")
+            return
+        st.dataframe(rows, hide_index=True, column_config={
+            "group": "프롬프트 버전" if group_by == "prompt_version" else "구분",
+            "requests": "요청",
+            "prompt_tokens": "입력 토큰",
+            "cached_tokens": "캐시 토큰",
+            "hit_ratio": st.column_config.NumberColumn("적중률", format="percent"),
+        })
@@ -0,0 +1,128 @@
+import json
+import hashlib
+import threading
+from typing import TypedDict, Optional
+from results_store import append_result, read_results, results_path
+
+# 시스템 프롬프트를 내용 해시로 저장하는 영구 프롬프트 저장소
+# - 같은 내용의 프롬프트는 한 번만 저장되고, 어떤 프롬프트를 고쳐서 만들었는지(parent)로 버전 계보를 남긴다.
+# - 평가 결과는 (프롬프트 해시, 설정 키) 로 저장해 같은 조건으로 다시 선택하면 저장된 결과를 재사용한다.
+# 프롬프트는 results/prompts.jsonl, 결과는 results/prompt_results.jsonl 에 추가 기록되며 처음 사용할 때 색인을 메모리에 올린다.
+
+PROMPTS_KIND = "prompts"
+RESULTS_KIND = "prompt_results"
+SHORT_HASH_LENGTH = 8
+
+
+class PromptRecord(TypedDict):
+    hash: str
+    text: str
+    parent: Optional[str]
+    version: int
+    saved_at: str
+
+
+# 프롬프트 내용 해시 (앞뒤 공백과 줄바꿈 형식 차이는 같은 프롬프트로 취급)
+def prompt_hash(text):
+    normalized = "\n".join(line.rstrip() for line in text.strip().splitlines())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def short_hash(hash_value):
+    return hash_value[:SHORT_HASH_LENGTH]
+
+
+# 결과 재사용 여부를 가르는 설정의 키 (모델, 샘플링 파라미터, 대화 맥락 등 결과에 영향을 주는 값)
+def settings_key(settings):
+    encoded = json.dumps(settings, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class PromptLibrary:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.prompts = {}
+        self.results = {}
+        self.loaded_from = None
+
+    # 저장 위치가 바뀌었거나 처음 사용할 때 파일에서 색인을 다시 만드는 함수
+    def _ensure_loaded(self):
+        location = (results_path(PROMPTS_KIND), results_path(RESULTS_KIND))
+        if self.loaded_from == location:
+            return
+        self.prompts = {}
+        for record in read_results(PROMPTS_KIND):
+            self.prompts.setdefault(record["hash"], record)
+        self.results = {}
+        for record in read_results(RESULTS_KIND):
+            self.results[(record["prompt_hash"], record["settings_key"])] = record
+        self.loaded_from = location
+
+    # 프롬프트를 추가하고 해시를 반환하는 함수 (이미 있는 내용이면 저장하지 않고 기존 해시를 반환)
+    def add(self, text, parent=None):
+        hash_value = prompt_hash(text)
+        with self.lock:
+            self._ensure_loaded()
+            if hash_value not in self.prompts:
+                record = append_result(PROMPTS_KIND, {
+                    "hash": hash_value,
+                    "text": text.strip(),
+                    "parent": parent if parent in self.prompts else None,
+                    "version": len(self.prompts) + 1,
+                })
+                self.prompts[hash_value] = record
+        return hash_value
+
+    def get(self, hash_value):
+        with self.lock:
+            self._ensure_loaded()
+            return self.prompts.get(hash_value)
+
+    # 저장된 모든 프롬프트 (저장 순서)
+    def all(self):
+        with self.lock:
+            self._ensure_loaded()
+            return sorted(self.prompts.values(), key=lambda record: record["version"])
+
+    # 프롬프트에서 처음 프롬프트까지 거슬러 올라가는 버전 계보 (자기 자신부터)
+    def lineage(self, hash_value):
+        with self.lock:
+            self._ensure_loaded()
+            chain = []
+            while hash_value in self.prompts and hash_value not in chain:
+                chain.append(hash_value)
+                hash_value = self.prompts[hash_value]["parent"]
+            return [self.prompts[h] for h in chain]
+
+    def label(self, hash_value):
+        record = self.get(hash_value)
+        if record is None:
+            return short_hash(hash_value)
+        return f"v{record['version']} ({short_hash(hash_value)})"
+
+    # 같은 프롬프트와 설정으로 저장된 결과 (없으면 None)
+    def find_result(self, hash_value, settings):
+        with self.lock:
+            self._ensure_loaded()
+            record = self.results.get((hash_value, settings_key(settings)))
+        return None if record is None else record["result"]
+
+    def store_result(self, hash_value, settings, result):
+        key = settings_key(settings)
+        record = append_result(RESULTS_KIND, {
+            "prompt_hash": hash_value,
+            "settings_key": key,
+            "settings": settings,
+            "result": result,
+        })
+        with self.lock:
+            self._ensure_loaded()
+            self.results[(hash_value, key)] = record
+        return record
+
+
+_library = PromptLibrary()
+
+
+def get_library():
+    return _library
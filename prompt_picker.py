@@ -0,0 +1,50 @@
+import streamlit as st
+from prompt_library import get_library
+from session_store import page_key
+
+# 멀티턴 앱 사이드바의 프롬프트 추가/선택 화면 (프롬프트 저장소를 사용하므로 재시작해도 유지됨)
+
+SNIPPET_LENGTH = 20
+
+
+def _snippet(text):
+    first_line = text.splitlines()[0] if text else ""
+    return first_line if len(first_line) <= SNIPPET_LENGTH else first_line[:SNIPPET_LENGTH] + "…"
+
+
+# 프롬프트 추가/선택 사이드바를 그리고 선택된 프롬프트 해시 목록을 반환하는 함수 (세션 상태 키에는 page 이름을 붙임)
+def render_prompt_picker(page, default_prompt, add_label, add_button, list_title, selected_title):
+    library = get_library()
+    library.add(default_prompt)
+
+    new_prompt = st.sidebar.text_area(add_label, height=100)
+    records = library.all()
+    parent = st.sidebar.selectbox(
+        "기반 프롬프트 (기존 프롬프트를 고친 경우):",
+        [None] + [record["hash"] for record in records],
+        format_func=lambda hash_value: "없음" if hash_value is None else library.label(hash_value),
+    )
+    if st.sidebar.button(add_button) and new_prompt:
+        library.add(new_prompt, parent)
+        records = library.all()
+
+    # 저장된 프롬프트 목록과 선택 옵션 (체크박스 키가 내용 해시이므로 목록이 늘어나도 선택이 유지됨)
+    st.sidebar.write(list_title)
+    selected = []
+    for record in records:
+        if st.sidebar.checkbox(f"{library.label(record['hash'])} {_snippet(record['text'])}", key=page_key(page, f"prompt_{record['hash']}")):
+            selected.append(record["hash"])
+    st.session_state[page_key(page, "selected_prompts")] = selected
+
+    # 선택된 프롬프트 표시
+    st.sidebar.write(selected_title)
+    if selected:
+        for hash_value in selected:
+            with st.sidebar.expander(library.label(hash_value)):
+                st.write(library.get(hash_value)["text"])
+                lineage = library.lineage(hash_value)
+                if len(lineage) > 1:
+                    st.caption("계보: " + " ← ".join(f"v{record['version']}" for record in lineage))
+    else:
+        st.sidebar.write("선택된 프롬프트가 없습니다.")
+    return selected
@@ -0,0 +1,608 @@
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import threading
+import concurrent.futures
+from typing import TypedDict, Optional
+import streamlit as st
+import profiler
+import hedging
+from rate_limiter import RateLimiter
+
+# 모든 앱이 공통으로 사용하는 모델 제공자(provider) 계층
+# - Provider.call / Provider.stream 은 비동기 메서드이며, 제공자별 구현은 _call / _stream 만 작성한다.
+# - 모든 코루틴은 하나의 백그라운드 이벤트 루프에서 실행되므로 클라이언트 연결을 앱 전체가 재사용한다.
+# - 동시성, 요청 속도 제한, 계측처럼 모든 호출에 적용할 기능은 Provider.call 한 곳에 추가한다.
+
+MODEL_OPTIONS = ("gpt-3.5-turbo", "gpt-4o", "gpt-4o-mini", "ClovaX")
+CLOVA_API_URL = "https://clovastudio.stream.ntruss.com/testapp/v1/chat-completions/HCX-DASH-001"
+MAX_CONCURRENT_CALLS = 8
+# 취소할 수 있는 실행을 기다리는 동안 진행 상황을 갱신하는 간격(초)
+POLL_INTERVAL = 0.2
+MAX_RATE_LIMIT_RETRIES = 3
+DEFAULT_RETRY_AFTER = 1.0
+# 요청 제한 시간(초): 연결 / 응답 대기 (secrets 또는 환경 변수 REQUEST_TIMEOUT 으로 응답 대기 시간 변경 가능)
+CONNECT_TIMEOUT = 5.0
+DEFAULT_REQUEST_TIMEOUT = 60.0
+# 제공자별 기본 분당 요청 수 (secrets 또는 환경 변수 OPENAI_RPM / CLOVA_RPM / MOCK_RPM 으로 변경 가능)
+DEFAULT_RPM = {"openai": 500, "clova": 60, "mock": 6000, "replay": 60000}
+
+_lock = threading.Lock()
+_loop = None
+_providers = {}
+
+
+# 응답 구조체 정의
+class ProviderResult(TypedDict):
+    content: str
+    model: str
+    provider: str
+    latency: float
+    usage: Optional[dict]
+
+
+# secrets.toml 에 값이 있으면 사용하고, 없으면 환경 변수(.env)에서 읽는 함수
+def get_secret(name):
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except Exception:
+        # secrets.toml 파일이 없는 경우
+        pass
+    return os.getenv(name)
+
+
+# HTTP 오류 응답 (상태 코드와 응답 헤더를 함께 전달)
+class ProviderHTTPError(RuntimeError):
+    def __init__(self, status_code, message, headers=None):
+        super().__init__(f"Error: {status_code}, {message}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+# 요청 한도 초과(429) 오류이면 다시 시도하기 전 기다릴 시간을, 아니면 None 을 돌려주는 함수
+def _rate_limit_retry_after(error):
+    if getattr(error, "status_code", None) != 429:
+        return None
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", DEFAULT_RETRY_AFTER))
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+# 값이 지정된 샘플링 파라미터만 요청에 포함하는 함수 (None 이면 제공자 기본값 사용)
+def _sampling_params(**params):
+    return {name: value for name, value in params.items() if value is not None}
+
+
+# 요청 메시지 목록을 만드는 함수 (시스템 프롬프트 + 대화 기록)
+# 제공자의 프롬프트 캐시는 요청 앞부분이 바이트 단위로 같을 때만 적중하므로, 기록된 메시지를 다시 직렬화하지 않고
+# 매번 같은 형태({"role", "content"})로 보낸다. 화면 표시용 필드(prompt_version 등)는 요청에 넣지 않는다.
+def build_messages(system_prompt, history):
+    return [{"role": "system", "content": system_prompt}] + [
+        {"role": message["role"], "content": message["content"]} for message in history
+    ]
+
+
+# 사용량(usage)에서 프롬프트 캐시로 처리된 입력 토큰 수를 꺼내는 함수 (정보가 없으면 0)
+def cached_tokens(usage):
+    details = (usage or {}).get("prompt_tokens_details") or {}
+    return details.get("cached_tokens") or 0
+
+
+def request_timeout():
+    return float(get_secret("REQUEST_TIMEOUT") or DEFAULT_REQUEST_TIMEOUT)
+
+
+class Provider:
+    name = "base"
+
+    def __init__(self):
+        rpm = get_secret(f"{self.name.upper()}_RPM") or DEFAULT_RPM[self.name]
+        self.rate_limiter = RateLimiter(int(rpm))
+
+    # 전체 응답을 한 번에 받는 호출 (헤지 요청을 켜면 느린 호출에 같은 요청을 한 번 더 보내 먼저 끝난 응답을 사용)
+    # hedge 가 None 이면 환경 변수 HEDGING 기본값을 따름
+    async def call(self, messages, model, temperature=None, max_tokens=None, top_p=None, response_format=None, hedge=None):
+        if hedge is None:
+            hedge = hedging.enabled_by_default()
+        if not hedge:
+            return await self._call_with_retries(messages, model, temperature, max_tokens, top_p, response_format)
+        started = time.perf_counter()
+        result = await hedging.get_policy().run(f"{self.name}/{model}", lambda: self._call_with_retries(
+            messages, model, temperature, max_tokens, top_p, response_format
+        ))
+        # 헤지 요청이 이긴 경우에도 사용자가 기다린 전체 시간을 지연 시간으로 기록
+        result["latency"] = time.perf_counter() - started
+        return result
+
+    # 요청 한도 초과 시 제한기를 멈춘 뒤 다시 시도하는 호출
+    async def _call_with_retries(self, messages, model, temperature, max_tokens, top_p, response_format):
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            await self.rate_limiter.acquire_async()
+            started = time.perf_counter()
+            try:
+                content, usage = await self._call(messages, model, temperature, max_tokens, top_p, response_format)
+            except Exception as e:
+                retry_after = _rate_limit_retry_after(e)
+                if retry_after is None or attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                self.rate_limiter.backoff(retry_after)
+                continue
+            latency = time.perf_counter() - started
+            profiler.record(f"provider.call {self.name}/{model}", latency)
+            return ProviderResult(
+                content=content,
+                model=model,
+                provider=self.name,
+                latency=latency,
+                usage=usage,
+            )
+
+    # 응답 텍스트 조각을 생성되는 대로 돌려주는 호출 (첫 조각을 받기 전의 요청 한도 초과는 다시 시도)
+    async def stream(self, messages, model, temperature=None, max_tokens=None, top_p=None):
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            await self.rate_limiter.acquire_async()
+            started = time.perf_counter()
+            received = False
+            try:
+                async for chunk in self._stream(messages, model, temperature, max_tokens, top_p):
+                    if not received:
+                        profiler.record(f"provider.stream 첫 조각 {self.name}/{model}", time.perf_counter() - started)
+                    received = True
+                    yield chunk
+                profiler.record(f"provider.stream {self.name}/{model}", time.perf_counter() - started)
+                return
+            except Exception as e:
+                retry_after = _rate_limit_retry_after(e)
+                if received or retry_after is None or attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                self.rate_limiter.backoff(retry_after)
+
+    # 음성 파일(바이트)을 텍스트로 변환하는 호출
+    async def transcribe(self, audio_bytes, filename="audio.wav"):
+        raise NotImplementedError(f"{self.name} 제공자는 음성 인식을 지원하지 않습니다.")
+
+    async def _call(self, messages, model, temperature, max_tokens, top_p, response_format):
+        raise NotImplementedError
+
+    async def _stream(self, messages, model, temperature, max_tokens, top_p):
+        raise NotImplementedError
+        yield
+
+
+class OpenAIProvider(Provider):
+    name = "openai"
+
+    def __init__(self):
+        super().__init__()
+        from openai import AsyncOpenAI
+        api_key = get_secret("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("OpenAI API 키가 설정되지 않았습니다. .env 파일에 OPENAI_API_KEY를 추가해주세요.")
+        self.client = AsyncOpenAI(api_key=api_key, timeout=request_timeout())
+
+    async def _call(self, messages, model, temperature, max_tokens, top_p, response_format):
+        params = _sampling_params(temperature=temperature, max_tokens=max_tokens, top_p=top_p, response_format=response_format)
+        completion = await self.client.chat.completions.create(model=model, messages=messages, **params)
+        usage = completion.usage.model_dump() if completion.usage else None
+        return completion.choices[0].message.content, usage
+
+    async def _stream(self, messages, model, temperature, max_tokens, top_p):
+        params = _sampling_params(temperature=temperature, max_tokens=max_tokens, top_p=top_p)
+        stream = await self.client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # 중간에 멈춘 스트림은 연결을 바로 닫는다
+            await stream.close()
+
+    async def transcribe(self, audio_bytes, filename="audio.wav"):
+        await self.rate_limiter.acquire_async()
+        transcript = await self.client.audio.transcriptions.create(
+            model="whisper-1",
+            file=(filename, audio_bytes)
+        )
+        return transcript.text
+
+
+class ClovaProvider(Provider):
+    name = "clova"
+
+    def __init__(self):
+        super().__init__()
+        import httpx
+        # 비동기 클라이언트라 중지로 요청/스트림 태스크가 취소되면 연결도 바로 닫혀 남은 응답을 받지 않는다
+        self.client = httpx.AsyncClient(timeout=httpx.Timeout(request_timeout(), connect=CONNECT_TIMEOUT))
+        self.api_key = get_secret("CLOVA_API_KEY")
+        self.apigw_key = get_secret("CLOVA_APIGW_KEY")
+
+    def _request(self, messages, max_tokens, temperature, top_p, stream=False):
+        headers = {
+            "Content-Type": "application/json",
+            "X-NCP-CLOVASTUDIO-API-KEY": self.api_key,
+            "X-NCP-APIGW-API-KEY": self.apigw_key,
+            "X-NCP-CLOVASTUDIO-REQUEST-ID": str(uuid.uuid4()),
+        }
+        if stream:
+            headers["Accept"] = "text/event-stream"
+        data = {
+            "messages": messages,
+            **_sampling_params(maxTokens=max_tokens, temperature=temperature, topP=top_p),
+            "n": 1,
+            "echo": False
+        }
+        # 설정되지 않은 키 헤더는 보내지 않음 (서버가 인증 오류로 응답)
+        headers = {name: value for name, value in headers.items() if value is not None}
+        return self.client.build_request("POST", CLOVA_API_URL, headers=headers, content=json.dumps(data))
+
+    async def _call(self, messages, model, temperature, max_tokens, top_p, response_format):
+        response = await self.client.send(self._request(messages, max_tokens, temperature, top_p))
+        if response.status_code != 200:
+            raise ProviderHTTPError(response.status_code, response.text, response.headers)
+        result = response.json()['result']
+        usage = {
+            "prompt_tokens": result.get("inputLength"),
+            "completion_tokens": result.get("outputLength"),
+        }
+        return result['message']['content'], usage
+
+    async def _stream(self, messages, model, temperature, max_tokens, top_p):
+        response = await self.client.send(self._request(messages, max_tokens, temperature, top_p, True), stream=True)
+        try:
+            if response.status_code != 200:
+                await response.aread()
+                raise ProviderHTTPError(response.status_code, response.text, response.headers)
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:") and event == "token":
+                    yield json.loads(line[len("data:"):])["message"]["content"]
+        finally:
+            await response.aclose()
+
+
+# 네트워크 없이 입력에 따라 항상 같은 응답을 돌려주는 모의 제공자 (오프라인 테스트/부하 테스트용)
+class MockProvider(Provider):
+    name = "mock"
+    STRAGGLER_FACTOR = 10
+    MAX_SEEN_PREFIXES = 100000
+    WORDS = ("안녕하세요", "좋은", "질문입니다", "그럼", "함께", "생각해", "볼까요", "정답은", "힌트를", "드릴게요",
+             "다시", "한번", "말해", "주세요", "잘했어요", "천천히", "읽어", "보세요", "다음", "문제입니다")
+
+    def __init__(self, base_latency=None, token_latency=None):
+        super().__init__()
+        self.base_latency = float(base_latency if base_latency is not None else get_secret("MOCK_BASE_LATENCY") or 0.3)
+        self.token_latency = float(token_latency if token_latency is not None else get_secret("MOCK_TOKEN_LATENCY") or 0.005)
+        # 꼬리 지연 실험용: 이 비율의 호출은 STRAGGLER_FACTOR 배 느리게 응답 (입력과 무관하게 무작위)
+        self.straggler_rate = float(get_secret("MOCK_STRAGGLER_RATE") or 0)
+        self.seen_prefixes = set()
+
+    # 제공자의 프롬프트 캐시 흉내: 이전에 보낸 요청과 앞부분 메시지가 같으면 그만큼의 입력 토큰을 캐시 적중으로 보고
+    def _cached_prompt_tokens(self, messages, model):
+        if len(self.seen_prefixes) > self.MAX_SEEN_PREFIXES:
+            self.seen_prefixes.clear()
+        prefix = hashlib.sha256(model.encode("utf-8"))
+        cached = 0
+        length = 0
+        hit = True
+        for message in messages:
+            prefix.update(json.dumps(message, ensure_ascii=False).encode("utf-8"))
+            key = prefix.hexdigest()
+            length += len(str(message.get("content", "")))
+            if hit and key in self.seen_prefixes:
+                cached = length // 2
+            else:
+                hit = False
+                self.seen_prefixes.add(key)
+        return cached
+
+    def _generate(self, messages, model, temperature, max_tokens, top_p):
+        max_tokens = max_tokens or 256
+        fingerprint = json.dumps([model, messages, temperature, max_tokens, top_p], ensure_ascii=False, sort_keys=True)
+        seed = int(hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16], 16)
+        rng = random.Random(seed)
+        num_words = min(max_tokens, rng.randint(8, 40))
+        words = [rng.choice(self.WORDS) for _ in range(num_words)]
+        # 같은 입력에 대해 지연 시간도 재현 가능하도록 시드에서 흔들림을 만든다
+        latency = self.base_latency * (0.5 + rng.random()) + self.token_latency * num_words
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 2
+        return words, latency, {"prompt_tokens": prompt_tokens, "completion_tokens": num_words, "total_tokens": prompt_tokens + num_words}
+
+    async def _call(self, messages, model, temperature, max_tokens, top_p, response_format):
+        words, latency, usage = self._generate(messages, model, temperature, max_tokens, top_p)
+        usage["prompt_tokens_details"] = {"cached_tokens": self._cached_prompt_tokens(messages, model)}
+        if random.random() < self.straggler_rate:
+            latency *= self.STRAGGLER_FACTOR
+        await asyncio.sleep(latency)
+        text = " ".join(words)
+        if response_format and response_format.get("type") == "json_object":
+            text = json.dumps({"message": text}, ensure_ascii=False)
+        return text, usage
+
+    async def _stream(self, messages, model, temperature, max_tokens, top_p):
+        words, latency, _ = self._generate(messages, model, temperature, max_tokens, top_p)
+        await asyncio.sleep(self.base_latency)
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.token_latency)
+            yield word if i == 0 else " " + word
+
+    async def transcribe(self, audio_bytes, filename="audio.wav"):
+        await self.rate_limiter.acquire_async()
+        await asyncio.sleep(self.base_latency)
+        return f"모의 음성 인식 결과 {hashlib.sha256(audio_bytes).hexdigest()[:8]}"
+
+
+# 녹화된 요청이 없을 때 (REPLAY_ON_MISS=error 인 경우)
+class ReplayMissError(RuntimeError):
+    pass
+
+
+# 내보낸 실행 결과 파일을 재생하는 제공자 (LLM_PROVIDER=replay)
+# - REPLAY_DIR: 내보낸 test_results_*.json / chat_history_*.json 이 있는 폴더 (기본값: 현재 폴더)
+# - REPLAY_ON_MISS: 녹화되지 않은 요청을 오류로 처리(error, 기본값)하거나 실제 제공자로 보냄(live)
+# - REPLAY_LATENCY: 응답 전 대기 시간. 0(기본값, 최대 속도), 초 단위 숫자, 또는 녹화된 지연 시간을 쓰는 original
+class ReplayProvider(Provider):
+    name = "replay"
+
+    def __init__(self):
+        super().__init__()
+        from replay import build_index
+        self.directory = get_secret("REPLAY_DIR") or "."
+        self.index = build_index(self.directory)
+        self.on_miss = (get_secret("REPLAY_ON_MISS") or "error").lower()
+        self.latency = (get_secret("REPLAY_LATENCY") or "0").lower()
+
+    def _lookup(self, messages, model, temperature, max_tokens, top_p):
+        from replay import request_fingerprint
+        fingerprint = request_fingerprint(model, messages, temperature, max_tokens, top_p)
+        entry = self.index.lookup(fingerprint)
+        if entry is None and self.on_miss != "live":
+            raise ReplayMissError(
+                f"녹화된 응답이 없습니다 (model={model}, fingerprint={fingerprint[:12]}, "
+                f"{len(self.index)}개 응답 / {len(self.index.sources)}개 파일 from {self.directory})"
+            )
+        return entry
+
+    async def _wait(self, entry):
+        if self.latency == "original":
+            delay = entry["latency"] or 0
+        else:
+            delay = float(self.latency)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _call(self, messages, model, temperature, max_tokens, top_p, response_format):
+        entry = self._lookup(messages, model, temperature, max_tokens, top_p)
+        if entry is None:
+            result = await get_provider_by_name(default_provider_name(model)).call(
+                messages, model, temperature, max_tokens, top_p, response_format
+            )
+            return result["content"], result["usage"]
+        await self._wait(entry)
+        return entry["content"], {}
+
+    async def _stream(self, messages, model, temperature, max_tokens, top_p):
+        entry = self._lookup(messages, model, temperature, max_tokens, top_p)
+        if entry is None:
+            async for chunk in get_provider_by_name(default_provider_name(model)).stream(
+                messages, model, temperature, max_tokens, top_p
+            ):
+                yield chunk
+            return
+        await self._wait(entry)
+        for i, word in enumerate(entry["content"].split(" ")):
+            yield word if i == 0 else " " + word
+
+    async def transcribe(self, audio_bytes, filename="audio.wav"):
+        if self.on_miss != "live":
+            raise ReplayMissError("재생 모드에서는 녹화된 음성 인식 결과가 없습니다.")
+        return await get_provider_by_name("openai").transcribe(audio_bytes, filename)
+
+
+PROVIDER_CLASSES = {"openai": OpenAIProvider, "clova": ClovaProvider, "mock": MockProvider, "replay": ReplayProvider}
+
+
+# 모델 이름에 맞는 실제 제공자 이름
+def default_provider_name(model):
+    if model == "ClovaX":
+        return "clova"
+    if model.startswith("mock"):
+        return "mock"
+    return "openai"
+
+
+# 모델 이름으로 제공자 이름을 고르는 함수 (LLM_PROVIDER=mock/replay 이면 모든 호출을 해당 제공자로 보냄)
+def provider_name_for(model):
+    return get_secret("LLM_PROVIDER") or default_provider_name(model)
+
+
+# 제공자 인스턴스를 한 번만 만들어 재사용하는 함수
+def get_provider(model):
+    return get_provider_by_name(provider_name_for(model))
+
+
+def get_provider_by_name(name):
+    with _lock:
+        if name not in _providers:
+            _providers[name] = PROVIDER_CLASSES[name]()
+        return _providers[name]
+
+
+# 모든 제공자 호출이 실행되는 백그라운드 이벤트 루프
+def get_event_loop():
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="provider-loop", daemon=True).start()
+        return _loop
+
+
+# 코루틴을 백그라운드 루프에서 실행하고 결과를 기다리는 함수 (Streamlit 스크립트 스레드용)
+def run_sync(coro):
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+
+# 비동기 스트림을 일반 이터레이터로 바꾸는 함수 (st.write_stream 등에 사용)
+def iterate_sync(async_iterator):
+    loop = get_event_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(async_iterator.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        # 소비하던 쪽이 중간에 멈추면(중지 버튼, 재실행) 진행 중인 스트림 요청도 닫는다
+        asyncio.run_coroutine_threadsafe(async_iterator.aclose(), loop)
+
+
+# 코루틴 목록을 최대 limit 개씩 동시에 실행하는 함수
+async def gather_limited(coros, limit=MAX_CONCURRENT_CALLS):
+    semaphore = asyncio.Semaphore(limit)
+
+    async def _run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(_run(coro) for coro in coros))
+
+
+# 코루틴 목록을 동시에 실행하고 입력 순서대로 결과를 돌려주는 함수
+def run_concurrently(coros, limit=MAX_CONCURRENT_CALLS):
+    coros = list(coros)
+    if not coros:
+        return []
+    return run_sync(gather_limited(coros, limit))
+
+
+# 백그라운드 루프에서 실행 중인 코루틴 묶음 (기다리는 도중 취소할 수 있음)
+# - 끝난 코루틴의 결과는 results 에 입력 순서대로 채워지고, 끝나지 않은 자리는 None 으로 남는다.
+# - 취소하면 대기 중인 코루틴은 시작하지 않고, 실행 중인 요청(비동기 HTTP 요청, 스트림)은 중단된다.
+class CancellableRun:
+    def __init__(self, coros, limit=MAX_CONCURRENT_CALLS):
+        coros = list(coros)
+        self.results = [None] * len(coros)
+        self.finished = [False] * len(coros)
+        self.future = asyncio.run_coroutine_threadsafe(self._run(coros, limit), get_event_loop())
+
+    async def _run(self, coros, limit):
+        semaphore = asyncio.Semaphore(limit)
+
+        async def _run_one(position, coro):
+            try:
+                async with semaphore:
+                    self.results[position] = await coro
+                    self.finished[position] = True
+            finally:
+                # 시작하기 전에 취소된 코루틴도 닫아 둔다
+                coro.close()
+
+        await asyncio.gather(*(_run_one(position, coro) for position, coro in enumerate(coros)))
+        return self.results
+
+    @property
+    def completed(self):
+        return sum(self.finished)
+
+    def __len__(self):
+        return len(self.results)
+
+    # 모두 끝날 때까지 기다리며 POLL_INTERVAL 마다 on_wait(완료 수, 전체 수)를 호출하는 함수
+    # on_wait 에서 Streamlit 요소를 갱신하면 그 사이 들어온 중지/재실행 요청이 스크립트에서 예외로 전달되고,
+    # 이때(또는 다른 예외로 빠져나갈 때) 남은 호출을 모두 취소한다.
+    def wait(self, on_wait=None, poll_interval=POLL_INTERVAL):
+        try:
+            while True:
+                try:
+                    return self.future.result(timeout=poll_interval)
+                except concurrent.futures.TimeoutError:
+                    if on_wait is not None:
+                        on_wait(self.completed, len(self))
+        except BaseException:
+            self.cancel()
+            raise
+
+    def cancel(self):
+        self.future.cancel()
+
+
+# 항목마다 make_coro(항목) 코루틴을 최대 limit 개씩 동시에 실행하고, 끝나는 순서대로 (항목, 결과) 를 돌려주는 제너레이터
+# - 항목은 자리가 날 때마다 하나씩 꺼내므로(슬라이딩 윈도) 입력이 아무리 길어도 실행 중인 호출은 limit 개를 넘지 않고,
+#   느린 호출 하나가 다른 자리의 다음 호출을 막지 않는다.
+# - 끝난 호출이 없으면 poll_interval 마다 on_wait() 를 호출한다 (CancellableRun.wait 와 같이 중지/재실행 요청을 받는 지점).
+# - 소비하는 쪽이 멈추거나 예외로 빠져나가면(제너레이터를 닫으면) 실행 중인 호출을 모두 취소한다.
+def iterate_completed(items, make_coro, limit=MAX_CONCURRENT_CALLS, on_wait=None, poll_interval=POLL_INTERVAL):
+    loop = get_event_loop()
+    items = iter(items)
+    running = {}
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(running) < limit:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                running[asyncio.run_coroutine_threadsafe(make_coro(item), loop)] = item
+            if not running:
+                return
+            done, _ = concurrent.futures.wait(running, timeout=poll_interval,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done and on_wait is not None:
+                on_wait()
+            for future in done:
+                yield running.pop(future), future.result()
+    finally:
+        for future in running:
+            future.cancel()
+
+
+# 코루틴 하나를 취소할 수 있게 실행하는 함수 (run_sync 와 같지만 기다리는 동안 on_wait() 를 호출)
+def run_sync_cancellable(coro, on_wait):
+    return CancellableRun([coro]).wait(lambda done, total: on_wait())[0]
+
+
+# 대화 메시지 목록으로 응답을 생성하는 함수 (오류는 예외로 전달)
+async def generate_chat_completion(model, messages, temperature=None, max_tokens=None, top_p=None, response_format=None,
+                                   hedge=None):
+    return await get_provider(model).call(messages, model, temperature, max_tokens, top_p, response_format, hedge)
+
+
+def generate_chat_completion_sync(model, messages, temperature=None, max_tokens=None, top_p=None, response_format=None):
+    return run_sync(generate_chat_completion(model, messages, temperature, max_tokens, top_p, response_format))
+
+
+# 대화 메시지 목록으로 스트리밍 응답을 생성하는 함수
+def stream_chat_completion(model, messages, temperature=None, max_tokens=None, top_p=None):
+    return get_provider(model).stream(messages, model, temperature, max_tokens, top_p)
+
+
+# 시스템 프롬프트와 사용자 입력 한 쌍으로 응답을 생성하는 함수 (오류는 "Error: ..." 응답과 error 필드로 돌려줌)
+async def generate_model_result_async(model, system_prompt, user_input, temperature, max_tokens, top_p, hedge=None):
+    messages = build_messages(system_prompt, [{"role": "user", "content": user_input}])
+    try:
+        return await generate_chat_completion(model, messages, temperature, max_tokens, top_p, hedge=hedge)
+    except Exception as e:
+        return {"content": f"Error: {str(e)}", "model": model, "provider": provider_name_for(model),
+                "latency": None, "usage": None, "error": str(e)}
+
+
+# 시스템 프롬프트와 사용자 입력 한 쌍으로 응답 텍스트를 생성하는 함수 (오류는 응답 텍스트로 표시)
+async def generate_model_response_async(model, system_prompt, user_input, temperature, max_tokens, top_p, hedge=None):
+    result = await generate_model_result_async(model, system_prompt, user_input, temperature, max_tokens, top_p, hedge)
+    return result["content"]
+
+
+def generate_model_response(model, system_prompt, user_input, temperature, max_tokens, top_p, hedge=None):
+    return run_sync(generate_model_response_async(model, system_prompt, user_input, temperature, max_tokens, top_p, hedge))
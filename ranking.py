@@ -0,0 +1,105 @@
+import math
+
+# 쌍별 선호 투표로 모델 순위를 매기는 온라인 레이팅 (투표 1건당 두 모델만 상수 시간에 갱신)
+# - elo: 고정 K-factor Elo 점수
+# - rating/rd: Glicko 방식으로 근사한 Bradley-Terry 점수와 불확실성(rating deviation)
+
+INITIAL_RATING = 1500.0
+INITIAL_RD = 350.0
+MIN_RD = 30.0
+ELO_K_FACTOR = 32.0
+CONFIDENCE_Z = 1.96
+
+_Q = math.log(10) / 400
+
+
+# 빈 레이팅 상태 생성 함수 (세션 상태나 JSON에 그대로 저장할 수 있는 dict)
+def new_ratings():
+    return {"players": {}, "num_votes": 0}
+
+
+def _player(ratings, name):
+    players = ratings["players"]
+    if name not in players:
+        players[name] = {
+            "elo": INITIAL_RATING,
+            "rating": INITIAL_RATING,
+            "rd": INITIAL_RD,
+            "wins": 0,
+            "losses": 0,
+            "ties": 0,
+        }
+    return players[name]
+
+
+def _g(rd):
+    return 1 / math.sqrt(1 + 3 * (_Q * rd) ** 2 / math.pi ** 2)
+
+
+# 상대 점수 기준으로 이길 확률 (Bradley-Terry 로지스틱 모형)
+def expected_score(rating, opponent_rating, opponent_rd=0.0):
+    return 1 / (1 + 10 ** (-_g(opponent_rd) * (rating - opponent_rating) / 400))
+
+
+def _glicko_update(player, opponent, score):
+    g = _g(opponent["rd"])
+    expected = expected_score(player["rating"], opponent["rating"], opponent["rd"])
+    d_squared = 1 / (_Q ** 2 * g ** 2 * expected * (1 - expected))
+    precision = 1 / player["rd"] ** 2 + 1 / d_squared
+    rating = player["rating"] + _Q / precision * g * (score - expected)
+    rd = max(math.sqrt(1 / precision), MIN_RD)
+    return rating, rd
+
+
+# 투표 1건 반영 함수 (outcome: 1.0 = A 승, 0.0 = B 승, 0.5 = 무승부)
+def record_vote(ratings, model_a, model_b, outcome):
+    if model_a == model_b:
+        raise ValueError("같은 모델끼리는 투표할 수 없습니다.")
+    a = _player(ratings, model_a)
+    b = _player(ratings, model_b)
+
+    expected_a = expected_score(a["elo"], b["elo"])
+    a_elo = a["elo"] + ELO_K_FACTOR * (outcome - expected_a)
+    b_elo = b["elo"] - ELO_K_FACTOR * (outcome - expected_a)
+
+    # 두 모델 모두 갱신 전 값을 기준으로 동시에 갱신
+    a_rating, a_rd = _glicko_update(a, b, outcome)
+    b_rating, b_rd = _glicko_update(b, a, 1 - outcome)
+
+    a.update(elo=a_elo, rating=a_rating, rd=a_rd)
+    b.update(elo=b_elo, rating=b_rating, rd=b_rd)
+    if outcome == 0.5:
+        a["ties"] += 1
+        b["ties"] += 1
+    elif outcome > 0.5:
+        a["wins"] += 1
+        b["losses"] += 1
+    else:
+        a["losses"] += 1
+        b["wins"] += 1
+    ratings["num_votes"] += 1
+    return ratings
+
+
+# 리더보드 행 목록 (정렬 비용은 모델 수에만 비례하고 투표 기록 길이와 무관)
+def leaderboard(ratings, models=()):
+    for name in models:
+        _player(ratings, name)
+    rows = []
+    for name, player in ratings["players"].items():
+        margin = CONFIDENCE_Z * player["rd"]
+        rows.append({
+            "model": name,
+            "rating": round(player["rating"], 1),
+            "ci_lower": round(player["rating"] - margin, 1),
+            "ci_upper": round(player["rating"] + margin, 1),
+            "elo": round(player["elo"], 1),
+            "games": player["wins"] + player["losses"] + player["ties"],
+            "wins": player["wins"],
+            "losses": player["losses"],
+            "ties": player["ties"],
+        })
+    rows.sort(key=lambda row: row["rating"], reverse=True)
+    for rank, row in enumerate(rows, start=1):
+        row["rank"] = rank
+    return rows
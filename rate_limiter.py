@@ -0,0 +1,56 @@
+import time
+import asyncio
+import threading
+
+# 분당 요청 수(RPM) 기준 토큰 버킷 방식의 요청 속도 제한기
+# 여러 작업 스레드가 같은 제공자를 동시에 호출해도 RPM을 넘지 않도록 호출 직전에 acquire() 한다.
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute, burst=None):
+        self.requests_per_minute = requests_per_minute
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1, min(requests_per_minute, 10))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    # 토큰을 하나 가져올 수 있으면 0, 아니면 기다려야 하는 시간(초)을 돌려주는 함수
+    def try_acquire(self):
+        with self.lock:
+            blocked = self.blocked_until - time.monotonic()
+            if blocked > 0:
+                return blocked
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    # 제공자가 요청 한도 초과(429)를 알려 왔을 때 모든 호출을 seconds 동안 멈추는 함수
+    def backoff(self, seconds):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+    # 토큰을 얻을 때까지 기다리는 함수
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    # 이벤트 루프를 막지 않고 토큰을 기다리는 함수
+    async def acquire_async(self):
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
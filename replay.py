@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import glob
+import shutil
+import argparse
+import tempfile
+import hashlib
+import threading
+
+# 내보낸 실행 결과(test_results_*.json, chat_history_*.json)를 요청 지문(fingerprint)으로 색인해
+# 실제 API 대신 녹화된 응답을 돌려주는 재생(replay) 색인
+# - 지문은 모델, 메시지(role/content), 샘플링 파라미터로 만든다. (response_format 은 내보낸 파일에 없으므로 제외)
+# - 같은 지문에 응답이 여러 개 있으면(테스트 반복) 요청할 때마다 차례대로 돌려준다.
+# - 녹화된 지연 시간(model_a_latency, 메시지 latency)이 있으면 REPLAY_LATENCY=original 로 같은 시간만큼 기다린다.
+# - 시뮬레이터 대화 기록은 simulations 의 시뮬레이션한 턴(원본 응답 response)을 색인한다.
+# 멀티턴 대화 기록이 모든 턴 재생되는지 확인: python replay.py check chat_history_*.json --app multiturn.py
+
+EXPORT_PATTERNS = ("test_results_*.json", "chat_history_*.json")
+
+
+def _number(value, digits=4):
+    return None if value is None else round(float(value), digits)
+
+
+# 요청 지문 (같은 요청이면 어느 앱에서 보냈든 같은 값)
+def request_fingerprint(model, messages, temperature=None, max_tokens=None, top_p=None):
+    payload = {
+        "model": model,
+        "messages": [{"role": m["role"], "content": m["content"]} for m in messages],
+        "temperature": _number(temperature),
+        "max_tokens": None if max_tokens is None else int(max_tokens),
+        "top_p": _number(top_p),
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ReplayIndex:
+    def __init__(self):
+        self.entries = {}
+        self.cursors = {}
+        self.sources = []
+        self.lock = threading.Lock()
+
+    def add(self, fingerprint, content, latency=None, source=None):
+        self.entries.setdefault(fingerprint, []).append({"content": content, "latency": latency, "source": source})
+
+    # 지문에 해당하는 녹화 응답을 차례대로 돌려주는 함수 (없으면 None)
+    def lookup(self, fingerprint):
+        with self.lock:
+            entries = self.entries.get(fingerprint)
+            if not entries:
+                return None
+            cursor = self.cursors.get(fingerprint, 0)
+            self.cursors[fingerprint] = cursor + 1
+            return entries[cursor % len(entries)]
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.entries.values())
+
+
+# A/B 테스트 결과 파일: 시스템 프롬프트 + 사용자 입력 한 번에 대한 모델 A/B 응답 목록
+def _index_test_results(index, data, source):
+    messages = [
+        {"role": "system", "content": data["system_prompt"]},
+        {"role": "user", "content": data["user_input"]},
+    ]
+    for model_key, settings in data.get("settings", {}).items():
+        fingerprint = request_fingerprint(settings["name"], messages, settings.get("temperature"),
+                                          settings.get("max_tokens"), settings.get("top_p"))
+        for result in data.get("results", []):
+            response = result.get(f"{model_key}_response")
+            # 오류 응답은 녹화하지 않음
+            if response is None or response.startswith("Error:"):
+                continue
+            index.add(fingerprint, response, result.get(f"{model_key}_latency"), source)
+
+
+# 멀티턴 대화 기록 파일: AI 메시지마다 그 직전까지의 대화가 요청이었다
+# 프롬프트 비교 기록은 한 번의 전송에서 여러 프롬프트의 응답이 연달아 붙으므로,
+# 같은 프롬프트가 다시 나오기 전까지의 연속된 AI 메시지는 같은 대화 맥락으로 요청된 것으로 본다.
+# 구조화된 AI 메시지는 요청할 때 history_encoding 형식으로 바뀌어 보내졌으므로 같은 형식으로 다시 만든다.
+def _index_chat_history(index, data, source):
+    from prompt_library import prompt_hash
+    from history_encoding import DEFAULT_FIELDS, encode_history
+    system_prompts = data.get("system_prompts") or []
+    prompts_by_hash = {prompt_hash(text): text for text in system_prompts}
+    settings = (data.get("model"), data.get("temperature"), data.get("max_tokens"), data.get("top_p"))
+    if settings[0] is None:
+        return
+
+    context = []
+    group_context = []
+    group_prompts = set()
+    previous_role = None
+    for message in data.get("messages", []):
+        if message["role"] != "assistant":
+            context.append(message)
+            previous_role = message["role"]
+            continue
+        if "prompt_hash" in message:
+            prompt_key = message["prompt_hash"]
+            system_prompt = prompts_by_hash.get(prompt_key)
+        elif isinstance(message.get("prompt_version"), int):
+            prompt_key = message["prompt_version"]
+            position = prompt_key - 1
+            system_prompt = system_prompts[position] if 0 <= position < len(system_prompts) else None
+        else:
+            prompt_key = None
+            system_prompt = data.get("system_prompt")
+        if previous_role != "assistant" or prompt_key is None or prompt_key in group_prompts:
+            group_context = list(context)
+            group_prompts = set()
+        group_prompts.add(prompt_key)
+        if system_prompt is not None:
+            sent_context = group_context
+            if "history_encoding" in message:
+                sent_context = encode_history(group_context, message["history_encoding"],
+                                              message.get("history_fields", DEFAULT_FIELDS))
+            request = [{"role": "system", "content": system_prompt}] + sent_context
+            index.add(request_fingerprint(settings[0], request, *settings[1:]), message["content"],
+                      message.get("latency"), source)
+        context.append(message)
+        previous_role = "assistant"
+
+
+# 시뮬레이터 대화 기록의 시뮬레이션 결과: 시뮬레이션한 턴마다 그 직전까지의 대화가 요청이었다
+# AI 턴은 테스트 프롬프트로, 사용자 턴은 시뮬레이션 프롬프트로 요청했고, 녹화할 응답은 턴에 저장된 원본 응답이다.
+def _index_simulations(index, data, source):
+    from prompt_library import prompt_hash
+    prompts_by_hash = {prompt_hash(text): text for text in data.get("system_prompts") or []}
+    settings = (data.get("model"), data.get("temperature"), data.get("max_tokens"), data.get("top_p"))
+    if settings[0] is None:
+        return
+    for simulation in data.get("simulations") or []:
+        prompts = {"assistant": prompts_by_hash.get(simulation["prompt_hash"]), "user": data.get("simulation_prompt")}
+        messages = simulation["messages"]
+        for position, message in enumerate(messages):
+            system_prompt = prompts.get(message["role"])
+            if "response" not in message or system_prompt is None:
+                continue
+            request = [{"role": "system", "content": system_prompt}] + messages[:position]
+            index.add(request_fingerprint(settings[0], request, *settings[1:]), message["response"],
+                      message.get("latency"), source)
+
+
+# 디렉터리(하위 폴더 포함)의 내보낸 파일을 모두 읽어 색인을 만드는 함수
+def build_index(directory):
+    index = ReplayIndex()
+    for pattern in EXPORT_PATTERNS:
+        for path in sorted(glob.glob(os.path.join(directory, "**", pattern), recursive=True)):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if os.path.basename(path).startswith("test_results_"):
+                    _index_test_results(index, data, path)
+                else:
+                    _index_chat_history(index, data, path)
+                    _index_simulations(index, data, path)
+            except (OSError, ValueError, KeyError, TypeError):
+                # 형식이 다른 파일은 건너뜀
+                continue
+            index.sources.append(path)
+    return index
+
+
+# 대화 기록의 메시지를 (사용자 메시지, 그 전송에서 받은 AI 메시지 목록) 턴으로 나누는 함수
+def _chat_turns(messages):
+    turns = []
+    for message in messages:
+        if message["role"] == "user":
+            turns.append((message["content"], []))
+        elif turns:
+            turns[-1][1].append(message)
+    return turns
+
+
+def _widget(elements, label):
+    return next(element for element in elements if element.label == label)
+
+
+# 멀티턴 채팅 앱(multiturn.py, multiturn_copy.py)에서 내보낸 대화 기록을 재생 모드로 다시 진행해
+# 모든 턴이 녹화된 응답으로 재생되는지 확인하는 함수 (반환: 턴별 결과 목록)
+# 앱을 헤드리스로 실행해 기록과 같은 설정, 같은 사용자 메시지를 보내므로 앱이 실제로 만드는 요청이 색인과 맞는지 확인한다.
+def check_replay(path, app="multiturn.py", timeout=60):
+    from streamlit.testing.v1 import AppTest
+    from session_store import page_key
+    import providers
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    directory = tempfile.mkdtemp(prefix="replay_check_")
+    # 색인은 내보내기 파일 이름 형식만 읽으므로 대화 기록 이름으로 복사
+    shutil.copy(path, os.path.join(directory, "chat_history_check.json"))
+    overrides = {"LLM_PROVIDER": "replay", "REPLAY_DIR": directory, "REPLAY_ON_MISS": "error"}
+    saved = {name: os.environ.get(name) for name in overrides}
+    os.environ.update(overrides)
+    providers._providers.pop("replay", None)
+    results = []
+    try:
+        at = AppTest.from_file(app, default_timeout=timeout).run()
+        _widget(at.sidebar.text_area, "시스템 프롬프트:").set_value(data["system_prompt"]).run()
+        _widget(at.sidebar.selectbox, "AI 모델을 선택하세요:").set_value(data["model"])
+        _widget(at.sidebar.slider, "Temperature:").set_value(data["temperature"])
+        _widget(at.sidebar.number_input, "최대 토큰 수:").set_value(data["max_tokens"])
+        _widget(at.sidebar.slider, "Top P:").set_value(data["top_p"])
+        at.run()
+        for number, (user_input, responses) in enumerate(_chat_turns(data["messages"]), 1):
+            if not responses:
+                continue
+            if "history_encoding" in responses[0]:
+                at.sidebar.selectbox(key=page_key(app, "history_encoding")).set_value(responses[0]["history_encoding"]).run()
+                if "history_fields" in responses[0]:
+                    at.sidebar.multiselect(key=page_key(app, "history_fields")).set_value(responses[0]["history_fields"]).run()
+            iterations = [element for element in at.sidebar.number_input if element.label == "반복 횟수:"]
+            if iterations:
+                iterations[0].set_value(len(responses)).run()
+            at.text_input(key=page_key(app, "user_input")).input(user_input).run()
+            _widget(at.button, "전송").click().run()
+            errors = [str(element.value) for element in (*at.exception, *at.error)]
+            replayed = not errors and at.text and at.text[-1].value == responses[-1]["content"]
+            results.append({"turn": number, "replayed": bool(replayed), "error": errors[0] if errors else None})
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        providers._providers.pop("replay", None)
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="내보낸 대화 기록이 재생 모드에서 모든 턴 재생되는지 확인합니다.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    check_parser = subparsers.add_parser("check", help="멀티턴 대화 기록을 앱에서 다시 진행해 봅니다.")
+    check_parser.add_argument("export", help="chat_history_*.json 파일")
+    check_parser.add_argument("--app", default="multiturn.py", choices=("multiturn.py", "multiturn_copy.py"))
+    args = parser.parse_args(argv)
+
+    results = check_replay(args.export, args.app)
+    for result in results:
+        status = "재생" if result["replayed"] else f"실패 {result['error'] or '응답이 기록과 다릅니다'}"
+        print(f"턴 {result['turn']}: {status}")
+    replayed = sum(result["replayed"] for result in results)
+    print(f"{len(results)}개 턴 중 {replayed}개 재생")
+    return 0 if replayed == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
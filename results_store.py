@@ -0,0 +1,49 @@
+import os
+import json
+import uuid
+import threading
+from datetime import datetime
+from providers import get_secret
+
+# 실행 결과를 종류별 JSONL 파일(results/<종류>.jsonl)에 한 줄씩 추가하는 결과 저장소
+# 여러 스레드/작업이 동시에 기록해도 줄 단위로 섞이지 않도록 파일마다 잠금을 사용한다.
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+# 결과 저장 디렉터리 (secrets 또는 환경 변수 RESULTS_DIR 로 변경 가능)
+def results_dir():
+    return get_secret("RESULTS_DIR") or "results"
+
+
+def results_path(kind):
+    return os.path.join(results_dir(), f"{kind}.jsonl")
+
+
+def _lock_for(path):
+    with _locks_lock:
+        return _locks.setdefault(path, threading.Lock())
+
+
+# 결과 레코드를 추가하는 함수 (id 와 저장 시각을 붙여서 반환)
+def append_result(kind, record):
+    record = {"id": uuid.uuid4().hex, "saved_at": datetime.now().isoformat(), **record}
+    path = results_path(kind)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _lock_for(path):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+    return record
+
+
+# 저장된 결과 레코드를 하나씩 읽는 함수
+def read_results(kind):
+    path = results_path(kind)
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,33 @@
+import streamlit as st
+
+# 오래 걸리는 실행(A/B 테스트 전송, 시뮬레이션)을 중간에 멈추기 위한 화면 도우미
+# "중지" 버튼을 누르면 Streamlit 이 스크립트를 다시 실행하면서 진행 중인 스크립트를 중단시킨다.
+# 기다리는 동안 update() 로 진행 표시줄을 갱신해야 그 시점에 중단 요청이 전달되며,
+# 호출하는 쪽은 try/finally 에서 그때까지 끝난 결과를 저장하고 save_status() 로 부분 실행임을 기록한다.
+
+
+# 실행하는 동안 중지 버튼과 진행 표시줄을 보여주는 컨트롤
+class StopControl:
+    def __init__(self, label, key="stop_run"):
+        self.label = label
+        st.button("중지", key=key, icon="⏹️", help="남은 요청을 취소하고 지금까지 끝난 결과만 남깁니다.")
+        self.bar = st.progress(0.0, text=label)
+
+    def update(self, done, total, detail=""):
+        text = f"{self.label} {detail} ({done}/{total})" if detail else f"{self.label} ({done}/{total})"
+        self.bar.progress(done / total if total else 0.0, text=text)
+
+    def finish(self):
+        self.bar.empty()
+
+
+# 실행 결과가 요청한 만큼 끝났는지 세션에 기록하는 함수
+def save_status(completed, requested, key="run_status"):
+    st.session_state[key] = {"completed": completed, "requested": requested, "partial": completed < requested}
+
+
+# 직전 실행이 중지되어 일부 결과만 있으면 알려주는 함수
+def render_status(unit="개", key="run_status"):
+    status = st.session_state.get(key)
+    if status and status["partial"]:
+        st.warning(f"실행이 중지되었습니다. {status['requested']}{unit} 중 {status['completed']}{unit}만 완료된 부분 결과입니다.")
@@ -0,0 +1,177 @@
+import os
+import json
+import uuid
+import weakref
+import threading
+from collections.abc import Sequence
+import streamlit as st
+from providers import get_secret
+from results_store import results_dir
+
+# 세션마다 계속 쌓이는 목록(대화 기록, 테스트 결과)의 메모리 사용량을 집계하고,
+# 설정한 한도를 넘으면 오래된 항목부터 로컬 디스크(JSONL)로 내보내는 저장소
+# - 내보낸 항목은 파일 위치(offset)만 메모리에 남기고, 조회할 때 필요한 범위만 다시 읽는다.
+# - 세션이 끝나 목록이 정리되면 디스크 파일도 함께 삭제된다.
+
+DEFAULT_MEMORY_CAP_KB = 1024
+
+# 관리 화면에서 모든 세션의 목록을 집계하기 위한 약한 참조 모음
+_registry = weakref.WeakSet()
+_registry_lock = threading.Lock()
+
+
+# 목록 하나가 메모리에 둘 수 있는 최대 크기 (secrets 또는 환경 변수 SESSION_MEMORY_CAP_KB 로 변경 가능)
+def memory_cap_bytes():
+    return int(get_secret("SESSION_MEMORY_CAP_KB") or DEFAULT_MEMORY_CAP_KB) * 1024
+
+
+def spill_dir():
+    return get_secret("SESSION_SPILL_DIR") or os.path.join(results_dir(), "session_spill")
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class SpillList(Sequence):
+    def __init__(self, name, session_id, entries=(), cap_bytes=None):
+        self.name = name
+        self.session_id = session_id
+        self.cap_bytes = cap_bytes or memory_cap_bytes()
+        self.path = os.path.join(spill_dir(), f"{session_id}_{name}_{uuid.uuid4().hex[:8]}.jsonl")
+        self.entries = []
+        self.sizes = []
+        self.memory_bytes = 0
+        self.offsets = []
+        self.disk_bytes = 0
+        self.lock = threading.RLock()
+        weakref.finalize(self, _remove_file, self.path)
+        with _registry_lock:
+            _registry.add(self)
+        self.extend(entries)
+
+    @property
+    def spilled(self):
+        return len(self.offsets)
+
+    def __len__(self):
+        return self.spilled + len(self.entries)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    # 항목을 추가하는 함수 (추가한 뒤에는 내용을 바꾸지 않는다고 가정하고 크기를 한 번만 잰다)
+    def append(self, entry):
+        self.extend([entry])
+
+    def extend(self, entries):
+        with self.lock:
+            for entry in entries:
+                size = len(json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+                self.entries.append(entry)
+                self.sizes.append(size)
+                self.memory_bytes += size
+            self._spill()
+
+    # 메모리 사용량이 한도를 넘으면 가장 최근 항목 하나만 남을 때까지 오래된 항목을 디스크로 내보내는 함수
+    def _spill(self):
+        count = 0
+        while self.memory_bytes > self.cap_bytes and count < len(self.entries) - 1:
+            self.memory_bytes -= self.sizes[count]
+            count += 1
+        if not count:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "ab") as f:
+            for entry in self.entries[:count]:
+                line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+                self.offsets.append(self.disk_bytes)
+                f.write(line)
+                self.disk_bytes += len(line)
+        del self.entries[:count]
+        del self.sizes[:count]
+
+    # 디스크로 내보낸 [start, stop) 범위의 항목을 순서대로 읽는 함수
+    def _read_spilled(self, start, stop):
+        if start >= stop:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.offsets[start])
+            for _ in range(stop - start):
+                yield json.loads(f.readline())
+
+    def __getitem__(self, index):
+        with self.lock:
+            if isinstance(index, slice):
+                start, stop, step = index.indices(len(self))
+                if step != 1:
+                    return [self[i] for i in range(start, stop, step)]
+                spilled = self.spilled
+                items = list(self._read_spilled(min(start, spilled), min(stop, spilled)))
+                return items + self.entries[max(start - spilled, 0):max(stop - spilled, 0)]
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("SpillList index out of range")
+            if index < self.spilled:
+                return next(self._read_spilled(index, index + 1))
+            return self.entries[index - self.spilled]
+
+    # 내보낸 항목은 한꺼번에 불러오지 않고 파일에서 하나씩 읽으며 순회
+    def __iter__(self):
+        with self.lock:
+            spilled = self.spilled
+            entries = list(self.entries)
+        yield from self._read_spilled(0, spilled)
+        yield from entries
+
+    def clear(self):
+        with self.lock:
+            self.entries = []
+            self.sizes = []
+            self.memory_bytes = 0
+            self.offsets = []
+            self.disk_bytes = 0
+            _remove_file(self.path)
+
+    # 관리 화면에 표시할 사용량 요약
+    def stats(self):
+        return {
+            "session_id": self.session_id,
+            "name": self.name,
+            "entries": len(self),
+            "in_memory": len(self.entries),
+            "spilled": self.spilled,
+            "memory_kb": self.memory_bytes / 1024,
+            "disk_kb": self.disk_bytes / 1024,
+        }
+
+
+def _session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "local"
+
+
+# 페이지별 세션 상태 키 (streamlit_app.py 의 페이지들은 한 세션 상태를 공유하므로 페이지 스크립트 이름을 앞에 붙여 구분)
+def page_key(page, name):
+    return f"{os.path.splitext(os.path.basename(page))[0]}_{name}"
+
+
+# 세션 상태의 목록을 SpillList 로 가져오는 함수 (없거나 일반 list 이면 SpillList 로 바꿔서 저장)
+def session_list(name):
+    value = st.session_state.get(name)
+    if not isinstance(value, SpillList):
+        value = SpillList(name, _session_id(), value or [])
+        st.session_state[name] = value
+    return value
+
+
+# 현재 프로세스에 살아 있는 모든 세션 목록의 사용량
+def memory_report():
+    with _registry_lock:
+        lists = list(_registry)
+    return sorted((spill_list.stats() for spill_list in lists), key=lambda row: row["memory_kb"], reverse=True)
@@ -0,0 +1,53 @@
+import time
+
+# 모든 도구를 하나의 프로세스에서 제공하는 멀티페이지 진입점 (streamlit run streamlit_app.py)
+# 각 페이지 스크립트는 선택했을 때만 실행되므로 pyaudio 같은 무거운 의존성은 해당 페이지에서만 불러온다.
+_started = time.perf_counter()
+
+import streamlit as st
+from lazy_imports import IMPORT_TIMES, lazy_import
+from profiler import record, render_sidebar
+
+# 여러 페이지가 함께 쓰는 모듈은 프로세스 전체에서 한 번만 불러온다
+lazy_import("providers")
+
+PAGES = {
+    "A/B 테스트": [
+        st.Page("app.py", title="AB 테스트", icon="🤖", default=True),
+        st.Page("app_col.py", title="AB 테스트 (.env)", icon="🤖"),
+        st.Page("app_org.py", title="AB 테스트 (파일 저장)", icon="🤖"),
+        st.Page("app_tab.py", title="AB 테스트 (사이드바)", icon="🤖"),
+        st.Page("app_arena.py", title="N-모델 아레나", icon="🏟️"),
+        st.Page("app_sweep.py", title="파라미터 스윕", icon="🧪"),
+    ],
+    "멀티턴": [
+        st.Page("multiturn.py", title="멀티턴 채팅", icon="💬"),
+        st.Page("multiturn_copy.py", title="멀티턴 반복 채팅", icon="💬"),
+        st.Page("multiturn_multitime_ab_test.py", title="멀티턴 프롬프트 비교", icon="💬"),
+        st.Page("multiturn_multitime_ab_test_simulator.py", title="멀티턴 시뮬레이션", icon="🔁"),
+    ],
+    "음성": [
+        st.Page("ai_tutor.py", title="AI 튜터", icon="🎙️"),
+    ],
+    "관리": [
+        st.Page("app_admin.py", title="세션 메모리", icon="🧮"),
+    ],
+}
+
+# 첫 실행(콜드 스타트)에서 진입점 준비까지 걸린 시간은 프로세스당 한 번만 기록
+if "streamlit_app (진입점)" not in IMPORT_TIMES:
+    IMPORT_TIMES["streamlit_app (진입점)"] = time.perf_counter() - _started
+
+page = st.navigation(PAGES)
+page_started = time.perf_counter()
+page.run()
+record(f"rerun {page.title}", time.perf_counter() - page_started)
+
+# 페이지 안에서 지연 로딩된 모듈까지 포함해 표시
+with st.sidebar.expander("모듈 로딩 시간"):
+    st.caption(f"이번 페이지 실행 시간: {(time.perf_counter() - page_started) * 1000:.0f} ms")
+    for name, seconds in sorted(IMPORT_TIMES.items(), key=lambda item: item[1], reverse=True):
+        st.write(f"`{name}`: {seconds * 1000:.0f} ms")
+
+# 프로파일링 모드에서 재실행/구간/제공자 호출 시간을 보여주는 디버그 사이드바
+render_sidebar()
@@ -0,0 +1,114 @@
+from itertools import product
+from metrics import pairwise_cosine
+from providers import generate_chat_completion, run_concurrently
+from work_queue import new_batch_id
+
+# 모델/Temperature/Top P/Max Tokens 조합 그리드를 만들고 한 번에 실행하는 파라미터 스윕
+
+SWEEP_PARAMETERS = ("model", "temperature", "top_p", "max_tokens")
+
+
+# "0.1, 0.5, 0.9" 같은 목록이나 "0.0:1.0:0.25" (시작:끝:간격, 끝 포함) 범위를 값 목록으로 바꾸는 함수
+def parse_values(text, cast=float):
+    values = []
+    for part in str(text).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if ":" in part:
+            start, stop, step = (cast(v) for v in part.split(":"))
+            if step <= 0:
+                raise ValueError(f"범위 간격은 0보다 커야 합니다: {part}")
+            count = int((stop - start) / step + 1e-9) + 1
+            values.extend(cast(round(start + i * step, 6)) for i in range(count))
+        else:
+            values.append(cast(part))
+    return values
+
+
+# 값 목록들의 모든 조합으로 셀 목록을 만드는 함수 (같은 설정의 셀은 한 번만 포함)
+def expand_grid(models, temperatures, top_ps, max_tokens):
+    cells = []
+    seen = set()
+    for model, temperature, top_p, tokens in product(models, temperatures, top_ps, max_tokens):
+        cell = {
+            "model": model,
+            "temperature": round(float(temperature), 4),
+            "top_p": round(float(top_p), 4),
+            "max_tokens": int(tokens),
+        }
+        key = tuple(cell[name] for name in SWEEP_PARAMETERS)
+        if key not in seen:
+            seen.add(key)
+            cells.append(cell)
+    return cells
+
+
+# 셀 하나를 실행하고 지연 시간과 응답 길이를 기록하는 작업 (실패하면 예외를 그대로 내서 작업 큐 워커가 재시도하게 함)
+async def run_cell_job(cell, system_prompt, user_input):
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_input}
+    ]
+    result = await generate_chat_completion(
+        cell["model"],
+        messages,
+        cell["temperature"],
+        cell["max_tokens"],
+        cell["top_p"],
+    )
+    return {
+        **cell,
+        "response": result["content"],
+        "latency": result["latency"],
+        "length": len(result["content"] or ""),
+    }
+
+
+# 실패한 셀의 결과 (오류 메시지를 응답으로 남김)
+def error_result(cell, error):
+    response = f"Error: {error}"
+    return {**cell, "response": response, "latency": None, "length": len(response)}
+
+
+# 셀 하나를 이 프로세스에서 실행하는 함수 (실패한 셀은 오류 메시지를 응답으로 남김)
+async def run_cell(cell, system_prompt, user_input):
+    try:
+        return await run_cell_job(cell, system_prompt, user_input)
+    except Exception as e:
+        return error_result(cell, str(e))
+
+
+# 기준 답변이 있으면 문자 n-gram 코사인 유사도를 셀 결과의 점수로 붙이는 함수
+def score_results(results, reference_answer=""):
+    if reference_answer and results:
+        similarity = pairwise_cosine([reference_answer] + [result["response"] for result in results])
+        for result, score in zip(results, similarity[0, 1:]):
+            result["score"] = float(score)
+    return results
+
+
+# 모든 셀을 동시에 실행하는 함수 (요청 속도는 제공자별 제한기가 조절)
+def run_sweep(cells, system_prompt, user_input, reference_answer=""):
+    results = run_concurrently(run_cell(cell, system_prompt, user_input) for cell in cells)
+    return score_results(results, reference_answer)
+
+
+# 셀들을 작업 큐에 넣는 함수 (실행은 work_queue 워커가 함, 반환: 배치 id)
+def enqueue_sweep(queue, cells, system_prompt, user_input):
+    batch = new_batch_id("sweep")
+    queue.enqueue(batch, "sweep_cell", [
+        {"cell": cell, "system_prompt": system_prompt, "user_input": user_input} for cell in cells
+    ])
+    return batch
+
+
+# 큐에서 끝난 셀 결과를 모으는 함수 (재시도를 다 쓰고 실패한 셀은 오류 메시지를 응답으로 남김)
+def collect_sweep(queue, batch, reference_answer=""):
+    results = []
+    for job in queue.results(batch):
+        if job["result"] is not None:
+            results.append(job["result"])
+        elif job["status"] == "failed":
+            results.append(error_result(job["payload"]["cell"], job["error"]))
+    return score_results(results, reference_answer)
@@ -0,0 +1,31 @@
+from providers import build_messages, generate_chat_completion, stream_chat_completion
+
+# AI 튜터의 어시스턴트/시뮬레이션 사용자 대화 진행 (ai_tutor.py 와 batch_tutor.py 에서 공통 사용)
+
+DIALOGUE_MODEL = "gpt-4o-mini"
+DEFAULT_ASSISTANT_PROMPT = "당신은 도움이 되는 AI 어시스턴트입니다."
+DEFAULT_USER_PROMPT = "당신은 AI 어시스턴트와 대화하는 초등학생입니다. 이전 대화를 바탕으로 적절한 질문이나 응답을 해주세요."
+
+
+# AI 응답 생성 함수
+async def generate_ai_response_async(conversation_history, system_prompt, model=DIALOGUE_MODEL):
+    messages = build_messages(system_prompt, conversation_history)
+    response = await generate_chat_completion(model=model, messages=messages)
+    return response["content"]
+
+
+# AI 응답을 생성되는 대로 조각 단위로 돌려주는 함수
+def stream_ai_response(conversation_history, system_prompt, model=DIALOGUE_MODEL):
+    messages = build_messages(system_prompt, conversation_history)
+    return stream_chat_completion(model=model, messages=messages)
+
+
+# 첫 사용자 발화로 시작해 어시스턴트와 시뮬레이션 사용자가 번갈아 max_turns 턴 대화하는 함수
+async def run_dialogue(first_user_input, assistant_prompt, user_prompt, max_turns, model=DIALOGUE_MODEL):
+    conversation = [{"role": "user", "content": first_user_input}]
+    for _ in range(max_turns):
+        ai_response = await generate_ai_response_async(conversation, assistant_prompt, model)
+        conversation.append({"role": "assistant", "content": ai_response})
+        user_response = await generate_ai_response_async(conversation, user_prompt, model)
+        conversation.append({"role": "user", "content": user_response})
+    return conversation
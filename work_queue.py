@@ -0,0 +1,428 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import hashlib
+import argparse
+from typing import TypedDict, Optional
+from providers import get_secret, generate_chat_completion, run_sync
+from results_store import results_dir
+from lazy_imports import lazy_import
+
+# 여러 워커 프로세스(여러 머신)가 나눠 처리하는 작업 큐 (SQLite 파일 저장소)
+# - 앱과 배치 실행기는 작업을 enqueue() 로 넣고 progress() 로 진행 상황만 본다. 실제 모델 호출은 워커가 한다.
+#     워커 실행 예: python work_queue.py worker --concurrency 16
+#     진행 상황 예: python work_queue.py status <배치 id>
+# - 워커는 작업을 리스(lease)로 가져가고, 처리하는 동안 리스를 연장한다. 워커가 죽어 리스가 만료되면(가시성 타임아웃)
+#   다른 워커가 다시 가져간다. 실패한 작업은 지수 백오프 후 max_attempts 번까지 다시 시도한다.
+# - 작업 id 는 (배치, 종류, 입력) 해시라 같은 작업을 두 번 넣어도 하나만 남고, 결과도 처음 기록된 것 하나만 남는다
+#   (리스가 만료된 뒤 늦게 끝난 워커의 결과는 무시).
+# 처리량은 워커 수로 늘린다. 여러 머신에서 쓰려면 secrets 또는 환경 변수 WORK_QUEUE_PATH 로 모든 워커가 같은 파일을 보게 한다
+# (SQLite 파일 잠금을 지원하는 공유 저장소 필요).
+
+QUEUE_FILE = "work_queue.sqlite3"
+VISIBILITY_TIMEOUT = 120.0
+MAX_ATTEMPTS = 3
+MAX_RETRY_DELAY = 60.0
+IDLE_POLL_INTERVAL = 1.0
+# 작업 종류별 처리 함수 ("모듈:함수", 워커에서 처음 사용할 때 불러옴). 처리 함수는 입력(payload)을 키워드 인자로 받는 코루틴
+JOB_HANDLERS = {
+    "chat_completion": "work_queue:chat_completion_job",
+    "sweep_cell": "sweep:run_cell_job",
+    "tutor_recording": "batch_tutor:process_recording_job",
+}
+STATUS_LABELS = {"queued": "대기", "leased": "처리 중", "done": "완료", "failed": "실패"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    batch TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at);
+CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch, status);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    finished_at REAL NOT NULL
+);
+"""
+
+
+class Job(TypedDict):
+    id: str
+    batch: str
+    kind: str
+    payload: dict
+    attempts: int
+    max_attempts: int
+
+
+class JobResult(TypedDict):
+    id: str
+    payload: dict
+    status: str
+    attempts: int
+    error: Optional[str]
+    result: Optional[dict]
+
+
+# 큐 파일 경로 (secrets 또는 환경 변수 WORK_QUEUE_PATH 로 변경 가능)
+def queue_path():
+    return get_secret("WORK_QUEUE_PATH") or os.path.join(results_dir(), QUEUE_FILE)
+
+
+def new_batch_id(prefix):
+    return f"{prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+# 작업 id (같은 배치에 같은 입력을 다시 넣으면 같은 id)
+def job_id(batch, kind, payload):
+    encoded = json.dumps({"batch": batch, "kind": kind, "payload": payload},
+                         ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def retry_delay(attempts):
+    return min(2.0 ** attempts, MAX_RETRY_DELAY)
+
+
+class WorkQueue:
+    def __init__(self, path=None):
+        self.path = path or queue_path()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    # 호출마다 새 연결 (프로세스/스레드 사이에 연결을 나누지 않음), 자동 커밋 모드에서 필요한 곳만 트랜잭션을 연다
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return _Connection(conn)
+
+    # 작업들을 넣는 함수 (이미 있는 작업은 건너뜀), 반환: 작업 id 목록 (입력 순서)
+    def enqueue(self, batch, kind, payloads, max_attempts=MAX_ATTEMPTS):
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"알 수 없는 작업 종류입니다: {kind}")
+        now = time.time()
+        rows = [
+            (job_id(batch, kind, payload), batch, kind, json.dumps(payload, ensure_ascii=False), max_attempts, now, now, now)
+            for payload in payloads
+        ]
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (id, batch, kind, payload, max_attempts, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("COMMIT")
+        return [row[0] for row in rows]
+
+    # 처리할 작업을 최대 limit 개 리스하는 함수
+    # 대기 중이고 재시도 시각이 지난 작업, 리스가 만료된 작업을 가져가며, 만료된 작업 중 시도 횟수를 다 쓴 것은 실패로 끝낸다.
+    def lease(self, worker, limit=1, visibility_timeout=VISIBILITY_TIMEOUT, kinds=None, batch=None):
+        now = time.time()
+        conditions, params = ["((status = 'queued' AND available_at <= ?) OR (status = 'leased' AND lease_expires <= ?))"], [now, now]
+        if kinds:
+            conditions.append(f"kind IN ({', '.join('?' for _ in kinds)})")
+            params.extend(kinds)
+        if batch:
+            conditions.append("batch = ?")
+            params.append(batch)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = COALESCE(error, '리스가 만료되었습니다'), "
+                    "lease_owner = NULL, updated_at = ? "
+                    "WHERE status = 'leased' AND lease_expires <= ? AND attempts >= max_attempts",
+                    (now, now),
+                )
+                rows = conn.execute(
+                    f"SELECT id, batch, kind, payload, attempts, max_attempts FROM jobs "
+                    f"WHERE {' AND '.join(conditions)} ORDER BY seq LIMIT ?",
+                    (*params, limit),
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    [(worker, now + visibility_timeout, now, row["id"]) for row in rows],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return [
+            Job(id=row["id"], batch=row["batch"], kind=row["kind"], payload=json.loads(row["payload"]),
+                attempts=row["attempts"] + 1, max_attempts=row["max_attempts"])
+            for row in rows
+        ]
+
+    # 처리 중인 작업의 리스를 연장하는 함수 (리스를 이미 잃었으면 False)
+    def extend(self, job_id, worker, visibility_timeout=VISIBILITY_TIMEOUT):
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (now + visibility_timeout, now, job_id, worker),
+            )
+        return cursor.rowcount == 1
+
+    # 결과를 기록하는 함수 (작업마다 처음 기록된 결과 하나만 남음, 반환: 이번 호출이 기록했는지)
+    def complete(self, job_id, worker, result):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO results (job_id, result, worker, finished_at) VALUES (?, ?, ?, ?)",
+                (job_id, json.dumps(result, ensure_ascii=False), worker, now),
+            )
+            written = cursor.rowcount == 1
+            if written:
+                conn.execute(
+                    "UPDATE jobs SET status = 'done', error = NULL, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                    "WHERE id = ?",
+                    (now, job_id),
+                )
+            conn.execute("COMMIT")
+        return written
+
+    # 실패를 기록하는 함수 (시도 횟수가 남았으면 백오프 후 다시 대기, 아니면 실패로 끝냄)
+    # 다른 워커가 리스를 가져간 뒤라면 아무것도 바꾸지 않는다.
+    def fail(self, job_id, worker, error):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (job_id, worker),
+            ).fetchone()
+            if row is not None:
+                retry = row["attempts"] < row["max_attempts"]
+                conn.execute(
+                    "UPDATE jobs SET status = ?, available_at = ?, error = ?, lease_owner = NULL, lease_expires = NULL, "
+                    "updated_at = ? WHERE id = ?",
+                    ("queued" if retry else "failed", now + retry_delay(row["attempts"]), error, now, job_id),
+                )
+            conn.execute("COMMIT")
+
+    # 실패한 작업을 다시 대기열에 넣는 함수 (시도 횟수 초기화)
+    def requeue_failed(self, batch):
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, updated_at = ? "
+                "WHERE batch = ? AND status = 'failed'",
+                (now, now, batch),
+            )
+        return cursor.rowcount
+
+    # 배치의 상태별 작업 수 (리스가 만료된 작업은 처리 중으로 셈)
+    def progress(self, batch):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS count FROM jobs WHERE batch = ? GROUP BY status", (batch,))
+            counts = {status: 0 for status in STATUS_LABELS}
+            counts.update({row["status"]: row["count"] for row in rows})
+        counts["total"] = sum(counts[status] for status in STATUS_LABELS)
+        counts["finished"] = counts["done"] + counts["failed"]
+        return counts
+
+    # 배치의 작업과 결과 (넣은 순서대로)
+    def results(self, batch):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT jobs.id, jobs.payload, jobs.status, jobs.attempts, jobs.error, results.result "
+                "FROM jobs LEFT JOIN results ON results.job_id = jobs.id WHERE jobs.batch = ? ORDER BY jobs.seq",
+                (batch,),
+            ).fetchall()
+        return [
+            JobResult(id=row["id"], payload=json.loads(row["payload"]), status=row["status"], attempts=row["attempts"],
+                      error=row["error"], result=json.loads(row["result"]) if row["result"] is not None else None)
+            for row in rows
+        ]
+
+    # 아직 끝나지 않은(대기 또는 처리 중) 작업 수 (재시도 대기 중인 작업도 셈)
+    def pending(self, kinds=None, batch=None):
+        conditions, params = ["status IN ('queued', 'leased')"], []
+        if kinds:
+            conditions.append(f"kind IN ({', '.join('?' for _ in kinds)})")
+            params.extend(kinds)
+        if batch:
+            conditions.append("batch = ?")
+            params.append(batch)
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT COUNT(*) AS count FROM jobs WHERE {' AND '.join(conditions)}", params).fetchone()
+        return row["count"]
+
+    # 배치 목록 (최근 것부터)
+    def batches(self, limit=20):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT batch, COUNT(*) AS jobs, MIN(created_at) AS created_at FROM jobs GROUP BY batch "
+                "ORDER BY created_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    # 배치가 모두 끝날 때까지 진행 상황을 on_progress(counts) 로 알리며 기다리는 함수
+    def wait(self, batch, on_progress=None, poll_interval=IDLE_POLL_INTERVAL):
+        while True:
+            counts = self.progress(batch)
+            if on_progress is not None:
+                on_progress(counts)
+            if counts["finished"] >= counts["total"]:
+                return counts
+            time.sleep(poll_interval)
+
+
+# sqlite3 연결을 with 문이 끝날 때 닫는 래퍼 (sqlite3.Connection 의 with 는 트랜잭션만 끝내고 닫지 않음)
+class _Connection:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *exc):
+        self.conn.close()
+
+
+_queues = {}
+
+
+# 현재 설정의 큐 (경로가 바뀌면 새로 엶)
+def get_queue():
+    path = queue_path()
+    if path not in _queues:
+        _queues[path] = WorkQueue(path)
+    return _queues[path]
+
+
+# 대화 메시지 목록으로 응답을 생성하는 작업
+async def chat_completion_job(model, messages, temperature=None, max_tokens=None, top_p=None, response_format=None):
+    return await generate_chat_completion(model, messages, temperature, max_tokens, top_p, response_format)
+
+
+def _handler(kind):
+    module_name, function_name = JOB_HANDLERS[kind].split(":")
+    return getattr(lazy_import(module_name), function_name)
+
+
+# 큐에서 작업을 가져와 처리하는 워커
+# - 동시에 최대 concurrency 개를 처리하고, 처리하는 동안 가시성 타임아웃의 1/3 마다 리스를 연장한다.
+# - 처리 함수가 예외를 내면 실패로 기록해 재시도되게 한다 (응답 안에 오류를 담아 돌려주는 처리 함수는 그대로 완료).
+class Worker:
+    def __init__(self, queue, name=None, concurrency=8, visibility_timeout=VISIBILITY_TIMEOUT, kinds=None, batch=None):
+        self.queue = queue
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:4]}"
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.kinds = kinds
+        self.batch = batch
+        self.stats = {"done": 0, "failed": 0, "duplicate": 0}
+
+    async def _heartbeat(self, job):
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            if not await asyncio.to_thread(self.queue.extend, job["id"], self.name, self.visibility_timeout):
+                return
+
+    async def _process(self, job):
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            result = await _handler(job["kind"])(**job["payload"])
+        except Exception as e:
+            self.stats["failed"] += 1
+            await asyncio.to_thread(self.queue.fail, job["id"], self.name, f"{type(e).__name__}: {e}")
+            print(f"[{self.name}] 실패 ({job['attempts']}/{job['max_attempts']}) {job['kind']} {job['id'][:12]}: {e}",
+                  file=sys.stderr, flush=True)
+            return
+        finally:
+            heartbeat.cancel()
+        written = await asyncio.to_thread(self.queue.complete, job["id"], self.name, result)
+        self.stats["done" if written else "duplicate"] += 1
+
+    # 작업을 처리하는 함수 (exit_when_empty 이면 처리 중인 작업도, 대기 중인 작업도 없을 때 끝냄)
+    # 재시도 백오프로 아직 가져갈 수 없는 작업이나 다른 워커가 처리 중인 작업이 남아 있으면 계속 기다린다.
+    async def run(self, exit_when_empty=False):
+        running = set()
+        while True:
+            free = self.concurrency - len(running)
+            jobs = []
+            if free > 0:
+                jobs = await asyncio.to_thread(self.queue.lease, self.name, free, self.visibility_timeout, self.kinds, self.batch)
+            for job in jobs:
+                running.add(asyncio.create_task(self._process(job)))
+            if not running:
+                if exit_when_empty and not await asyncio.to_thread(self.queue.pending, self.kinds, self.batch):
+                    return self.stats
+                await asyncio.sleep(IDLE_POLL_INTERVAL)
+                continue
+            # 자리가 남아 있으면 IDLE_POLL_INTERVAL 마다 새 작업을 찾고, 꽉 찼으면 하나가 끝날 때까지 기다림
+            timeout = IDLE_POLL_INTERVAL if len(running) < self.concurrency else None
+            _, running = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+
+def format_progress(counts):
+    return ", ".join(f"{label} {counts[status]}" for status, label in STATUS_LABELS.items()) + f" / 전체 {counts['total']}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="작업 큐 워커를 실행하거나 배치 진행 상황을 봅니다.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    worker_parser = subparsers.add_parser("worker", help="큐에서 작업을 가져와 처리합니다.")
+    worker_parser.add_argument("--concurrency", type=int, default=8, help="동시에 처리할 작업 수")
+    worker_parser.add_argument("--visibility-timeout", type=float, default=VISIBILITY_TIMEOUT,
+                               help="리스 유지 시간(초). 이 시간 안에 연장되지 않으면 다른 워커가 작업을 가져갑니다.")
+    worker_parser.add_argument("--kind", action="append", choices=sorted(JOB_HANDLERS), help="처리할 작업 종류 (여러 번 지정 가능)")
+    worker_parser.add_argument("--batch", help="이 배치의 작업만 처리")
+    worker_parser.add_argument("--name", help="워커 이름 (기본: 호스트:pid)")
+    worker_parser.add_argument("--exit-when-empty", action="store_true", help="처리할 작업이 없으면 종료")
+    status_parser = subparsers.add_parser("status", help="배치 진행 상황을 출력합니다.")
+    status_parser.add_argument("batch", nargs="?", help="배치 id (생략하면 최근 배치 목록)")
+    requeue_parser = subparsers.add_parser("requeue", help="배치의 실패한 작업을 다시 대기열에 넣습니다.")
+    requeue_parser.add_argument("batch")
+    args = parser.parse_args(argv)
+
+    queue = get_queue()
+    if args.command == "worker":
+        worker = Worker(queue, args.name, args.concurrency, args.visibility_timeout, args.kind, args.batch)
+        print(f"[{worker.name}] {queue.path} 에서 작업을 기다립니다 (동시 처리 {args.concurrency}개)", flush=True)
+        try:
+            stats = run_sync(worker.run(args.exit_when_empty))
+        except KeyboardInterrupt:
+            # 처리 중이던 작업은 리스가 만료되면 다른 워커가 가져감
+            stats = worker.stats
+        print(f"[{worker.name}] 완료 {stats['done']}개, 실패 {stats['failed']}개, 중복 결과 {stats['duplicate']}개")
+    elif args.command == "status":
+        if args.batch:
+            print(f"{args.batch}: {format_progress(queue.progress(args.batch))}")
+        else:
+            for batch in queue.batches():
+                print(f"{batch['batch']}: {format_progress(queue.progress(batch['batch']))}")
+    elif args.command == "requeue":
+        print(f"{queue.requeue_failed(args.batch)}개 작업을 다시 대기열에 넣었습니다.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())